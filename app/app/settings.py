@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -132,3 +133,219 @@ STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
+
+
+# External product catalog
+
+CATALOG_URL = os.environ.get(
+    'CATALOG_URL', 'http://challenge-api.luizalabs.com/api/product')
+
+CATALOG_CONNECT_TIMEOUT = float(
+    os.environ.get('CATALOG_CONNECT_TIMEOUT', 1.0))
+
+CATALOG_READ_TIMEOUT = float(os.environ.get('CATALOG_READ_TIMEOUT', 2.0))
+
+CATALOG_MAX_RETRIES = int(os.environ.get('CATALOG_MAX_RETRIES', 2))
+
+CATALOG_RETRY_BACKOFF = float(os.environ.get('CATALOG_RETRY_BACKOFF', 0.1))
+
+CATALOG_POOL_MAXSIZE = int(os.environ.get('CATALOG_POOL_MAXSIZE', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+
+# Product lookup cache
+
+PRODUCT_CACHE_SIZE = int(os.environ.get('PRODUCT_CACHE_SIZE', 10000))
+
+PRODUCT_CACHE_TTL = int(os.environ.get('PRODUCT_CACHE_TTL', 300))
+
+PRODUCT_CACHE_STALE_TTL = int(os.environ.get('PRODUCT_CACHE_STALE_TTL', 3600))
+
+PRODUCT_CACHE_NEGATIVE_TTL = int(
+    os.environ.get('PRODUCT_CACHE_NEGATIVE_TTL', 60))
+
+# Alias of a shared cache in CACHES, leave empty to use only the local cache
+PRODUCT_CACHE_ALIAS = os.environ.get('PRODUCT_CACHE_ALIAS') or None
+
+PRODUCT_CACHE_REVALIDATE_WORKERS = int(
+    os.environ.get('PRODUCT_CACHE_REVALIDATE_WORKERS', 2))
+
+# Serialize catalog fetches of a product across processes (PostgreSQL only)
+PRODUCT_FETCH_ADVISORY_LOCK = bool(
+    int(os.environ.get('PRODUCT_FETCH_ADVISORY_LOCK', 0)))
+
+# Concurrent catalog fetches when resolving several products at once
+CATALOG_BULK_WORKERS = int(os.environ.get('CATALOG_BULK_WORKERS', 8))
+
+
+# Wishlist
+
+WISHLIST_BULK_MAX_ITEMS = int(os.environ.get('WISHLIST_BULK_MAX_ITEMS', 500))
+
+WISHLIST_PAGE_SIZE = int(os.environ.get('WISHLIST_PAGE_SIZE', 100))
+
+WISHLIST_MAX_PAGE_SIZE = int(os.environ.get('WISHLIST_MAX_PAGE_SIZE', 500))
+
+# Build wishlist reads straight from database rows, skipping serializers
+WISHLIST_FAST_READS = bool(int(os.environ.get('WISHLIST_FAST_READS', 0)))
+
+# Cache the set of products of each wishlist for membership checks for this
+# many seconds, 0 disables it
+WISHLIST_MEMBERSHIP_CACHE_TTL = int(
+    os.environ.get('WISHLIST_MEMBERSHIP_CACHE_TTL', 0))
+
+# Cache wishlist list and retrieve responses for this many seconds, keyed by
+# user, wishlist version and URL, 0 disables it
+WISHLIST_RESPONSE_CACHE_TTL = int(
+    os.environ.get('WISHLIST_RESPONSE_CACHE_TTL', 0))
+
+WISHLIST_RESPONSE_CACHE_ALIAS = os.environ.get(
+    'WISHLIST_RESPONSE_CACHE_ALIAS', 'default')
+
+# Seconds a request waits for another one rebuilding the same response
+WISHLIST_RESPONSE_CACHE_LOCK_WAIT = float(
+    os.environ.get('WISHLIST_RESPONSE_CACHE_LOCK_WAIT', 1.0))
+
+# Log the response cache stats of each process every this many seconds,
+# 0 never
+WISHLIST_RESPONSE_CACHE_STATS_INTERVAL = int(
+    os.environ.get('WISHLIST_RESPONSE_CACHE_STATS_INTERVAL', 300))
+
+# Rows deleted per statement when removing many wishlist items
+WISHLIST_DELETE_CHUNK_SIZE = int(
+    os.environ.get('WISHLIST_DELETE_CHUNK_SIZE', 1000))
+
+# Rows fetched per round trip by the server side cursor of exports
+WISHLIST_EXPORT_CHUNK_SIZE = int(
+    os.environ.get('WISHLIST_EXPORT_CHUNK_SIZE', 2000))
+
+# Client ids returned per page by the reverse product lookup
+WISHLIST_CLIENTS_PAGE_SIZE = int(
+    os.environ.get('WISHLIST_CLIENTS_PAGE_SIZE', 1000))
+
+WISHLIST_CLIENTS_MAX_PAGE_SIZE = int(
+    os.environ.get('WISHLIST_CLIENTS_MAX_PAGE_SIZE', 10000))
+
+# Number of entries returned by the most wishlisted products and brands
+WISHLIST_TOP_DEFAULT_LIMIT = int(
+    os.environ.get('WISHLIST_TOP_DEFAULT_LIMIT', 10))
+
+WISHLIST_TOP_MAX_LIMIT = int(os.environ.get('WISHLIST_TOP_MAX_LIMIT', 1000))
+
+# Wishlist versions bumped per statement when products change
+WISHLIST_VERSION_BUMP_CHUNK_SIZE = int(
+    os.environ.get('WISHLIST_VERSION_BUMP_CHUNK_SIZE', 1000))
+
+# Products fetched and written per batch by the catalog refresh
+PRODUCT_REFRESH_BATCH_SIZE = int(
+    os.environ.get('PRODUCT_REFRESH_BATCH_SIZE', 200))
+
+# Concurrent catalog requests of the catalog refresh
+PRODUCT_REFRESH_WORKERS = int(os.environ.get('PRODUCT_REFRESH_WORKERS', 4))
+
+# Catalog requests started per second by the catalog refresh, 0 is unlimited
+PRODUCT_REFRESH_RATE = float(os.environ.get('PRODUCT_REFRESH_RATE', 20))
+
+# Products synced less than this many seconds ago are not refreshed
+PRODUCT_REFRESH_STALE_AFTER = int(
+    os.environ.get('PRODUCT_REFRESH_STALE_AFTER', 86400))
+
+# Price drop events inserted per statement
+PRICE_DROP_EVENT_BATCH_SIZE = int(
+    os.environ.get('PRICE_DROP_EVENT_BATCH_SIZE', 1000))
+
+# Products loaded per COPY and merge by the catalog import
+PRODUCT_IMPORT_CHUNK_SIZE = int(
+    os.environ.get('PRODUCT_IMPORT_CHUNK_SIZE', 50000))
+
+# Circuit breaker of the catalog client: the outcomes of the last
+# CATALOG_BREAKER_WINDOW calls are kept, and once there are at least
+# CATALOG_BREAKER_MIN_CALLS of them the circuit opens when the rate of
+# failed calls, or of calls slower than CATALOG_BREAKER_SLOW_CALL_SECONDS,
+# reaches its threshold. It stays open for CATALOG_BREAKER_OPEN_SECONDS.
+CATALOG_BREAKER_WINDOW = int(os.environ.get('CATALOG_BREAKER_WINDOW', 20))
+CATALOG_BREAKER_MIN_CALLS = int(
+    os.environ.get('CATALOG_BREAKER_MIN_CALLS', 10))
+CATALOG_BREAKER_FAILURE_RATE = float(
+    os.environ.get('CATALOG_BREAKER_FAILURE_RATE', 0.5))
+CATALOG_BREAKER_SLOW_CALL_SECONDS = float(
+    os.environ.get('CATALOG_BREAKER_SLOW_CALL_SECONDS', 2.0))
+CATALOG_BREAKER_SLOW_CALL_RATE = float(
+    os.environ.get('CATALOG_BREAKER_SLOW_CALL_RATE', 0.8))
+CATALOG_BREAKER_OPEN_SECONDS = int(
+    os.environ.get('CATALOG_BREAKER_OPEN_SECONDS', 30))
+
+# Hedge catalog requests slower than CATALOG_HEDGE_PERCENTILE of the last
+# CATALOG_HEDGE_WINDOW latencies (and at least CATALOG_HEDGE_MIN_DELAY
+# seconds) with a second request, for at most CATALOG_HEDGE_MAX_RATIO of
+# the requests. Up to CATALOG_HEDGE_WORKERS requests and as many hedges
+# are sent from a pool of each process, never queued: other requests are
+# sent unhedged and other hedges skipped
+CATALOG_HEDGE_ENABLED = bool(int(os.environ.get('CATALOG_HEDGE_ENABLED', 0)))
+CATALOG_HEDGE_PERCENTILE = float(
+    os.environ.get('CATALOG_HEDGE_PERCENTILE', 95))
+CATALOG_HEDGE_MIN_DELAY = float(
+    os.environ.get('CATALOG_HEDGE_MIN_DELAY', 0.05))
+CATALOG_HEDGE_MAX_RATIO = float(
+    os.environ.get('CATALOG_HEDGE_MAX_RATIO', 0.1))
+CATALOG_HEDGE_WINDOW = int(os.environ.get('CATALOG_HEDGE_WINDOW', 200))
+CATALOG_HEDGE_MIN_SAMPLES = int(
+    os.environ.get('CATALOG_HEDGE_MIN_SAMPLES', 20))
+CATALOG_HEDGE_WORKERS = int(os.environ.get('CATALOG_HEDGE_WORKERS', 16))
+
+# Log the hedging stats of each process every this many seconds, 0 never
+CATALOG_HEDGE_STATS_INTERVAL = int(
+    os.environ.get('CATALOG_HEDGE_STATS_INTERVAL', 300))
+
+# Cache the user of JWT authenticated requests for this many seconds,
+# 0 loads it from the database on every request
+USER_AUTH_CACHE_TTL = int(os.environ.get('USER_AUTH_CACHE_TTL', 60))
+
+USER_AUTH_CACHE_ALIAS = os.environ.get('USER_AUTH_CACHE_ALIAS', 'default')
+
+# Users listed per page to admins
+USER_PAGE_SIZE = int(os.environ.get('USER_PAGE_SIZE', 100))
+
+USER_MAX_PAGE_SIZE = int(os.environ.get('USER_MAX_PAGE_SIZE', 1000))
+
+# Rows fetched per round trip when streaming users as JSON Lines
+USER_EXPORT_CHUNK_SIZE = int(os.environ.get('USER_EXPORT_CHUNK_SIZE', 2000))
+
+# Users removed per request to the remove endpoint
+USER_REMOVAL_MAX_IDS = int(os.environ.get('USER_REMOVAL_MAX_IDS', 1000))
+
+# Queued user removals claimed per batch by the removal worker
+USER_REMOVAL_BATCH_SIZE = int(os.environ.get('USER_REMOVAL_BATCH_SIZE', 10))
+
+# Seconds after which a removal claimed by a worker that did not finish it
+# can be claimed by another one
+USER_REMOVAL_LEASE = int(os.environ.get('USER_REMOVAL_LEASE', 600))
+
+# Users inserted per bulk_create by the user import
+USER_IMPORT_BATCH_SIZE = int(os.environ.get('USER_IMPORT_BATCH_SIZE', 5000))
+
+# Processes hashing raw passwords in the user import, 0 uses every CPU
+USER_IMPORT_HASH_WORKERS = int(os.environ.get('USER_IMPORT_HASH_WORKERS', 0))
+
+# Count the queries of every request, returned in the X-Query-Count,
+# X-Query-Time and X-Query-Budget headers and logged when over the budget
+# of their view. With QUERY_BUDGET_STRICT requests over their budget fail,
+# meant for tests only
+QUERY_INSTRUMENTATION = bool(int(os.environ.get('QUERY_INSTRUMENTATION', 0)))
+
+QUERY_BUDGET_STRICT = bool(int(os.environ.get('QUERY_BUDGET_STRICT', 0)))
+
+# Wishlist count deltas applied per transaction by the rollup fold
+WISHLIST_COUNT_FOLD_BATCH_SIZE = int(
+    os.environ.get('WISHLIST_COUNT_FOLD_BATCH_SIZE', 10000))
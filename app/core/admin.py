@@ -1,7 +1,56 @@
-from core.models import Produto, WishlistItem
+from collections import defaultdict
+
+from core.models import PriceDropEvent, Produto, WishlistItem
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth import get_user_model
+from user import removals
+from wishlist import changes
+
+admin.site.register(PriceDropEvent)
+
+
+@admin.register(WishlistItem)
+class WishlistItemAdmin(admin.ModelAdmin):
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, WishlistItem.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        """
+        Delete the items through the manager, so their removal is logged
+        for the wishlist rollups and the wishlists are marked changed
+        """
+        items = defaultdict(list)
+        for client_id, item_id in queryset.values_list('client_id', 'pk'):
+            items[client_id].append(item_id)
+        for client_id, item_ids in items.items():
+            WishlistItem.objects.remove(
+                client_id, settings.WISHLIST_DELETE_CHUNK_SIZE,
+                item_ids=item_ids)
+            changes.wishlist_changed(client_id)
+
+
+@admin.register(Produto)
+class ProdutoAdmin(admin.ModelAdmin):
+
+    def has_delete_permission(self, request, obj=None):
+        # the cascade to wishlist items would skip the wishlist rollups
+        return False
+
+
+@admin.register(get_user_model())
+class UserAdmin(admin.ModelAdmin):
+    actions = ('remove_users',)
+
+    def has_delete_permission(self, request, obj=None):
+        # users are removed with remove_users, the cascade of a delete
+        # would skip the wishlist rollups
+        return False
 
-admin.site.register(WishlistItem)
-admin.site.register(Produto)
-admin.site.register(get_user_model())
+    @admin.action(description='Remove selected users')
+    def remove_users(self, request, queryset):
+        """Deactivate the selected users and queue their removal"""
+        user_ids = removals.schedule(queryset.values_list('pk', flat=True))
+        self.message_user(
+            request, f'{len(user_ids)} users queued for removal.')
@@ -0,0 +1,21 @@
+import csv
+import json
+
+FORMATS = ('jsonl', 'csv')
+
+
+def read_rows(lines, input_format):
+    """
+    Yield the rows of a dump as dicts, from either JSON Lines or CSV with
+    a header. Empty CSV values are read as None.
+    """
+    if input_format == 'jsonl':
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+        return
+    for row in csv.DictReader(lines):
+        yield {
+            name: value if value != '' else None
+            for name, value in row.items()
+        }
@@ -0,0 +1,54 @@
+import logging
+from contextlib import ExitStack
+
+from core import querybudget
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Count the queries of every request and the time spent in them, when
+    QUERY_INSTRUMENTATION is set. They are returned in the X-Query-Count
+    and X-Query-Time (milliseconds) headers, along with the budget of
+    the view in X-Query-Budget, and requests over their budget are
+    logged, or raise QueryBudgetExceeded with QUERY_BUDGET_STRICT.
+    Queries run while streaming a response are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.QUERY_INSTRUMENTATION:
+            return self.get_response(request)
+        counter = querybudget.QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+
+        response['X-Query-Count'] = str(counter.count)
+        response['X-Query-Time'] = f'{counter.duration * 1000:.1f}'
+        if request.resolver_match is None:
+            return response
+        view, action = querybudget.view_action(
+            request.resolver_match, request.method)
+        budget = querybudget.view_budget(view, action)
+        logger.debug(
+            '%s.%s: %d queries in %.1f ms', getattr(view, '__name__', None),
+            action, counter.count, counter.duration * 1000)
+        if budget is None:
+            return response
+        response['X-Query-Budget'] = str(budget)
+        if counter.count > budget:
+            message = (
+                f'{view.__name__}.{action} ran {counter.count} queries, '
+                f'over its budget of {budget}'
+            )
+            if settings.QUERY_BUDGET_STRICT:
+                raise querybudget.QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_alter_produto_review_score'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wishlistitem',
+            index=models.Index(fields=['client', 'id'], name='core_wishlist_client_id_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_wishlistitem_client_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WishlistVersion',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.user')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_wishlistversion'),
+    ]
+
+    operations = [
+        # existing items have no known creation date: add the column
+        # nullable and without a database default, so the table is not
+        # rewritten, and only stamp the items inserted from now on
+        migrations.AddField(
+            model_name='wishlistitem',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='wishlistitem',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, null=True),
+        ),
+        migrations.AlterField(
+            model_name='produto',
+            name='brand',
+            field=models.CharField(db_index=True, max_length=250),
+        ),
+    ]
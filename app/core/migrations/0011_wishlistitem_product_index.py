@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_wishlistitem_created_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wishlistitem',
+            index=models.Index(fields=['product', 'client'], name='core_wishlist_product_idx'),
+        ),
+        migrations.AlterField(
+            model_name='wishlistitem',
+            name='product',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.produto'),
+        ),
+    ]
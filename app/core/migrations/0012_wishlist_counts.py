@@ -0,0 +1,49 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def count_wishlists(apps, schema_editor):
+    """Fill the rollups from the wishlist items already stored"""
+    WishlistItem = apps.get_model('core', 'WishlistItem')
+    ProductWishlistCount = apps.get_model('core', 'ProductWishlistCount')
+    BrandWishlistCount = apps.get_model('core', 'BrandWishlistCount')
+    db = schema_editor.connection.alias
+
+    items = WishlistItem.objects.using(db).order_by()
+    ProductWishlistCount.objects.using(db).bulk_create(
+        ProductWishlistCount(product_id=product_id, wishlists=wishlists)
+        for product_id, wishlists in items.values_list(
+            'product_id').annotate(models.Count('id'))
+    )
+    BrandWishlistCount.objects.using(db).bulk_create(
+        BrandWishlistCount(brand=brand, wishlists=wishlists)
+        for brand, wishlists in items.values_list(
+            'product__brand').annotate(models.Count('id'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_wishlistitem_product_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BrandWishlistCount',
+            fields=[
+                ('brand', models.CharField(max_length=250, primary_key=True, serialize=False)),
+                ('wishlists', models.BigIntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductWishlistCount',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.produto')),
+                ('wishlists', models.BigIntegerField(db_index=True, default=0)),
+            ],
+        ),
+        migrations.RunPython(count_wishlists, migrations.RunPython.noop),
+    ]
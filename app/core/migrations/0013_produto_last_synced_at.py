@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_wishlist_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='last_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['last_synced_at', 'id'], name='core_produto_synced_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_price_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['name'], name='core_user_name_like_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
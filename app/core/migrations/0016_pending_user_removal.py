@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_user_name_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingUserRemoval',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.user')),
+                ('requested_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='pendinguserremoval',
+            index=models.Index(fields=['claimed_at', 'requested_at'], name='core_pending_removal_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.25 on 2026-10-18 02:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_pending_user_removal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WishlistCountDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='core.produto')),
+            ],
+        ),
+    ]
@@ -1,8 +1,10 @@
 import uuid
+from collections import Counter
 
 from django.contrib.auth.models import (AbstractBaseUser, BaseUserManager,
                                         PermissionsMixin)
-from django.db import models
+from django.db import connections, models, transaction
+from django.utils import timezone
 
 
 class UserManager(BaseUserManager):
@@ -19,12 +21,47 @@ class UserManager(BaseUserManager):
 
     def create_superuser(self, email, password, **extra_fields):
         """Creates and saves a new superuser"""
-        user = self.create_user(email, password, **extra_fields)
-        user.is_staff = True
-        user.is_superuser = True
-        user.save(using=self._db)
+        extra_fields.setdefault('is_staff', True)
+        extra_fields.setdefault('is_superuser', True)
 
-        return user
+        return self.create_user(email, password, **extra_fields)
+
+    def insert_ignoring_existing(self, users):
+        """
+        Insert unsaved users with INSERT statements that skip the emails
+        already taken, even by rows committed concurrently, and return
+        the emails of the users actually inserted.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        fields = [
+            field for field in self.model._meta.concrete_fields
+            if field is not self.model._meta.pk
+        ]
+        sql = (
+            'INSERT INTO {table} ({columns}) VALUES {{rows}} '
+            'ON CONFLICT ({email}) DO NOTHING RETURNING {email}'
+        ).format(
+            table=qn(self.model._meta.db_table),
+            columns=', '.join(qn(field.column) for field in fields),
+            email=qn(self.model._meta.get_field('email').column),
+        )
+        row = '({})'.format(', '.join(['%s'] * len(fields)))
+        batch_size = max(1, connection.ops.bulk_batch_size(fields, users))
+        inserted = []
+        with connection.cursor() as cursor:
+            for start in range(0, len(users), batch_size):
+                batch = users[start:start + batch_size]
+                values = [
+                    field.get_db_prep_save(
+                        field.pre_save(user, True), connection)
+                    for user in batch
+                    for field in fields
+                ]
+                cursor.execute(
+                    sql.format(rows=', '.join([row] * len(batch))), values)
+                inserted.extend(result[0] for result in cursor.fetchall())
+        return inserted
 
 
 class User(AbstractBaseUser, PermissionsMixin):
@@ -38,27 +75,436 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = 'email'
 
+    class Meta:
+        # prefix searches on name, the unique email already gets a LIKE
+        # index on PostgreSQL
+        indexes = [
+            models.Index(
+                fields=['name'], name='core_user_name_like_idx',
+                opclasses=['varchar_pattern_ops']),
+        ]
+
 
 class Produto(models.Model):
     """Produto model that stores product informations"""
     id = models.UUIDField(primary_key=True, editable=False, default=uuid.uuid4)
     price = models.FloatField()
     image = models.CharField(max_length=250)
-    brand = models.CharField(max_length=250)
+    brand = models.CharField(max_length=250, db_index=True)
     title = models.CharField(max_length=250)
     review_score = models.FloatField(null=True, blank=True)
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['last_synced_at', 'id'],
+                name='core_produto_synced_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.title
 
 
+class WishlistItemManager(models.Manager):
+
+    def _insert_ignoring_duplicates(self, client_id, product_ids, returning):
+        """
+        Insert wishlist items with a single INSERT that skips products
+        already on the client wishlist, returning the returning column
+        of the inserted rows.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        fields = [
+            field for field in self.model._meta.concrete_fields
+            if field is not self.model._meta.pk
+        ]
+        values = []
+        for product_id in product_ids:
+            item = self.model(client_id=client_id, product_id=product_id)
+            values.extend(
+                field.get_db_prep_save(field.pre_save(item, True), connection)
+                for field in fields
+            )
+        row = '({})'.format(', '.join(['%s'] * len(fields)))
+        sql = (
+            'INSERT INTO {table} ({columns}) VALUES {rows} '
+            'ON CONFLICT ({client}, {product}) DO NOTHING '
+            'RETURNING {returning}'
+        ).format(
+            table=qn(self.model._meta.db_table),
+            columns=', '.join(qn(field.column) for field in fields),
+            rows=', '.join([row] * len(product_ids)),
+            client=qn(self.model._meta.get_field('client').column),
+            product=qn(self.model._meta.get_field('product').column),
+            returning=qn(self.model._meta.get_field(returning).column),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, values)
+            return [row[0] for row in cursor.fetchall()]
+
+    def add(self, client_id, product_id):
+        """
+        Add a product to a client wishlist with a single INSERT that
+        ignores duplicates, and log it for the wishlist rollups. Returns
+        the id of the new item, or None if the product was already on
+        the wishlist.
+        """
+        with transaction.atomic(using=self.db):
+            ids = self._insert_ignoring_duplicates(
+                client_id, [product_id], 'id')
+            if ids:
+                WishlistCountDelta.objects.record({product_id: 1})
+        return ids[0] if ids else None
+
+    def add_many(self, client_id, product_ids):
+        """
+        Add several products to a client wishlist with a single INSERT
+        that ignores duplicates, and log them for the wishlist rollups.
+        Returns the set of product ids that were added.
+        """
+        product_ids = list(product_ids)
+        if not product_ids:
+            return set()
+        field = self.model._meta.get_field('product')
+        with transaction.atomic(using=self.db):
+            added = {
+                field.target_field.to_python(product_id)
+                for product_id in self._insert_ignoring_duplicates(
+                    client_id, product_ids, 'product')
+            }
+            WishlistCountDelta.objects.record(
+                {product_id: 1 for product_id in added})
+        return added
+
+    def remove(self, client_id, chunk_size, item_ids=None, product_ids=None):
+        """
+        Delete wishlist items of a client, only those matching item_ids or
+        product_ids when given, and log their removal for the wishlist
+        rollups. Rows are deleted by chunks of chunk_size, each one
+        locked and deleted in its own transaction, so large deletes never
+        hold many row locks at once. Returns the number of items deleted.
+        """
+        queryset = self.filter(client_id=client_id)
+        if item_ids is not None:
+            queryset = queryset.filter(id__in=item_ids)
+        if product_ids is not None:
+            queryset = queryset.filter(product_id__in=product_ids)
+        removed = 0
+        while True:
+            with transaction.atomic(using=self.db):
+                rows = list(
+                    queryset.order_by().select_for_update()
+                    .values_list('pk', 'product_id')[:chunk_size]
+                )
+                if rows:
+                    self.filter(pk__in=[pk for pk, _ in rows]).delete()
+                    deltas = Counter()
+                    for _, product_id in rows:
+                        deltas[product_id] -= 1
+                    WishlistCountDelta.objects.record(deltas)
+            removed += len(rows)
+            if len(rows) < chunk_size:
+                return removed
+
+    def clients_of(self, product_id, chunk_size, after=None):
+        """
+        Yield the ids of the clients that wishlisted a product, in chunks
+        of at most chunk_size ids ordered by id. Each chunk is a keyset
+        query on the (product, client) index starting after the last id
+        of the previous one, so no chunk gets slower as the scan goes on.
+        """
+        queryset = self.filter(product_id=product_id).order_by('client_id')
+        while True:
+            chunk_queryset = queryset
+            if after is not None:
+                chunk_queryset = chunk_queryset.filter(client_id__gt=after)
+            chunk = list(chunk_queryset.values_list(
+                'client_id', flat=True)[:chunk_size])
+            if chunk:
+                yield chunk
+            if len(chunk) < chunk_size:
+                return
+            after = chunk[-1]
+
+
 class WishlistItem(models.Model):
     """Wishlist item model that stores clients wishlists"""
     client = models.ForeignKey(User, on_delete=models.CASCADE)
-    product = models.ForeignKey(Produto, on_delete=models.CASCADE)
+    product = models.ForeignKey(
+        Produto, on_delete=models.CASCADE, db_index=False)
+    # null for the items added before creation dates were stored
+    created_at = models.DateTimeField(
+        default=timezone.now, null=True, db_index=True)
+
+    objects = WishlistItemManager()
 
     class Meta:
         unique_together = (('client', 'product'),)
+        indexes = [
+            models.Index(
+                fields=['client', 'id'], name='core_wishlist_client_id_idx'),
+            models.Index(
+                fields=['product', 'client'],
+                name='core_wishlist_product_idx'),
+        ]
 
     def __str__(self) -> str:
         return f'{self.client}/{self.product}'
+
+
+class WishlistVersionManager(models.Manager):
+
+    def current(self, client_id):
+        """Return the current version of a client wishlist"""
+        version = self.filter(client_id=client_id).values_list(
+            'version', flat=True).first()
+        return version or 0
+
+    def bump(self, client_id):
+        """Increment the version of a client wishlist with a single upsert"""
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        client = qn(self.model._meta.get_field('client').column)
+        version = qn(self.model._meta.get_field('version').column)
+        sql = (
+            f'INSERT INTO {table} ({client}, {version}) VALUES (%s, 1) '
+            f'ON CONFLICT ({client}) '
+            f'DO UPDATE SET {version} = {table}.{version} + 1'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [client_id])
+
+    def bump_many(self, client_ids):
+        """Increment the versions of several wishlists with one upsert"""
+        client_ids = list(client_ids)
+        if not client_ids:
+            return
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        client = qn(self.model._meta.get_field('client').column)
+        version = qn(self.model._meta.get_field('version').column)
+        sql = (
+            f'INSERT INTO {table} ({client}, {version}) '
+            f'VALUES {", ".join(["(%s, 1)"] * len(client_ids))} '
+            f'ON CONFLICT ({client}) '
+            f'DO UPDATE SET {version} = {table}.{version} + 1'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, client_ids)
+
+
+class WishlistVersion(models.Model):
+    """Counter bumped on every change to a client wishlist"""
+    client = models.OneToOneField(
+        User, primary_key=True, on_delete=models.CASCADE)
+    version = models.PositiveBigIntegerField(default=0)
+
+    objects = WishlistVersionManager()
+
+    def __str__(self) -> str:
+        return f'{self.client}/{self.version}'
+
+
+class ProductWishlistCountManager(models.Manager):
+
+    def adjust(self, deltas, brands=True):
+        """
+        Add deltas, a mapping of product ids to a change in the number of
+        wishlists holding them, to the product rollup and, unless brands
+        is False, to the rollup of the current brands of those products,
+        with one upsert each. Rows are upserted in a fixed order so
+        concurrent adjustments do not deadlock. Wishlist writes record
+        their deltas with WishlistCountDelta instead, and the fold job
+        applies them here.
+        """
+        deltas = {
+            product_id: delta
+            for product_id, delta in sorted(deltas.items()) if delta
+        }
+        if not deltas:
+            return
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        product_field = Produto._meta.pk
+        product_ids = [
+            product_field.get_db_prep_value(product_id, connection)
+            for product_id in deltas
+        ]
+
+        table = qn(self.model._meta.db_table)
+        product = qn(self.model._meta.get_field('product').column)
+        wishlists = qn(self.model._meta.get_field('wishlists').column)
+        product_sql = (
+            f'INSERT INTO {table} ({product}, {wishlists}) '
+            f'VALUES {", ".join(["(%s, %s)"] * len(deltas))} '
+            f'ON CONFLICT ({product}) '
+            f'DO UPDATE SET {wishlists} = {table}.{wishlists} + '
+            f'EXCLUDED.{wishlists}'
+        )
+        product_params = []
+        for product_id, delta in zip(product_ids, deltas.values()):
+            product_params.extend([product_id, delta])
+
+        brand_table = qn(BrandWishlistCount._meta.db_table)
+        brand = qn(BrandWishlistCount._meta.get_field('brand').column)
+        produto_table = qn(Produto._meta.db_table)
+        produto_id = qn(product_field.column)
+        produto_brand = qn(Produto._meta.get_field('brand').column)
+        brand_sql = (
+            f'INSERT INTO {brand_table} ({brand}, {wishlists}) '
+            f'SELECT {produto_brand}, SUM(CASE {produto_id} '
+            f'{" ".join(["WHEN %s THEN %s"] * len(deltas))} END) '
+            f'FROM {produto_table} '
+            f'WHERE {produto_id} IN ({", ".join(["%s"] * len(deltas))}) '
+            f'GROUP BY {produto_brand} ORDER BY {produto_brand} '
+            f'ON CONFLICT ({brand}) '
+            f'DO UPDATE SET {wishlists} = {brand_table}.{wishlists} + '
+            f'EXCLUDED.{wishlists}'
+        )
+        brand_params = product_params + product_ids
+
+        with connection.cursor() as cursor:
+            cursor.execute(product_sql, product_params)
+            if brands:
+                cursor.execute(brand_sql, brand_params)
+
+
+class ProductWishlistCount(models.Model):
+    """Number of wishlists holding each product, kept up to date on writes"""
+    product = models.OneToOneField(
+        Produto, primary_key=True, on_delete=models.CASCADE)
+    wishlists = models.BigIntegerField(default=0, db_index=True)
+
+    objects = ProductWishlistCountManager()
+
+    def __str__(self) -> str:
+        return f'{self.product}/{self.wishlists}'
+
+
+class WishlistCountDeltaManager(models.Manager):
+
+    def record(self, deltas):
+        """
+        Append deltas, a mapping of product ids to a change in the number
+        of wishlists holding them, to the log folded into the rollups.
+        Only inserts, so concurrent writes never wait on a rollup row.
+        """
+        self.bulk_create(
+            self.model(product_id=product_id, delta=delta)
+            for product_id, delta in deltas.items() if delta
+        )
+
+
+class WishlistCountDelta(models.Model):
+    """Change to the wishlist count of a product, not yet in the rollups"""
+    product = models.ForeignKey(
+        Produto, on_delete=models.CASCADE, db_index=False)
+    delta = models.IntegerField()
+
+    objects = WishlistCountDeltaManager()
+
+    def __str__(self) -> str:
+        return f'{self.product_id}/{self.delta}'
+
+
+class BrandWishlistCountManager(models.Manager):
+
+    def adjust(self, deltas):
+        """
+        Add deltas, a mapping of brands to a change in their number of
+        wishlist items, to the brand rollup with a single upsert.
+        """
+        deltas = {brand: delta for brand, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        brand = qn(self.model._meta.get_field('brand').column)
+        wishlists = qn(self.model._meta.get_field('wishlists').column)
+        sql = (
+            f'INSERT INTO {table} ({brand}, {wishlists}) '
+            f'VALUES {", ".join(["(%s, %s)"] * len(deltas))} '
+            f'ON CONFLICT ({brand}) '
+            f'DO UPDATE SET {wishlists} = {table}.{wishlists} + '
+            f'EXCLUDED.{wishlists}'
+        )
+        params = []
+        for item in deltas.items():
+            params.extend(item)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+class BrandWishlistCount(models.Model):
+    """Number of wishlist items of products of each brand"""
+    brand = models.CharField(max_length=250, primary_key=True)
+    wishlists = models.BigIntegerField(default=0, db_index=True)
+
+    objects = BrandWishlistCountManager()
+
+    def __str__(self) -> str:
+        return f'{self.brand}/{self.wishlists}'
+
+
+class PriceHistory(models.Model):
+    """Price of a product from the moment it changed"""
+    product = models.ForeignKey(
+        Produto, on_delete=models.CASCADE, db_index=False)
+    price = models.FloatField()
+    recorded_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['product', 'recorded_at'],
+                name='core_price_history_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.product}/{self.price}'
+
+
+class PriceDropEvent(models.Model):
+    """Outbox of price drops of products on a client wishlist"""
+    client = models.ForeignKey(User, on_delete=models.CASCADE)
+    product = models.ForeignKey(Produto, on_delete=models.CASCADE)
+    old_price = models.FloatField()
+    new_price = models.FloatField()
+    created_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['processed_at', 'id'],
+                name='core_price_drop_pending_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.client}/{self.product}'
+
+
+class PendingUserRemoval(models.Model):
+    """
+    Queue of deactivated users whose data is still to be deleted by the
+    process_user_removals worker
+    """
+    user = models.OneToOneField(
+        User, primary_key=True, on_delete=models.CASCADE)
+    requested_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['claimed_at', 'requested_at'],
+                name='core_pending_removal_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user}'
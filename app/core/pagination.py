@@ -0,0 +1,19 @@
+from django.conf import settings
+from rest_framework import pagination
+
+
+class KeysetPagination(pagination.CursorPagination):
+    """
+    Keyset pagination over the primary key, with opaque next/previous
+    cursors. Page sizes are read from the settings named below so they
+    can be tuned per deployment.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    page_size_setting = 'PAGE_SIZE'
+    max_page_size_setting = 'MAX_PAGE_SIZE'
+
+    def get_page_size(self, request):
+        self.page_size = getattr(settings, self.page_size_setting)
+        self.max_page_size = getattr(settings, self.max_page_size_setting)
+        return super().get_page_size(request)
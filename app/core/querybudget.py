@@ -0,0 +1,57 @@
+import time
+
+from django.test import override_settings
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request ran more queries than the budget of its view"""
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting the queries run through it and
+    the time spent in them
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def view_action(resolver_match, method):
+    """
+    Return the view class and the action of a resolved request: the
+    viewset action, or the lowercase HTTP method for other views
+    """
+    func = resolver_match.func
+    view = getattr(func, 'cls', None)
+    actions = getattr(func, 'actions', None)
+    if actions is not None:
+        return view, actions.get(method.lower())
+    return view, method.lower()
+
+
+def view_budget(view, action):
+    """
+    Return the query budget of an action, declared by the view class in
+    query_budgets, a mapping of its actions to the number of queries
+    they may run, or None
+    """
+    return getattr(view, 'query_budgets', {}).get(action)
+
+
+def enforce_query_budgets(test):
+    """
+    Decorate a test or test case so that its requests fail with
+    QueryBudgetExceeded when they run more queries than their budget
+    """
+    return override_settings(
+        QUERY_INSTRUMENTATION=True, QUERY_BUDGET_STRICT=True)(test)
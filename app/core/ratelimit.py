@@ -0,0 +1,25 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Space calls evenly so that, across every thread sharing it, no more
+    than rate of them start per second. A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the caller is allowed to make its call"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
@@ -0,0 +1,57 @@
+import uuid
+
+from core.models import Produto, ProductWishlistCount, WishlistItem
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from wishlist import changes, rollup
+
+
+class AdminTests(TestCase):
+    """Test the admin keeps the wishlist rollups consistent"""
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            email='admin@luizalabs.com', password='adminpass123')
+        self.user = get_user_model().objects.create_user(
+            email='test_user@luizalabs.com', password='testpass')
+        self.product = Produto.objects.create(
+            id=uuid.uuid4(), price=10.9, brand='sample brand',
+            image='http://challenge-api.luizalabs.com/images/sample',
+            title='Sample product')
+        WishlistItem.objects.add(self.user.id, self.product.id)
+        rollup.fold(100)
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def test_users_and_products_cannot_be_deleted(self):
+        """Test deletes that would cascade to wishlist items are disabled"""
+        changelist = self.client.get(
+            reverse('admin:core_user_changelist'))
+        delete_user = self.client.get(
+            reverse('admin:core_user_delete', args=[self.user.id]))
+        delete_product = self.client.get(
+            reverse('admin:core_produto_delete', args=[self.product.id]))
+
+        actions = changelist.context['action_form'].fields['action'].choices
+        self.assertNotIn('delete_selected', [name for name, _ in actions])
+        self.assertEqual(delete_user.status_code, 403)
+        self.assertEqual(delete_product.status_code, 403)
+
+    def test_wishlist_item_delete_updates_rollups(self):
+        """Test deleting items in the admin logs them for the rollups"""
+        item = WishlistItem.objects.get(client=self.user)
+        version = changes.wishlist_version(self.user.id)
+
+        res = self.client.post(reverse('admin:core_wishlistitem_changelist'), {
+            'action': 'delete_selected', '_selected_action': [item.id],
+            'post': 'yes'})
+
+        self.assertEqual(res.status_code, 302)
+        self.assertFalse(WishlistItem.objects.exists())
+        rollup.fold(100)
+        self.assertEqual(
+            ProductWishlistCount.objects.get(product=self.product).wishlists,
+            0)
+        self.assertEqual(rollup.verify(), ({}, {}))
+        self.assertGreater(changes.wishlist_version(self.user.id), version)
@@ -0,0 +1,24 @@
+import io
+
+from core import dumps
+from django.test import SimpleTestCase
+
+
+class ReadRowsTests(SimpleTestCase):
+    """Test reading the rows of JSON Lines and CSV dumps"""
+
+    def test_jsonl_skips_blank_lines(self):
+        """Test every JSON line is read and blank lines are skipped"""
+        lines = io.StringIO('{"email": "a@b.com"}\n\n{"email": "c@d.com"}\n')
+
+        rows = list(dumps.read_rows(lines, 'jsonl'))
+
+        self.assertEqual(rows, [{'email': 'a@b.com'}, {'email': 'c@d.com'}])
+
+    def test_csv_empty_values_are_none(self):
+        """Test CSV rows are keyed by the header, empty values as None"""
+        lines = io.StringIO('email,name\na@b.com,\n')
+
+        rows = list(dumps.read_rows(lines, 'csv'))
+
+        self.assertEqual(rows, [{'email': 'a@b.com', 'name': None}])
@@ -0,0 +1,53 @@
+from unittest.mock import patch
+
+from core.querybudget import QueryBudgetExceeded, enforce_query_budgets
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from user.views import ManageUserView
+
+ME_URL = reverse('user:me')
+
+
+class QueryInstrumentationTests(TestCase):
+    """Test the query instrumentation middleware"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@luizalabs.com', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_headers_only_when_enabled(self):
+        """Test query headers are returned only with instrumentation on"""
+        res = self.client.get(ME_URL)
+
+        self.assertNotIn('X-Query-Count', res)
+
+        with override_settings(QUERY_INSTRUMENTATION=True):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res['X-Query-Count'], '1')
+        self.assertIn('X-Query-Time', res)
+        self.assertEqual(
+            res['X-Query-Budget'], str(ManageUserView.query_budgets['get']))
+
+    @override_settings(QUERY_INSTRUMENTATION=True)
+    @patch.object(ManageUserView, 'query_budgets', {'get': 0})
+    def test_over_budget_logged(self):
+        """Test requests over their budget are logged"""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(
+            'ManageUserView.get ran 1 queries, over its budget of 0',
+            logs.output[0])
+
+    @enforce_query_budgets
+    @patch.object(ManageUserView, 'query_budgets', {'get': 0})
+    def test_over_budget_fails_when_enforced(self):
+        """Test requests over their budget fail when budgets are enforced"""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(ME_URL)
@@ -79,6 +79,21 @@ class ModelTests(TestCase):
 
         with self.assertRaises(IntegrityError):
             get_user_model().objects.create_user(email, '123pass')
+
+    def test_insert_users_ignoring_existing(self):
+        """Test inserting users skips taken emails and reports the rest"""
+        User = get_user_model()
+        User.objects.create_user('taken@luizalabs.com', 'pass123')
+
+        inserted = User.objects.insert_ignoring_existing([
+            User(email='taken@luizalabs.com', name='Taken'),
+            User(email='new@luizalabs.com', name='New'),
+        ])
+
+        self.assertEqual(inserted, ['new@luizalabs.com'])
+        self.assertEqual(
+            User.objects.get(email='new@luizalabs.com').name, 'New')
+        self.assertEqual(User.objects.count(), 2)
     # endregion
 
     # region Produto Testes
@@ -115,4 +130,62 @@ class ModelTests(TestCase):
         wishlist_str_representation = (f'{wishlist_item.client}/'
                                        f'{wishlist_item.product}')
         self.assertEqual(str(wishlist_item), wishlist_str_representation)
+
+    def test_add_wishlist_item(self):
+        """Test adding a wishlist item reports whether it is new"""
+        produto = sample_produto()
+        cliente = sample_cliente(
+            email='cliente@luizalabs.com',
+            password='pass1234',
+            name='Client name'
+        )
+
+        # the insert and the count delta, inside a savepoint
+        with self.assertNumQueries(4):
+            item_id = models.WishlistItem.objects.add(cliente.id, produto.id)
+        with self.assertNumQueries(3):
+            repeated_id = models.WishlistItem.objects.add(
+                cliente.id, produto.id)
+
+        item = models.WishlistItem.objects.get(id=item_id)
+        self.assertEqual(item.client, cliente)
+        self.assertEqual(item.product, produto)
+        self.assertIsNone(repeated_id)
+        self.assertEqual(models.WishlistItem.objects.count(), 1)
+
+    def test_bump_wishlist_version(self):
+        """Test wishlist versions start at zero and are incremented"""
+        cliente = sample_cliente(
+            email='cliente@luizalabs.com',
+            password='pass1234',
+            name='Client name'
+        )
+
+        self.assertEqual(models.WishlistVersion.objects.current(cliente.id), 0)
+        models.WishlistVersion.objects.bump(cliente.id)
+        models.WishlistVersion.objects.bump(cliente.id)
+
+        self.assertEqual(models.WishlistVersion.objects.current(cliente.id), 2)
+
+    def test_clients_of_product(self):
+        """Test the clients of a product are streamed in keyset chunks"""
+        produto = sample_produto()
+        other = sample_produto(id=uuid.uuid4())
+        clientes = [
+            sample_cliente(email=f'cliente{i}@luizalabs.com', name='Client')
+            for i in range(5)
+        ]
+        for cliente in clientes:
+            models.WishlistItem.objects.add(cliente.id, produto.id)
+        models.WishlistItem.objects.add(clientes[0].id, other.id)
+
+        with self.assertNumQueries(3):
+            chunks = list(models.WishlistItem.objects.clients_of(
+                produto.id, 2))
+        after = list(models.WishlistItem.objects.clients_of(
+            produto.id, 10, after=clientes[2].id))
+
+        ids = [cliente.id for cliente in clientes]
+        self.assertEqual(chunks, [ids[:2], ids[2:4], ids[4:]])
+        self.assertEqual(after, [ids[3:]])
     # endregion
@@ -0,0 +1,28 @@
+import time
+
+from core.ratelimit import RateLimiter
+from django.test import SimpleTestCase
+
+
+class RateLimiterTests(SimpleTestCase):
+    """Test spacing calls to a maximum rate"""
+
+    def test_calls_are_spaced(self):
+        """Test calls do not start faster than the rate"""
+        limiter = RateLimiter(100)
+
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.wait()
+
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+    def test_zero_rate_is_unlimited(self):
+        """Test a rate of 0 never waits"""
+        limiter = RateLimiter(0)
+
+        start = time.monotonic()
+        for _ in range(1000):
+            limiter.wait()
+
+        self.assertLess(time.monotonic() - start, 0.5)
@@ -0,0 +1,69 @@
+import threading
+
+from core.singleflight import SingleFlight
+from django.test import SimpleTestCase
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Test coalescing of concurrent calls"""
+
+    def run_concurrently(self, flight, fn, count=10):
+        """Call fn through flight from count threads at once"""
+        results, errors = [], []
+
+        def worker():
+            try:
+                results.append(flight.do('key', fn))
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_calls_are_coalesced(self):
+        """Test only one call runs and every caller gets its result"""
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait(1)
+            return 'result'
+
+        timer = threading.Timer(0.1, release.set)
+        timer.start()
+        results, errors = self.run_concurrently(flight, fn)
+        timer.cancel()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['result'] * 10)
+        self.assertEqual(errors, [])
+
+    def test_errors_are_shared(self):
+        """Test waiters get the exception raised by the running call"""
+        flight = SingleFlight()
+        release = threading.Event()
+
+        def fn():
+            release.wait(1)
+            raise ValueError('failed')
+
+        timer = threading.Timer(0.1, release.set)
+        timer.start()
+        results, errors = self.run_concurrently(flight, fn)
+        timer.cancel()
+
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 10)
+
+    def test_sequential_calls_run_again(self):
+        """Test results are not kept once the call is over"""
+        flight = SingleFlight()
+
+        self.assertEqual(flight.do('key', lambda: 1), 1)
+        self.assertEqual(flight.do('key', lambda: 2), 2)
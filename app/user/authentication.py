@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+CACHE_KEY_PREFIX = 'user:auth:'
+
+# User fields kept in the cache, the others are loaded on first access
+CACHED_FIELDS = ('id', 'email', 'name', 'is_active', 'is_staff',
+                 'is_superuser')
+
+
+def _cache():
+    return caches[settings.USER_AUTH_CACHE_ALIAS]
+
+
+def _cache_key(user_id):
+    return f'{CACHE_KEY_PREFIX}{user_id}'
+
+
+def user_from_fields(fields):
+    """Build a User object from cached field values, without a query"""
+    User = get_user_model()
+    names = [
+        field.attname for field in User._meta.concrete_fields
+        if field.attname in fields
+    ]
+    return User.from_db(
+        router.db_for_read(User), names, [fields[name] for name in names])
+
+
+def invalidate(user_id):
+    """Drop the cached authentication data of a user"""
+    if settings.USER_AUTH_CACHE_TTL:
+        _cache().delete(_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the user of a token from a cache for
+    USER_AUTH_CACHE_TTL seconds, instead of loading it on every request.
+    Only the fields needed to authorize requests are cached, so views
+    that render or change the user must load it from the database.
+    """
+
+    def get_user(self, validated_token):
+        ttl = settings.USER_AUTH_CACHE_TTL
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM, None)
+        if not ttl or user_id is None:
+            return super().get_user(validated_token)
+
+        key = _cache_key(user_id)
+        fields = _cache().get(key)
+        if fields is None:
+            user = super().get_user(validated_token)
+            _cache().set(key, {
+                name: getattr(user, name) for name in CACHED_FIELDS
+            }, ttl)
+            return user
+        if not fields['is_active']:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive')
+        return user_from_fields(fields)
@@ -0,0 +1,137 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from core import dumps
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (UNUSABLE_PASSWORD_PREFIX,
+                                         identify_hasher, make_password)
+
+FORMATS = dumps.FORMATS
+
+PASSWORDS = ('hashed', 'raw')
+
+
+def read_checkpoint(path):
+    """Return the number of rows imported by a previous run, or 0"""
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(path, count):
+    """Store the number of rows imported so far, atomically"""
+    with open(f'{path}.tmp', 'w') as f:
+        f.write(f'{count}\n')
+    os.replace(f'{path}.tmp', path)
+
+
+def _hashed(password):
+    """Return the password if it is a hash Django can check, else None"""
+    if not password:
+        return make_password(None)
+    if password.startswith(UNUSABLE_PASSWORD_PREFIX):
+        return password
+    try:
+        identify_hasher(password)
+    except ValueError:
+        return None
+    return password
+
+
+class UserImporter:
+    """
+    Insert users by batches with bulk_create. Emails are normalized like
+    create_user does, and users whose email already exists, in the
+    database or earlier in the batch, are skipped. Passwords are either
+    hashes made by a Django hasher, stored as they are, or raw passwords
+    hashed across a pool of worker processes.
+    """
+
+    def __init__(self, passwords='hashed', workers=None):
+        self.passwords = passwords
+        self.executor = None
+        if passwords == 'raw' and (workers is None or workers > 1):
+            self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.stats = {'read': 0, 'created': 0, 'existing': 0, 'invalid': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def hash_passwords(self, passwords):
+        if self.passwords == 'hashed':
+            return [_hashed(password) for password in passwords]
+        if self.executor is None:
+            return [make_password(password or None) for password in passwords]
+        return list(self.executor.map(
+            make_password, [password or None for password in passwords],
+            chunksize=max(1, len(passwords) // 64),
+        ))
+
+    def load(self, rows):
+        """Insert a batch of rows, each a dict of email, name and password"""
+        User = get_user_model()
+        self.stats['read'] += len(rows)
+        batch = {}
+        for row in rows:
+            email = User.objects.normalize_email(
+                (row.get('email') or '').strip())
+            if '@' not in email:
+                self.stats['invalid'] += 1
+            elif email in batch:
+                self.stats['existing'] += 1
+            else:
+                batch[email] = row
+        existing = set(User.objects.filter(
+            email__in=list(batch)).values_list('email', flat=True))
+        self.stats['existing'] += len(existing)
+        for email in existing:
+            del batch[email]
+
+        passwords = self.hash_passwords(
+            [row.get('password') for row in batch.values()])
+        users = []
+        for (email, row), password in zip(batch.items(), passwords):
+            if password is None:
+                self.stats['invalid'] += 1
+                continue
+            users.append(User(
+                email=email, name=row.get('name') or '', password=password))
+        # a user created since the lookup above is skipped by the database
+        created = len(User.objects.insert_ignoring_existing(users))
+        self.stats['created'] += created
+        self.stats['existing'] += len(users) - created
+
+
+def import_users(lines, input_format, batch_size, passwords='hashed',
+                 workers=None, checkpoint=None, progress=None):
+    """
+    Stream users from a dump of JSON Lines or CSV with email, name and
+    password columns into the users table, by batches of batch_size
+    users. With checkpoint, the number of rows imported is stored in
+    that file after every batch, and a later run with the same file
+    skips them. progress is called after every batch with the stats so
+    far and the elapsed seconds. Returns the stats.
+    """
+    done = read_checkpoint(checkpoint) if checkpoint else 0
+    rows = itertools.islice(dumps.read_rows(lines, input_format), done, None)
+    start = time.monotonic()
+    with UserImporter(passwords, workers) as importer:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            importer.load(batch)
+            done += len(batch)
+            if checkpoint:
+                write_checkpoint(checkpoint, done)
+            if progress is not None:
+                progress(importer.stats, time.monotonic() - start)
+    return importer.stats
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from user import importer
+
+
+class Command(BaseCommand):
+    """Django command to load users exported from another system"""
+    help = 'Import users from a dump of JSON Lines or CSV with email, name ' \
+           'and password columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='User dump to import')
+        parser.add_argument(
+            '--input', choices=importer.FORMATS, default='jsonl')
+        parser.add_argument(
+            '--passwords', choices=importer.PASSWORDS, default='hashed',
+            help='Whether passwords are Django hashes or raw passwords')
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.USER_IMPORT_BATCH_SIZE)
+        parser.add_argument(
+            '--workers', type=int,
+            default=settings.USER_IMPORT_HASH_WORKERS,
+            help='Processes hashing raw passwords, 0 uses every CPU')
+        parser.add_argument(
+            '--checkpoint',
+            help='File storing the progress, to resume an interrupted import')
+
+    def progress(self, stats, elapsed):
+        rate = stats['read'] / elapsed if elapsed else 0
+        self.stdout.write(
+            'Read {read} users: {created} created, {existing} existing, '
+            '{invalid} invalid'.format(**stats) + f' ({rate:.0f} users/s)')
+
+    def handle(self, *args, **options):
+        with open(options['path'], newline='', encoding='utf-8') as f:
+            stats = importer.import_users(
+                f, options['input'], options['batch_size'],
+                passwords=options['passwords'],
+                workers=options['workers'] or None,
+                checkpoint=options['checkpoint'],
+                progress=self.progress,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Imported {created} users, skipped {existing} existing and '
+            '{invalid} invalid'.format(**stats)
+            + f' from {options["path"]}'))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from user import removals
+
+
+class Command(BaseCommand):
+    """Django command to delete the users queued for removal"""
+    help = 'Delete the data of removed users, by chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument(
+            '--interval', type=float,
+            help='Keep running, polling the queue every this many seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            removed = removals.process(batch_size=options['batch_size'])
+            if removed or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Removed {removed} users.'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
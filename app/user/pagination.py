@@ -0,0 +1,7 @@
+from core.pagination import KeysetPagination
+
+
+class UserPagination(KeysetPagination):
+    """Keyset pagination of the users listed to admins, keyed on id"""
+    page_size_setting = 'USER_PAGE_SIZE'
+    max_page_size_setting = 'USER_MAX_PAGE_SIZE'
@@ -0,0 +1,101 @@
+import logging
+
+from core.models import PendingUserRemoval, PriceDropEvent, WishlistItem
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from user import authentication
+from wishlist import changes
+
+logger = logging.getLogger(__name__)
+
+
+def schedule(user_ids):
+    """
+    Deactivate users and queue them for removal, with a few queries
+    whatever the size of their wishlists. Deactivated users can no
+    longer authenticate, their data is deleted later by process().
+    Returns the ids of the users found.
+    """
+    User = get_user_model()
+    with transaction.atomic():
+        user_ids = list(
+            User.objects.select_for_update().filter(pk__in=list(user_ids))
+            .values_list('pk', flat=True)
+        )
+        User.objects.filter(pk__in=user_ids).update(is_active=False)
+        PendingUserRemoval.objects.bulk_create(
+            [PendingUserRemoval(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+    for user_id in user_ids:
+        authentication.invalidate(user_id)
+    return user_ids
+
+
+def claim(batch_size, lease):
+    """
+    Claim up to batch_size queued removals, the oldest first. Removals
+    claimed by another worker less than lease seconds ago are skipped,
+    older claims are taken over as their worker is assumed dead.
+    Returns the ids of the claimed users.
+    """
+    now = timezone.now()
+    expired = now - timezone.timedelta(seconds=lease)
+    with transaction.atomic():
+        user_ids = list(
+            PendingUserRemoval.objects.select_for_update(skip_locked=True)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=expired))
+            .order_by('requested_at')
+            .values_list('user_id', flat=True)[:batch_size]
+        )
+        PendingUserRemoval.objects.filter(user_id__in=user_ids).update(
+            claimed_at=now)
+    return user_ids
+
+
+def _delete_chunked(queryset, chunk_size):
+    """Delete the rows of queryset by chunks, each in its own transaction"""
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.order_by().values_list(
+                'pk', flat=True)[:chunk_size])
+            queryset.model.objects.filter(pk__in=pks).delete()
+        if len(pks) < chunk_size:
+            return
+
+
+def remove(user_id, chunk_size):
+    """
+    Delete a queued user and its data. Wishlist items and price drop
+    events are deleted by chunks of chunk_size rows first, so deleting
+    the user itself never collects large cascades. Safe to run again
+    on a user that was partially removed.
+    """
+    WishlistItem.objects.remove(user_id, chunk_size)
+    _delete_chunked(PriceDropEvent.objects.filter(client_id=user_id),
+                    chunk_size)
+    get_user_model().objects.filter(pk=user_id).delete()
+    changes.wishlist_removed(user_id)
+
+
+def process(batch_size=None, lease=None, chunk_size=None):
+    """
+    Remove the queued users by batches of batch_size until the queue is
+    empty, and return the number of users removed
+    """
+    batch_size = batch_size or settings.USER_REMOVAL_BATCH_SIZE
+    lease = lease or settings.USER_REMOVAL_LEASE
+    chunk_size = chunk_size or settings.WISHLIST_DELETE_CHUNK_SIZE
+    removed = 0
+    while True:
+        user_ids = claim(batch_size, lease)
+        for user_id in user_ids:
+            remove(user_id, chunk_size)
+        removed += len(user_ids)
+        if user_ids:
+            logger.info('Removed %d users', len(user_ids))
+        if len(user_ids) < batch_size:
+            return removed
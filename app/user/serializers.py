@@ -24,13 +24,10 @@ class UserSerializer(serializers.ModelSerializer):
             )
             raise serializers.ValidationError(message, code='email')
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
-
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
 
-        return user
+        return super().update(instance, validated_data)
 
 
 class SuperuserSerializer(serializers.ModelSerializer):
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+from user.authentication import CachedJWTAuthentication
+
+ME_URL = reverse('user:me')
+REMOVE_URL = reverse('user:remove')
+
+
+def create_user(**params):
+    return get_user_model().objects.create_user(**params)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Test resolving the user of JWT authenticated requests"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(
+            email='test_user@luizalabs.com',
+            password='testpass',
+            name='Test name'
+        )
+        self.token = str(AccessToken.for_user(self.user))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def authenticate(self):
+        """Authenticate a request carrying the user token"""
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        user, _ = CachedJWTAuthentication().authenticate(request)
+        return user
+
+    def test_user_is_cached(self):
+        """Test the user is loaded once and then read from the cache"""
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+
+        self.assertEqual(user.id, self.user.id)
+        self.assertEqual(user.email, self.user.email)
+        self.assertTrue(user.is_authenticated)
+        self.assertFalse(user.is_staff)
+
+    @override_settings(USER_AUTH_CACHE_TTL=0)
+    def test_cache_disabled(self):
+        """Test the user is loaded on every request without a TTL"""
+        self.authenticate()
+
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+    def test_update_invalidates_cache(self):
+        """Test updating the profile drops the cached user"""
+        self.authenticate()
+
+        self.client.patch(ME_URL, {'name': 'new name'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'new name')
+        self.assertEqual(self.authenticate().name, 'new name')
+
+    def test_removed_user_is_rejected(self):
+        """Test the token of a removed user stops authenticating"""
+        self.authenticate()
+
+        self.client.delete(REMOVE_URL)
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
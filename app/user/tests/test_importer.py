@@ -0,0 +1,122 @@
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.test import TestCase
+from user import importer
+
+
+def jsonl(*rows):
+    """Return the lines of a JSON Lines dump"""
+    return io.StringIO(''.join(json.dumps(row) + '\n' for row in rows))
+
+
+class ImportUsersTests(TestCase):
+    """Test importing users from dumps"""
+
+    def test_import_hashed_passwords(self):
+        """Test users are created with their hashes and emails normalized"""
+        get_user_model().objects.create_user(
+            email='existing@luizalabs.com', password='pass1234')
+        lines = jsonl(
+            {'email': 'Ana@LUIZALABS.com', 'name': 'Ana',
+             'password': make_password('pass1234')},
+            {'email': 'Ana@luizalabs.com', 'name': 'Ana again',
+             'password': make_password('other123')},
+            {'email': 'existing@luizalabs.com', 'name': 'Existing',
+             'password': make_password('pass1234')},
+            {'email': 'plain@luizalabs.com', 'name': 'Plain',
+             'password': 'not a hash'},
+            {'email': 'no email', 'name': 'Nobody', 'password': ''},
+        )
+
+        stats = importer.import_users(lines, 'jsonl', 2)
+
+        user = get_user_model().objects.get(email='Ana@luizalabs.com')
+        self.assertEqual(user.name, 'Ana')
+        self.assertTrue(user.check_password('pass1234'))
+        self.assertFalse(get_user_model().objects.filter(
+            email='plain@luizalabs.com').exists())
+        self.assertEqual(stats, {
+            'read': 5, 'created': 1, 'existing': 2, 'invalid': 2})
+
+    def test_users_created_concurrently_count_as_existing(self):
+        """Test users inserted by someone else mid-batch are not created"""
+        lines = jsonl(
+            {'email': 'race@luizalabs.com', 'name': 'Race',
+             'password': make_password('pass1234')},
+            {'email': 'new@luizalabs.com', 'name': 'New',
+             'password': make_password('pass1234')},
+        )
+        hash_passwords = importer.UserImporter.hash_passwords
+
+        def hash_during_race(self, passwords):
+            get_user_model().objects.create_user(
+                email='race@luizalabs.com', password='pass1234')
+            return hash_passwords(self, passwords)
+
+        with patch.object(
+            importer.UserImporter, 'hash_passwords', hash_during_race
+        ):
+            stats = importer.import_users(lines, 'jsonl', 2)
+
+        self.assertEqual(stats, {
+            'read': 2, 'created': 1, 'existing': 1, 'invalid': 0})
+
+    def test_import_raw_passwords_in_worker_processes(self):
+        """Test raw passwords are hashed by a pool of processes"""
+        lines = io.StringIO(
+            'email,name,password\n'
+            'ana@luizalabs.com,Ana,pass1234\n'
+            'bia@luizalabs.com,Bia,pass5678\n'
+        )
+
+        importer.import_users(lines, 'csv', 10, passwords='raw', workers=2)
+
+        users = get_user_model().objects.order_by('email')
+        self.assertTrue(users[0].check_password('pass1234'))
+        self.assertTrue(users[1].check_password('pass5678'))
+
+    def test_import_resumes_from_checkpoint(self):
+        """Test rows imported by a previous run are skipped"""
+        rows = [
+            {'email': f'user{i}@luizalabs.com', 'name': f'User {i}',
+             'password': make_password(None)}
+            for i in range(5)
+        ]
+        fd, checkpoint = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, checkpoint)
+        importer.write_checkpoint(checkpoint, 3)
+
+        stats = importer.import_users(
+            jsonl(*rows), 'jsonl', 1, checkpoint=checkpoint)
+
+        self.assertEqual(stats['created'], 2)
+        self.assertEqual(
+            list(get_user_model().objects.order_by('email').values_list(
+                'email', flat=True)),
+            ['user3@luizalabs.com', 'user4@luizalabs.com'])
+        self.assertEqual(importer.read_checkpoint(checkpoint), 5)
+
+    def test_import_users_command(self):
+        """Test the command imports a dump file"""
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.jsonl', delete=False
+        ) as f:
+            f.write(json.dumps({
+                'email': 'ana@luizalabs.com', 'name': 'Ana',
+                'password': make_password('pass1234')}) + '\n')
+        self.addCleanup(os.remove, f.name)
+        out = io.StringIO()
+
+        call_command('import_users', f.name, stdout=out)
+
+        self.assertIn('Imported 1 users', out.getvalue())
+        self.assertTrue(get_user_model().objects.filter(
+            email='ana@luizalabs.com').exists())
@@ -0,0 +1,90 @@
+from core.querybudget import enforce_query_budgets
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import get_resolver, reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+CREATE_USER_URL = reverse('user:create')
+CREATE_SUPERUSER_URL = reverse('user:create-superuser')
+ME_URL = reverse('user:me')
+REMOVE_URL = reverse('user:remove')
+LIST_URL = reverse('user:list')
+
+
+def create_user(**params):
+    return get_user_model().objects.create_user(**params)
+
+
+def authenticated_client(user):
+    """Return a client authenticated with a JWT, like real requests"""
+    client = APIClient()
+    token = RefreshToken.for_user(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+@enforce_query_budgets
+class UserQueryBudgetTests(TestCase):
+    """Test the user endpoints stay within their query budgets"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = get_user_model().objects.create_superuser(
+            email='admin@luizalabs.com', password='adminpass123')
+        self.users = [
+            create_user(
+                email=f'user{i}@luizalabs.com', password='pass1234',
+                name=f'User {i}')
+            for i in range(3)
+        ]
+        self.client = authenticated_client(self.users[0])
+        self.admin_client = authenticated_client(self.admin)
+
+    def test_every_endpoint_has_a_budget(self):
+        """Test every user endpoint declares a budget for its methods"""
+        for pattern in get_resolver('user.urls').url_patterns:
+            view = pattern.callback.cls
+            for method in view.http_method_names:
+                if method in ('head', 'options') or not hasattr(view, method):
+                    continue
+                self.assertIn(method, view.query_budgets, view.__name__)
+
+    def test_create_user(self):
+        res = APIClient().post(CREATE_USER_URL, {
+            'email': 'new@luizalabs.com', 'password': 'pass1234',
+            'name': 'New'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_create_superuser(self):
+        res = self.admin_client.post(CREATE_SUPERUSER_URL, {
+            'email': 'newadmin@luizalabs.com', 'password': 'pass1234',
+            'name': 'New admin'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_retrieve_profile(self):
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_profile_with_password(self):
+        res = self.client.patch(
+            ME_URL, {'name': 'Renamed', 'password': 'newpass123'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_remove_users(self):
+        res = self.admin_client.delete(
+            REMOVE_URL, {'user_ids': [user.id for user in self.users]},
+            format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_list_users(self):
+        res = self.admin_client.get(LIST_URL)
+
+        self.assertEqual(len(res.data['results']), 4)
@@ -0,0 +1,98 @@
+import io
+import uuid
+
+from core.models import (PendingUserRemoval, PriceDropEvent, Produto,
+                         ProductWishlistCount, WishlistItem)
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from user import removals
+from wishlist import rollup
+
+
+def create_user(**params):
+    """Create a user"""
+    return get_user_model().objects.create_user(**params)
+
+
+def sample_product(**params):
+    """Create a sample product"""
+    defaults = {
+        'id': uuid.uuid4(),
+        'price': 10.9,
+        'image': 'http://challenge-api.luizalabs.com/images/sample',
+        'brand': 'sample brand',
+        'title': 'Sample product'}
+    defaults.update(params)
+
+    return Produto.objects.create(**defaults)
+
+
+class UserRemovalTests(TestCase):
+    """Test the deferred removal of users"""
+
+    def setUp(self):
+        self.user = create_user(email='user@luizalabs.com', password='pass')
+        self.other = create_user(email='other@luizalabs.com', password='pass')
+        self.products = [sample_product() for _ in range(5)]
+        for user in (self.user, self.other):
+            WishlistItem.objects.add_many(
+                user.id, [product.id for product in self.products])
+        PriceDropEvent.objects.create(
+            client=self.user, product=self.products[0],
+            old_price=10.9, new_price=9.9)
+
+    def test_schedule_deactivates_and_queues(self):
+        """Test scheduled users are deactivated but their data is kept"""
+        scheduled = removals.schedule([self.user.id, 999])
+        self.user.refresh_from_db()
+
+        self.assertEqual(scheduled, [self.user.id])
+        self.assertFalse(self.user.is_active)
+        self.assertTrue(
+            PendingUserRemoval.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            WishlistItem.objects.filter(client=self.user).count(), 5)
+
+    def test_process_removes_queued_users_by_chunks(self):
+        """Test the worker deletes queued users and uncounts their items"""
+        removals.schedule([self.user.id])
+
+        removed = removals.process(chunk_size=2)
+        rollup.fold(100)
+
+        self.assertEqual(removed, 1)
+        self.assertFalse(
+            get_user_model().objects.filter(id=self.user.id).exists())
+        self.assertFalse(
+            WishlistItem.objects.filter(client_id=self.user.id).exists())
+        self.assertFalse(PriceDropEvent.objects.exists())
+        self.assertFalse(PendingUserRemoval.objects.exists())
+        self.assertEqual(
+            WishlistItem.objects.filter(client=self.other).count(), 5)
+        self.assertEqual(
+            set(ProductWishlistCount.objects.values_list(
+                'wishlists', flat=True)), {1})
+
+    def test_claim_skips_removals_claimed_by_another_worker(self):
+        """Test recent claims are skipped and expired ones taken over"""
+        removals.schedule([self.user.id, self.other.id])
+        PendingUserRemoval.objects.filter(user=self.user).update(
+            claimed_at=timezone.now())
+        PendingUserRemoval.objects.filter(user=self.other).update(
+            claimed_at=timezone.now() - timezone.timedelta(seconds=120))
+
+        claimed = removals.claim(10, lease=60)
+
+        self.assertEqual(claimed, [self.other.id])
+
+    def test_process_user_removals_command(self):
+        """Test the command empties the removal queue"""
+        removals.schedule([self.user.id])
+        out = io.StringIO()
+
+        call_command('process_user_removals', stdout=out)
+
+        self.assertIn('Removed 1 users', out.getvalue())
+        self.assertFalse(PendingUserRemoval.objects.exists())
@@ -1,8 +1,11 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
+from user import removals
 from user.serializers import UserSerializer
 
 CREATE_USER_URL = reverse('user:create')
@@ -164,10 +167,92 @@ class PrivateUserApiTests(TestCase):
         client2.force_authenticate(user=admin)
 
         res = client2.delete(REMOVE_URL, {'user_id': another_user.id})
+        another_user.refresh_from_db()
+
+        self.assertFalse(another_user.is_active)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+        removals.process()
         users = get_user_model().objects.all()
 
         self.assertNotIn(another_user, users)
+
+    def test_remove_many_users_by_admin(self):
+        """Test that an admin user can remove several users at once"""
+        admin = get_user_model().objects.create_superuser(
+            email='adminuser@luizalabs.com',
+            password='admin1234'
+        )
+        users = [
+            create_user(email=f'user{i}@luizalabs.com', password='pass1234')
+            for i in range(2)
+        ]
+        client2 = APIClient()
+        client2.force_authenticate(user=admin)
+
+        res = client2.delete(
+            REMOVE_URL, {'user_ids': [user.id for user in users]},
+            format='json')
+        removals.process()
+
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(get_user_model().objects.filter(
+            id__in=[user.id for user in users]).exists())
+        self.assertTrue(get_user_model().objects.filter(
+            id=admin.id).exists())
+
+    def test_remove_many_users_form_encoded(self):
+        """Test that user_ids can be repeated in form encoded requests"""
+        admin = get_user_model().objects.create_superuser(
+            email='adminuser@luizalabs.com',
+            password='admin1234'
+        )
+        users = [
+            create_user(email=f'user{i}@luizalabs.com', password='pass1234')
+            for i in range(2)
+        ]
+        client2 = APIClient()
+        client2.force_authenticate(user=admin)
+
+        res = client2.delete(
+            REMOVE_URL, {'user_ids': [user.id for user in users]})
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(get_user_model().objects.filter(
+            is_active=False).count(), 2)
+
+    def test_remove_invalid_user_ids_fails(self):
+        """Test that user_ids must be a list of ids"""
+        admin = get_user_model().objects.create_superuser(
+            email='adminuser@luizalabs.com',
+            password='admin1234'
+        )
+        client2 = APIClient()
+        client2.force_authenticate(user=admin)
+
+        for user_ids in ('14', ['abc'], []):
+            res = client2.delete(
+                REMOVE_URL, {'user_ids': user_ids}, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = client2.delete(REMOVE_URL, {'user_id': 'abc'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(get_user_model().objects.filter(
+            is_active=False).exists())
+
+    def test_remove_unknown_user_not_found(self):
+        """Test that removing an unknown user fails"""
+        admin = get_user_model().objects.create_superuser(
+            email='adminuser@luizalabs.com',
+            password='admin1234'
+        )
+        client2 = APIClient()
+        client2.force_authenticate(user=admin)
+
+        res = client2.delete(REMOVE_URL, {'user_id': admin.id + 1})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_remove_user_no_admin_fails(self):
         """Test that a common user cannot remove another user"""
@@ -186,6 +271,7 @@ class PrivateUserApiTests(TestCase):
     def test_user_can_remove_own_profile(self):
         """Test that an user can remove own profile"""
         res = self.client.delete(REMOVE_URL, {'user_id': self.user.id})
+        removals.process()
         users = get_user_model().objects.all()
 
         self.assertNotIn(self.user, users)
@@ -194,6 +280,7 @@ class PrivateUserApiTests(TestCase):
     def test_remove_with_no_parameters(self):
         """Test that a delete with no parameters removes user"""
         res = self.client.delete(REMOVE_URL)
+        removals.process()
         users = get_user_model().objects.all()
 
         self.assertNotIn(self.user, users)
@@ -225,13 +312,62 @@ class PrivateUserApiTests(TestCase):
 
         client2 = APIClient()
         client2.force_authenticate(user=admin)
-        users = get_user_model().objects.all()
+        users = get_user_model().objects.order_by('id')
         serializer = UserSerializer(users, many=True)
 
         res = client2.get(LIST_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_retrieve_users_paginated_and_filtered(self):
+        """Test users are listed by pages and filtered by prefix"""
+        admin = get_user_model().objects.create_superuser(
+            email='admin@luizalabs.com',
+            password='adminpass123'
+        )
+        for i in range(3):
+            create_user(
+                email=f'customer{i}@luizalabs.com',
+                password='pass1234',
+                name=f'Customer {i}'
+            )
+        client2 = APIClient()
+        client2.force_authenticate(user=admin)
+
+        first = client2.get(LIST_URL, {'email': 'customer', 'page_size': 2})
+        last = client2.get(first.data['next'])
+        named = client2.get(LIST_URL, {'name': 'Customer 1'})
+
+        self.assertEqual(
+            [user['email'] for user in first.data['results']],
+            ['customer0@luizalabs.com', 'customer1@luizalabs.com'])
+        self.assertEqual(
+            [user['email'] for user in last.data['results']],
+            ['customer2@luizalabs.com'])
+        self.assertIsNone(last.data['next'])
+        self.assertEqual(
+            [user['name'] for user in named.data['results']],
+            ['Customer 1'])
+
+    def test_retrieve_users_jsonl(self):
+        """Test users can be streamed as JSON Lines"""
+        admin = get_user_model().objects.create_superuser(
+            email='admin@luizalabs.com',
+            password='adminpass123'
+        )
+        client2 = APIClient()
+        client2.force_authenticate(user=admin)
+
+        res = client2.get(LIST_URL, {'output': 'jsonl'})
+        invalid = client2.get(LIST_URL, {'output': 'xml'})
+
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            UserSerializer(
+                get_user_model().objects.order_by('id'), many=True).data)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_retreive_users_no_admin_fails(self):
         """Test only admin users can list all users"""
@@ -1,74 +1,137 @@
+import json
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from rest_framework_simplejwt import authentication
+from user import authentication, removals
+from user.pagination import UserPagination
 from user.serializers import SuperuserSerializer, UserSerializer
+from wishlist import changes
 
 
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system"""
     serializer_class = UserSerializer
+    query_budgets = {'post': 2}
 
 
 class CreateSuperuserView(generics.CreateAPIView):
     """Create a new superuser in the system"""
     serializer_class = SuperuserSerializer
-    authentication_classes = (authentication.JWTAuthentication,)
+    authentication_classes = (authentication.CachedJWTAuthentication,)
     permission_classes = (
         permissions.IsAuthenticated,
         permissions.IsAdminUser,
     )
+    query_budgets = {'post': 3}
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.JWTAuthentication,)
+    authentication_classes = (authentication.CachedJWTAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    query_budgets = {'get': 2, 'put': 4, 'patch': 4}
 
     def get_object(self):
-        """Retrieve and return authentication user"""
-        return self.request.user
+        """
+        Retrieve and return authentication user, from the database since
+        request.user may come from the authentication cache
+        """
+        return self.get_queryset()
 
     def get_queryset(self):
         """Get data about authenticated user"""
         return get_user_model().objects.get(id=self.request.user.id)
 
+    def perform_update(self, serializer):
+        """Update the user, which is also rendered with wishlist items"""
+        super().perform_update(serializer)
+        authentication.invalidate(serializer.instance.id)
+        changes.wishlist_changed(serializer.instance.id)
+
 
 class RemoveUserView(generics.DestroyAPIView):
     """Remove users from the system"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.JWTAuthentication,)
+    authentication_classes = (authentication.CachedJWTAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
-
-    def remove_user(self, user):
-        """Removes an user object"""
-        user.delete()
+    query_budgets = {'delete': 6}
 
     def delete(self, request, *args, **kwargs):
-        """Removes an user object"""
-        remove_id = request.data.get('user_id', None)
-        if remove_id:
-            remove_id = int(remove_id)
-            if self.request.user.id == remove_id:
-                self.remove_user(self.request.user)
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            if self.request.user.is_superuser:
-                self.remove_user(get_user_model().objects.get(pk=remove_id))
-                return Response(status=status.HTTP_204_NO_CONTENT)
+        """
+        Deactivate users and queue their removal, admins can remove
+        several users at once with user_ids
+        """
+        if 'user_ids' in request.data:
+            if hasattr(request.data, 'getlist'):
+                # form encoded, user_ids is repeated once per id
+                remove_ids = request.data.getlist('user_ids')
             else:
-                return Response(status=status.HTTP_403_FORBIDDEN)
+                remove_ids = request.data['user_ids']
+            if not isinstance(remove_ids, list) or not remove_ids:
+                return Response(status=status.HTTP_400_BAD_REQUEST)
         else:
-            self.remove_user(self.request.user)
-            return Response(status=status.HTTP_204_NO_CONTENT)
+            remove_id = request.data.get('user_id', None)
+            remove_ids = [remove_id] if remove_id else [request.user.id]
+        try:
+            remove_ids = {int(remove_id) for remove_id in remove_ids}
+        except (TypeError, ValueError):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if len(remove_ids) > settings.USER_REMOVAL_MAX_IDS:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if remove_ids != {request.user.id} and not request.user.is_superuser:
+            return Response(status=status.HTTP_403_FORBIDDEN)
+        if not removals.schedule(remove_ids):
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class ListUsersView(generics.ListAPIView):
-    """List users from the system"""
+    """
+    List users from the system, by pages keyed on id, or all of them as
+    a stream of JSON Lines with ?output=jsonl. Users can be filtered by
+    email and name prefix.
+    """
     serializer_class = UserSerializer
-    authentication_classes = (authentication.JWTAuthentication,)
+    authentication_classes = (authentication.CachedJWTAuthentication,)
     permission_classes = (
         permissions.IsAuthenticated,
         permissions.IsAdminUser,
     )
+    pagination_class = UserPagination
+    query_budgets = {'get': 2}
     queryset = get_user_model().objects.all()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        email = self.request.query_params.get('email', None)
+        if email:
+            queryset = queryset.filter(email__startswith=email)
+        name = self.request.query_params.get('name', None)
+        if name:
+            queryset = queryset.filter(name__startswith=name)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        output = request.query_params.get('output', None)
+        if output is None:
+            return super().list(request, *args, **kwargs)
+        if output != 'jsonl':
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        return StreamingHttpResponse(
+            self.jsonl_lines(), content_type='application/x-ndjson')
+
+    def jsonl_lines(self):
+        """Yield every user as JSON, read by chunks from a cursor"""
+        fields = [
+            name for name, field in self.get_serializer().fields.items()
+            if not field.write_only
+        ]
+        rows = self.get_queryset().order_by('id').values_list(
+            *fields).iterator(chunk_size=settings.USER_EXPORT_CHUNK_SIZE)
+        for row in rows:
+            yield json.dumps(
+                dict(zip(fields, row)), ensure_ascii=False) + '\n'
@@ -0,0 +1,418 @@
+import logging
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from rest_framework import status
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset((
+    status.HTTP_429_TOO_MANY_REQUESTS,
+    status.HTTP_502_BAD_GATEWAY,
+    status.HTTP_503_SERVICE_UNAVAILABLE,
+    status.HTTP_504_GATEWAY_TIMEOUT,
+))
+
+
+class CatalogError(Exception):
+    """Raised when the external product catalog could not be reached"""
+
+
+class CatalogUnavailable(CatalogError):
+    """Raised without calling the catalog while the circuit is open"""
+
+    def __init__(self, retry_after):
+        super().__init__(
+            f'Catalog circuit is open, retry after {retry_after} seconds')
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stop calling the catalog while it is failing or too slow. Outcomes of
+    the last window calls are kept; once at least min_calls are known,
+    the circuit opens if the rate of failures or of calls slower than
+    slow_call_seconds reaches its threshold. An open circuit fails fast
+    for open_seconds, then lets a single probe call through (half open):
+    the circuit closes if it succeeds and opens again otherwise.
+
+    One breaker is shared by every thread using the same client.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, window=None, min_calls=None, failure_rate=None,
+                 slow_call_seconds=None, slow_call_rate=None,
+                 open_seconds=None):
+        self.window = window or settings.CATALOG_BREAKER_WINDOW
+        self.min_calls = min_calls or settings.CATALOG_BREAKER_MIN_CALLS
+        self.failure_rate = (
+            failure_rate or settings.CATALOG_BREAKER_FAILURE_RATE)
+        self.slow_call_seconds = (
+            slow_call_seconds or settings.CATALOG_BREAKER_SLOW_CALL_SECONDS)
+        self.slow_call_rate = (
+            slow_call_rate or settings.CATALOG_BREAKER_SLOW_CALL_RATE)
+        self.open_seconds = (
+            open_seconds or settings.CATALOG_BREAKER_OPEN_SECONDS)
+        self._lock = threading.Lock()
+        self._close()
+
+    def _close(self):
+        self.state = self.CLOSED
+        self._outcomes = deque(maxlen=self.window)
+        self._opened_at = None
+        self._probing = False
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+
+    def before_call(self):
+        """
+        Raise CatalogUnavailable unless a call may be made now, and
+        return whether the call is the probe of a half open circuit
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            elapsed = time.monotonic() - self._opened_at
+            if self.state == self.OPEN and elapsed >= self.open_seconds:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            retry_after = max(1, math.ceil(self.open_seconds - elapsed))
+        raise CatalogUnavailable(retry_after)
+
+    def record(self, success, seconds, probe=False):
+        """
+        Record the outcome of a call allowed by before_call, with the
+        probe flag it returned. Calls started before the circuit opened
+        are ignored until the probe decides whether it closes.
+        """
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if not probe:
+                    return
+                if success and not slow:
+                    self._close()
+                else:
+                    self._open()
+                return
+            if self.state != self.CLOSED:
+                return
+            self._outcomes.append((success, slow))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for ok, _ in self._outcomes if not ok)
+            slow_calls = sum(1 for _, is_slow in self._outcomes if is_slow)
+            if (
+                failures / calls >= self.failure_rate
+                or slow_calls / calls >= self.slow_call_rate
+            ):
+                self._open()
+
+
+class HedgeStats:
+    """Counters of the hedged requests of this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.hedged = 0
+            self.hedge_wins = 0
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def reserve_hedge(self, max_ratio):
+        """
+        Count a hedge and return True if it keeps the hedges within
+        max_ratio of the requests, checked and counted atomically
+        """
+        with self._lock:
+            if self.hedged + 1 > max_ratio * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    def record_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+                'hedge_ratio': (
+                    self.hedged / self.requests if self.requests else 0.0),
+                'hedge_win_ratio': (
+                    self.hedge_wins / self.hedged if self.hedged else 0.0),
+            }
+
+
+class Hedger:
+    """
+    Send a second, hedged, copy of a request when the first one has not
+    answered after the given percentile of recent latencies, and return
+    whichever answers first. Hedges are only sent once min_samples
+    latencies are known, and never for more than max_ratio of the
+    requests, so they cannot double the load of a slow catalog.
+
+    Up to workers requests that may be hedged, and as many hedges, are
+    sent from a pool of threads, so the caller can return whichever
+    answers first. Nothing waits in the queue of the pool: a request
+    finding no free worker is sent from the calling thread, unhedged,
+    and a hedge finding none is not sent. The stats are logged every
+    stats_interval seconds.
+    """
+
+    def __init__(self, percentile=None, min_delay=None, max_ratio=None,
+                 min_samples=None, workers=None, stats_interval=None):
+        self.percentile = percentile or settings.CATALOG_HEDGE_PERCENTILE
+        self.min_delay = (
+            settings.CATALOG_HEDGE_MIN_DELAY if min_delay is None
+            else min_delay
+        )
+        self.max_ratio = (
+            settings.CATALOG_HEDGE_MAX_RATIO if max_ratio is None
+            else max_ratio
+        )
+        self.min_samples = (
+            min_samples or settings.CATALOG_HEDGE_MIN_SAMPLES)
+        self.stats_interval = (
+            settings.CATALOG_HEDGE_STATS_INTERVAL if stats_interval is None
+            else stats_interval
+        )
+        self._latencies = deque(maxlen=settings.CATALOG_HEDGE_WINDOW)
+        self._lock = threading.Lock()
+        workers = workers or settings.CATALOG_HEDGE_WORKERS
+        self._request_slots = threading.BoundedSemaphore(workers)
+        self._hedge_slots = threading.BoundedSemaphore(workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=2 * workers, thread_name_prefix='catalog-hedge')
+        self._logged_at = time.monotonic()
+        self.stats = HedgeStats()
+
+    def delay(self):
+        """Seconds to wait for a request before hedging it, or None"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        index = min(
+            len(latencies) - 1,
+            math.ceil(len(latencies) * self.percentile / 100) - 1,
+        )
+        return max(self.min_delay, latencies[index])
+
+    def _timed(self, fn):
+        start = time.monotonic()
+        result = fn()
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+        return result
+
+    def _run(self, slots, fn):
+        """Call fn in the pool on an acquired slot, released when done"""
+        future = self._executor.submit(self._timed, fn)
+        future.add_done_callback(lambda _: slots.release())
+        return future
+
+    def _may_hedge(self):
+        snapshot = self.stats.snapshot()
+        return snapshot['hedged'] + 1 <= self.max_ratio * snapshot['requests']
+
+    def _hedge(self, fn):
+        """Send a hedge on a free worker within max_ratio, or return None"""
+        if not self._hedge_slots.acquire(blocking=False):
+            return None
+        if not self.stats.reserve_hedge(self.max_ratio):
+            self._hedge_slots.release()
+            return None
+        return self._run(self._hedge_slots, fn)
+
+    def _log_stats(self):
+        if not self.stats_interval:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._logged_at < self.stats_interval:
+                return
+            self._logged_at = now
+        logger.info('Catalog hedging stats: %s', self.stats.snapshot())
+
+    def call(self, fn):
+        """Call fn, hedging it if it is slow, and return the first result"""
+        self.stats.record_request()
+        self._log_stats()
+        delay = self.delay()
+        if (
+            delay is None or not self._may_hedge()
+            or not self._request_slots.acquire(blocking=False)
+        ):
+            return self._timed(fn)
+        first = self._run(self._request_slots, fn)
+        done, _ = wait([first], timeout=delay)
+        hedge = None if done else self._hedge(fn)
+        if hedge is None:
+            return first.result()
+
+        error = None
+        for future in as_completed([first, hedge]):
+            if future.exception() is None:
+                won = future is hedge
+                if won:
+                    self.stats.record_win()
+                logger.debug(
+                    'Hedged catalog request after %.3f s, hedge %s',
+                    delay, 'won' if won else 'lost')
+                return future.result()
+            error = error or future.exception()
+        raise error
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class CatalogClient:
+    """Pooled, keep-alive HTTP client for the external product catalog"""
+
+    def __init__(self, base_url=None, connect_timeout=None,
+                 read_timeout=None, max_retries=None, backoff=None,
+                 pool_maxsize=None, breaker=None, hedger=None):
+        self.base_url = (base_url or settings.CATALOG_URL).rstrip('/')
+        self.timeout = (
+            connect_timeout or settings.CATALOG_CONNECT_TIMEOUT,
+            read_timeout or settings.CATALOG_READ_TIMEOUT,
+        )
+        self.max_retries = (
+            settings.CATALOG_MAX_RETRIES if max_retries is None
+            else max_retries
+        )
+        self.backoff = (
+            settings.CATALOG_RETRY_BACKOFF if backoff is None else backoff
+        )
+        self.session = self._build_session(
+            pool_maxsize or settings.CATALOG_POOL_MAXSIZE
+        )
+        self.breaker = breaker or CircuitBreaker()
+        if hedger is None and settings.CATALOG_HEDGE_ENABLED:
+            hedger = Hedger()
+        self.hedger = hedger
+
+    @staticmethod
+    def _build_session(pool_maxsize):
+        """Build a session that keeps up to pool_maxsize connections open"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_maxsize,
+            max_retries=0,
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def _sleep_before_retry(self, attempt):
+        """Wait an exponentially growing, fully jittered interval"""
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def get_product(self, product_id):
+        """
+        Return the catalog payload for product_id, or None when the
+        catalog answers that the product does not exist. Raises
+        CatalogUnavailable right away while the circuit is open.
+        """
+        probe = self.breaker.before_call()
+        start = time.monotonic()
+        success = False
+        try:
+            payload = self._get_product(product_id)
+            success = True
+        finally:
+            # any error fails the call, or a failed probe would keep
+            # the circuit half open forever
+            self.breaker.record(success, time.monotonic() - start, probe)
+        return payload
+
+    def _send(self, url):
+        if self.hedger is None:
+            return self.session.get(url, timeout=self.timeout)
+        return self.hedger.call(
+            lambda: self.session.get(url, timeout=self.timeout))
+
+    def _get_product(self, product_id):
+        url = f'{self.base_url}/{product_id}/'
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                res = self._send(url)
+            except requests.RequestException as exc:
+                if last_attempt:
+                    raise CatalogError(str(exc)) from exc
+            else:
+                if res.status_code == status.HTTP_200_OK:
+                    try:
+                        return res.json()
+                    except ValueError as exc:
+                        raise CatalogError(str(exc)) from exc
+                if res.status_code == status.HTTP_404_NOT_FOUND:
+                    return None
+                if last_attempt or res.status_code not in RETRY_STATUSES:
+                    raise CatalogError(
+                        f'Catalog answered {res.status_code} for {url}'
+                    )
+            self._sleep_before_retry(attempt)
+
+    def close(self):
+        self.session.close()
+        if self.hedger is not None:
+            self.hedger.close()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the client shared by every thread of this process.
+    A new one is built after a fork so pooled sockets are never shared
+    between worker processes.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = CatalogClient()
+                _client_pid = pid
+    return _client
+
+
+def reset_client():
+    """Drop the shared client, so the next call picks up new settings"""
+    global _client
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
@@ -0,0 +1,65 @@
+from core.models import WishlistItem, WishlistVersion
+from django.conf import settings
+from django.utils.http import parse_etags
+from wishlist import membership, products, response_cache
+
+
+def wishlist_changed(client_id):
+    """
+    Record a change to a client wishlist, or to data rendered with it,
+    bumping its version and dropping what is cached from it. Call it
+    after the change is written.
+    """
+    WishlistVersion.objects.bump(client_id)
+    membership.invalidate(client_id)
+    response_cache.invalidate(client_id)
+
+
+def wishlist_removed(client_id):
+    """Drop what is cached from the wishlist of a removed client"""
+    membership.invalidate(client_id)
+    response_cache.invalidate(client_id)
+
+
+def products_changed(product_ids):
+    """
+    Drop the cached copies of changed products and bump the version of
+    every wishlist holding them, so their cached responses and ETags
+    stop being served.
+    """
+    lookup = products.get_lookup()
+    for product_id in product_ids:
+        lookup.invalidate(product_id)
+    clients = WishlistItem.objects.filter(
+        product_id__in=product_ids
+    ).order_by('client_id').values_list('client_id', flat=True).distinct()
+    chunk_size = settings.WISHLIST_VERSION_BUMP_CHUNK_SIZE
+    chunk = []
+    for client_id in clients.iterator(chunk_size):
+        chunk.append(client_id)
+        if len(chunk) == chunk_size:
+            WishlistVersion.objects.bump_many(chunk)
+            chunk = []
+    WishlistVersion.objects.bump_many(chunk)
+
+
+def wishlist_version(client_id):
+    """Return the current version of a client wishlist"""
+    return WishlistVersion.objects.current(client_id)
+
+
+def wishlist_etag(client_id, version, request):
+    """
+    Return the ETag of the response to request for a version of a client
+    wishlist, which differs between URLs, pages and expanded variants
+    """
+    digest = response_cache.request_digest(request)
+    return f'"{client_id}-{version}-{digest}"'
+
+
+def etag_matches(etag, if_none_match):
+    """Verify if an If-None-Match header matches etag"""
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in etags or f'W/{etag}' in etags
@@ -0,0 +1,102 @@
+import csv
+import datetime
+import json
+
+from core.models import WishlistItem
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+FORMATS = ('csv', 'jsonl')
+
+# (output column, lookup) of every exported field
+COLUMNS = (
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('client_id', 'client_id'),
+    ('client_email', 'client__email'),
+    ('product_id', 'product_id'),
+    ('title', 'product__title'),
+    ('brand', 'product__brand'),
+    ('price', 'product__price'),
+    ('image', 'product__image'),
+    ('review_score', 'product__review_score'),
+)
+HEADER = tuple(column for column, _ in COLUMNS)
+
+
+class _Echo:
+    """File-like object that returns what is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def parse_moment(value, end=False):
+    """
+    Parse an ISO date or datetime. A date means its start, or the start
+    of the following day when end is set. Raises ValueError.
+    """
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value!r}')
+        if end:
+            day += datetime.timedelta(days=1)
+        moment = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, timezone.utc)
+    return moment
+
+
+def export_queryset(product=None, brand=None, since=None, until=None):
+    """
+    Return the wishlist items to export, filtered by product id, brand and
+    creation date range [since, until), each filter backed by an index.
+    Items without a creation date are left out of date ranges.
+    """
+    queryset = WishlistItem.objects.order_by()
+    if product is not None:
+        queryset = queryset.filter(product_id=product)
+    if brand is not None:
+        queryset = queryset.filter(product__brand=brand)
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    return queryset
+
+
+def export_rows(queryset, chunk_size):
+    """Stream rows through a server side cursor, chunk_size at a time"""
+    lookups = [lookup for _, lookup in COLUMNS]
+    return queryset.values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def csv_lines(rows):
+    """Yield the CSV lines of rows, header first"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(
+            value.isoformat() if isinstance(value, datetime.datetime)
+            else value
+            for value in row
+        )
+
+
+def jsonl_lines(rows):
+    """Yield one JSON object per row"""
+    for row in rows:
+        data = dict(zip(HEADER, row))
+        if data['created_at'] is not None:
+            data['created_at'] = data['created_at'].isoformat()
+        data['product_id'] = str(data['product_id'])
+        yield json.dumps(data, ensure_ascii=False) + '\n'
+
+
+def export_lines(output, rows):
+    """Yield rows formatted as output, one of FORMATS"""
+    if output == 'csv':
+        return csv_lines(rows)
+    return jsonl_lines(rows)
@@ -0,0 +1,87 @@
+import uuid
+
+from rest_framework import serializers
+
+CONVERTERS = (
+    (serializers.BooleanField, bool),
+    (serializers.IntegerField, int),
+    (serializers.FloatField, float),
+    (serializers.UUIDField, str),
+    (serializers.CharField, str),
+)
+
+_projections = {}
+
+
+def _relation_value(value):
+    """Render a related primary key as the JSON encoder would"""
+    return str(value) if isinstance(value, uuid.UUID) else value
+
+
+def _converter(field):
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return _relation_value
+    for field_class, converter in CONVERTERS:
+        if isinstance(field, field_class):
+            return converter
+    raise TypeError(
+        f'{field.__class__.__name__} {field.field_name!r} is not supported '
+        'by the fast read path'
+    )
+
+
+class Projection:
+    """
+    A serializer class compiled into the lookups to pass to values_list()
+    and, for each output key, the index of its column and a plain
+    converter producing what the serializer field and the JSON encoder
+    would. Rows are turned into dicts without any serializer machinery.
+    """
+
+    def __init__(self, serializer_class):
+        self.lookups = []
+        self._layout = self._compile(serializer_class(), '')
+
+    def _compile(self, serializer, prefix):
+        layout = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            lookup = f'{prefix}{field.source}'
+            if isinstance(field, serializers.BaseSerializer):
+                layout.append(
+                    (name, None, self._compile(field, f'{lookup}__')))
+                continue
+            layout.append((name, len(self.lookups), _converter(field)))
+            self.lookups.append(lookup)
+        return layout
+
+    def values_list(self, queryset):
+        """Return queryset rows holding only the columns to be rendered"""
+        return queryset.values_list(*self.lookups, named=True)
+
+    def _build(self, row, layout):
+        data = {}
+        for name, index, converter in layout:
+            if index is None:
+                data[name] = self._build(row, converter)
+            else:
+                value = row[index]
+                data[name] = None if value is None else converter(value)
+        return data
+
+    def to_representation(self, row):
+        return self._build(row, self._layout)
+
+    def many_to_representation(self, rows):
+        build, layout = self._build, self._layout
+        return [build(row, layout) for row in rows]
+
+
+def get_projection(serializer_class):
+    """Return the compiled projection of serializer_class"""
+    projection = _projections.get(serializer_class)
+    if projection is None:
+        projection = _projections[serializer_class] = Projection(
+            serializer_class)
+    return projection
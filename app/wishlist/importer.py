@@ -0,0 +1,209 @@
+import csv
+import io
+import logging
+import time
+
+from core import dumps
+from core.models import Produto
+from django.db import connection, models, transaction
+from django.utils import timezone
+from wishlist import changes, pricedrops, products, rollup
+
+logger = logging.getLogger(__name__)
+
+FORMATS = dumps.FORMATS
+
+STAGING_TABLE = 'core_produto_import'
+
+# Fields compared to tell whether an imported product changed
+DATA_FIELDS = tuple(
+    field for field in Produto._meta.concrete_fields
+    if field.attname not in ('id', 'last_synced_at')
+)
+
+
+def chunked(payloads, chunk_size, stats):
+    """
+    Group payloads into Produto objects by chunks, the last one wins.
+    Payloads are counted in stats, and invalid ones skipped.
+    """
+    chunk = {}
+    for payload in payloads:
+        stats['read'] += 1
+        try:
+            product = products.product_from_payload(payload)
+        except products.InvalidPayload as exc:
+            stats['invalid'] += 1
+            logger.warning('Skipped product row %d: %s', stats['read'], exc)
+            continue
+        chunk[product.id] = product
+        if len(chunk) == chunk_size:
+            yield list(chunk.values())
+            chunk = {}
+    if chunk:
+        yield list(chunk.values())
+
+
+def _apply_changes(changed):
+    """
+    Propagate the changes of existing products, given as rows of id, old
+    and new brand, old and new price: move the brand rollups and record
+    prices and price drops.
+    """
+    if not changed:
+        return
+    now = timezone.now()
+    rollup.move_brands({
+        product_id: (old_brand, new_brand)
+        for product_id, old_brand, new_brand, _, _ in changed
+        if old_brand != new_brand
+    })
+    changed_prices, drops = pricedrops.detect({
+        product_id: (old_price, new_price)
+        for product_id, _, _, old_price, new_price in changed
+    })
+    pricedrops.record(changed_prices, now)
+    pricedrops.emit(drops, now)
+
+
+class CopyImporter:
+    """
+    Load products with COPY into a temporary staging table, then merge
+    them into Produto with a single INSERT ... ON CONFLICT DO UPDATE that
+    only rewrites the rows that changed. PostgreSQL only.
+    """
+
+    def __init__(self):
+        qn = connection.ops.quote_name
+        self.columns = [
+            field.column for field in Produto._meta.concrete_fields]
+        self.table = qn(Produto._meta.db_table)
+        self.staging = qn(STAGING_TABLE)
+        columns = ', '.join(qn(column) for column in self.columns)
+        data = [qn(field.column) for field in DATA_FIELDS]
+        pk = qn(Produto._meta.pk.column)
+        brand = qn(Produto._meta.get_field('brand').column)
+        price = qn(Produto._meta.get_field('price').column)
+
+        def row(alias):
+            return ', '.join(f'{alias}.{column}' for column in data)
+
+        # unquoted empty values are NULL, except for not null text columns
+        not_null = ', '.join(
+            qn(field.column) for field in Produto._meta.concrete_fields
+            if isinstance(field, models.CharField) and not field.null
+        )
+        self.copy_sql = (
+            f'COPY {self.staging} ({columns}) FROM STDIN '
+            f'WITH (FORMAT csv, FORCE_NOT_NULL ({not_null}))'
+        )
+        self.changes_sql = (
+            f'SELECT s.{pk}, p.{brand}, s.{brand}, p.{price}, s.{price} '
+            f'FROM {self.staging} s JOIN {self.table} p ON p.{pk} = s.{pk} '
+            f'WHERE ({row("p")}) IS DISTINCT FROM ({row("s")})'
+        )
+        self.merge_sql = (
+            f'INSERT INTO {self.table} ({columns}) '
+            f'SELECT {columns} FROM {self.staging} '
+            f'ON CONFLICT ({pk}) DO UPDATE SET '
+            + ', '.join(
+                f'{qn(column)} = EXCLUDED.{qn(column)}'
+                for column in self.columns if qn(column) != pk
+            )
+            + f' WHERE ({row(self.table)}) IS DISTINCT FROM '
+            f'({row("EXCLUDED")})'
+        )
+
+    def __enter__(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {self.staging} '
+                f'(LIKE {self.table} INCLUDING DEFAULTS)'
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.staging}')
+
+    def load(self, chunk):
+        """Merge a chunk of products, returning the ids of changed ones"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for product in chunk:
+            writer.writerow([
+                getattr(product, field.attname)
+                for field in Produto._meta.concrete_fields
+            ])
+        buffer.seek(0)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {self.staging}')
+            cursor.copy_expert(self.copy_sql, buffer)
+            cursor.execute(self.changes_sql)
+            changed = cursor.fetchall()
+            cursor.execute(self.merge_sql)
+            _apply_changes(changed)
+        return [row[0] for row in changed]
+
+
+class BulkImporter:
+    """Merge products into Produto with the ORM, on any database"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def load(self, chunk):
+        """Merge a chunk of products, returning the ids of changed ones"""
+        with transaction.atomic():
+            stored = Produto.objects.select_for_update().in_bulk(
+                [product.id for product in chunk])
+            new, updated, changed = [], [], []
+            for product in chunk:
+                old = stored.get(product.id)
+                if old is None:
+                    new.append(product)
+                elif any(
+                    getattr(old, field.attname) !=
+                    getattr(product, field.attname)
+                    for field in DATA_FIELDS
+                ):
+                    updated.append(product)
+                    changed.append(
+                        (product.id, old.brand, product.brand,
+                         old.price, product.price))
+            Produto.objects.bulk_create(new, ignore_conflicts=True)
+            Produto.objects.bulk_update(updated, [
+                field.attname for field in Produto._meta.concrete_fields
+                if field.attname != 'id'
+            ])
+            _apply_changes(changed)
+        return [row[0] for row in changed]
+
+
+def import_products(lines, input_format, chunk_size, progress=None):
+    """
+    Stream a catalog dump into Produto by chunks of chunk_size products,
+    with COPY on PostgreSQL and bulk queries elsewhere, so memory stays
+    constant whatever the size of the dump. Rows missing a field or with
+    a bad value are counted as invalid and skipped. progress is called
+    after every chunk with the stats so far and the elapsed seconds.
+    Returns the stats: rows read and invalid rows.
+    """
+    importer = (
+        CopyImporter() if connection.vendor == 'postgresql'
+        else BulkImporter()
+    )
+    start = time.monotonic()
+    stats = {'read': 0, 'invalid': 0}
+    with importer:
+        payloads = dumps.read_rows(lines, input_format)
+        for chunk in chunked(payloads, chunk_size, stats):
+            changed = importer.load(chunk)
+            if changed:
+                changes.products_changed(changed)
+            if progress is not None:
+                progress(stats, time.monotonic() - start)
+    return stats
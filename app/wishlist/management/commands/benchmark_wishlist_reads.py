@@ -0,0 +1,89 @@
+import time
+import uuid
+
+from core.models import Produto, WishlistItem
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+
+class _Rollback(Exception):
+    """Raised to discard the benchmark data"""
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare the serializer and the fast wishlist read
+    paths. Sample data is created inside a transaction that is rolled
+    back at the end. Requests go through the test client, so its host
+    is allowed for the run, and the response cache is disabled so every
+    request builds its response.
+    """
+    help = 'Benchmark the wishlist read endpoints with and without ' \
+           'WISHLIST_FAST_READS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                WISHLIST_RESPONSE_CACHE_TTL=0,
+            ):
+                self.run(options['items'], options['repeat'])
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def run(self, items, repeat):
+        user = get_user_model().objects.create_user(
+            email=f'benchmark-{uuid.uuid4().hex}@luizalabs.com',
+            password=None,
+            name='Benchmark',
+        )
+        products = Produto.objects.bulk_create([
+            Produto(
+                id=uuid.uuid4(), price=10.0 + index, image='image',
+                brand='brand', title=f'Product {index}', review_score=4.5,
+            )
+            for index in range(items)
+        ])
+        WishlistItem.objects.bulk_create([
+            WishlistItem(client=user, product=product)
+            for product in products
+        ])
+        detail_id = WishlistItem.objects.filter(client=user).first().id
+
+        client = APIClient()
+        client.force_authenticate(user=user)
+        list_url = reverse('wishlist:wishlistitem-list')
+        cases = (
+            ('list', list_url, {'page_size': items}),
+            ('list?expand=product', list_url,
+             {'page_size': items, 'expand': 'product'}),
+            ('retrieve',
+             reverse('wishlist:wishlistitem-detail', args=[detail_id]), {}),
+        )
+        for name, url, params in cases:
+            timings = {}
+            for fast in (False, True):
+                with override_settings(WISHLIST_FAST_READS=fast):
+                    res = client.get(url, params)
+                    if res.status_code != 200:
+                        raise CommandError(
+                            f'{name} answered {res.status_code}')
+                    start = time.perf_counter()
+                    for _ in range(repeat):
+                        client.get(url, params)
+                    timings[fast] = (
+                        (time.perf_counter() - start) / repeat * 1000)
+            self.stdout.write(
+                f'{name}: serializers {timings[False]:.2f} ms, '
+                f'fast path {timings[True]:.2f} ms '
+                f'({timings[False] / timings[True]:.1f}x)'
+            )
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from wishlist import export, products
+
+
+class Command(BaseCommand):
+    """Django command to export every wishlist item to a local file"""
+    help = 'Export wishlist items joined with user email and product ' \
+           'fields as CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to write the export to')
+        parser.add_argument(
+            '--output', choices=export.FORMATS, default='csv')
+        parser.add_argument('--product', help='Only this product id')
+        parser.add_argument('--brand', help='Only products of this brand')
+        parser.add_argument(
+            '--since', help='Only items created from this date or time')
+        parser.add_argument(
+            '--until', help='Only items created up to this date or time')
+        parser.add_argument(
+            '--chunk-size', type=int,
+            default=settings.WISHLIST_EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        product = options['product']
+        if product is not None:
+            product = products.parse_product_id(product)
+            if product is None:
+                raise CommandError('Invalid product id.')
+        since, until = options['since'], options['until']
+        try:
+            if since is not None:
+                since = export.parse_moment(since)
+            if until is not None:
+                until = export.parse_moment(until, end=True)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        queryset = export.export_queryset(
+            product=product,
+            brand=options['brand'],
+            since=since,
+            until=until,
+        )
+        rows = export.export_rows(queryset, options['chunk_size'])
+        count = 0
+        with open(options['path'], 'w', newline='', encoding='utf-8') as f:
+            for line in export.export_lines(options['output'], rows):
+                f.write(line)
+                count += 1
+        if options['output'] == 'csv':
+            count -= 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {count} wishlist items to {options["path"]}'))
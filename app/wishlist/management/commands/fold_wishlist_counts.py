@@ -0,0 +1,29 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from wishlist import rollup
+
+
+class Command(BaseCommand):
+    """Django command to apply logged wishlist count deltas to the rollups"""
+    help = 'Fold the wishlist count deltas into the product and brand ' \
+           'rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.WISHLIST_COUNT_FOLD_BATCH_SIZE)
+        parser.add_argument(
+            '--interval', type=float,
+            help='Keep running, folding every this many seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            folded = rollup.fold(options['batch_size'])
+            if folded or not options['interval']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Folded {folded} wishlist count deltas.'))
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
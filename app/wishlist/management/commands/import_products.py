@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from wishlist import importer
+
+
+class Command(BaseCommand):
+    """Django command to load a catalog dump into the products table"""
+    help = 'Import products from a catalog dump, as JSON Lines or CSV in ' \
+           'the shape returned by the catalog API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Catalog dump to import')
+        parser.add_argument(
+            '--input', choices=importer.FORMATS, default='jsonl')
+        parser.add_argument(
+            '--chunk-size', type=int,
+            default=settings.PRODUCT_IMPORT_CHUNK_SIZE)
+
+    def progress(self, stats, elapsed):
+        rate = stats['read'] / elapsed if elapsed else 0
+        self.stdout.write(
+            'Read {read} products, {invalid} invalid'.format(**stats)
+            + f' ({rate:.0f} products/s)')
+
+    def handle(self, *args, **options):
+        with open(options['path'], newline='', encoding='utf-8') as f:
+            stats = importer.import_products(
+                f, options['input'], options['chunk_size'],
+                progress=self.progress,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats["read"] - stats["invalid"]} products, skipped '
+            f'{stats["invalid"]} invalid from {options["path"]}'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from wishlist import catalog, sync
+
+
+class Command(BaseCommand):
+    """Django command to refresh stale products from the catalog"""
+    help = 'Refresh wishlisted products from the external catalog, least ' \
+           'recently synced first'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, help='Refresh at most this many products')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--workers', type=int)
+        parser.add_argument(
+            '--rate', type=float,
+            help='Catalog requests per second, 0 for no limit')
+        parser.add_argument(
+            '--stale-after', type=int,
+            help='Skip products synced less than this many seconds ago')
+
+    def handle(self, *args, **options):
+        stats = sync.ProductSync(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            rate=options['rate'],
+            stale_after=options['stale_after'],
+        ).run(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            'Checked {checked} products: {updated} updated, {missing} not '
+            'in the catalog, {failed} failed, {invalid} invalid, '
+            '{price_drops} price drops notified to {events} '
+            'wishlists.'.format(**stats)))
+        hedger = catalog.get_client().hedger
+        if hedger is not None:
+            self.stdout.write(
+                'Hedged {hedged} of {requests} catalog requests, '
+                '{hedge_wins} hedges won.'.format(**hedger.stats.snapshot()))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from wishlist import rollup
+
+
+class Command(BaseCommand):
+    """Django command to print the most wishlisted products or brands"""
+    help = 'Print the most wishlisted products, or brands, from the rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--brands', action='store_true',
+            help='Rank brands instead of products')
+        parser.add_argument(
+            '--limit', type=int, default=settings.WISHLIST_TOP_DEFAULT_LIMIT)
+
+    def handle(self, *args, **options):
+        if options['brands']:
+            for count in rollup.top_brands(options['limit']):
+                self.stdout.write(f'{count.wishlists}\t{count.brand}')
+        else:
+            for count in rollup.top_products(options['limit']):
+                self.stdout.write(
+                    f'{count.wishlists}\t{count.product_id}\t'
+                    f'{count.product.title}')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from wishlist import rollup
+
+
+class Command(BaseCommand):
+    """Django command to reconcile the wishlist rollups with a recount"""
+    help = 'Compare the product and brand wishlist rollups against a full ' \
+           'recount of the wishlist items'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Correct mismatched rollups to the recounted values')
+
+    def handle(self, *args, **options):
+        product_mismatches, brand_mismatches = rollup.verify()
+        for product_id, (stored, counted) in product_mismatches.items():
+            self.stdout.write(
+                f'product {product_id}: stored {stored}, counted {counted}')
+        for brand, (stored, counted) in brand_mismatches.items():
+            self.stdout.write(
+                f'brand {brand}: stored {stored}, counted {counted}')
+        mismatches = len(product_mismatches) + len(brand_mismatches)
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Wishlist counts match.'))
+            return
+        if not options['fix']:
+            raise CommandError(f'{mismatches} wishlist counts mismatch.')
+        rollup.fix(product_mismatches, brand_mismatches)
+        self.stdout.write(self.style.SUCCESS(
+            f'Fixed {mismatches} wishlist counts.'))
@@ -0,0 +1,50 @@
+from core.models import WishlistItem
+from django.conf import settings
+from django.core.cache import cache
+
+CACHE_KEY_PREFIX = 'wishlist:membership:'
+
+
+def _cache_key(client_id):
+    return f'{CACHE_KEY_PREFIX}{client_id}'
+
+
+def _cached_products(client_id):
+    """
+    Return the set of products on a client wishlist from the cache,
+    loading it when missing. Returns None when the cache is disabled.
+    """
+    timeout = settings.WISHLIST_MEMBERSHIP_CACHE_TTL
+    if not timeout:
+        return None
+    key = _cache_key(client_id)
+    product_ids = cache.get(key)
+    if product_ids is None:
+        product_ids = frozenset(
+            WishlistItem.objects.filter(
+                client_id=client_id
+            ).values_list('product_id', flat=True)
+        )
+        cache.set(key, product_ids, timeout)
+    return product_ids
+
+
+def contains(client_id, product_ids):
+    """Return which of product_ids are on the client wishlist"""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return set()
+    cached = _cached_products(client_id)
+    if cached is not None:
+        return product_ids & cached
+    return set(
+        WishlistItem.objects.filter(
+            client_id=client_id, product_id__in=product_ids
+        ).values_list('product_id', flat=True)
+    )
+
+
+def invalidate(client_id):
+    """Drop the cached set of products of a client wishlist"""
+    if settings.WISHLIST_MEMBERSHIP_CACHE_TTL:
+        cache.delete(_cache_key(client_id))
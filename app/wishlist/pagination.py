@@ -0,0 +1,7 @@
+from core.pagination import KeysetPagination
+
+
+class WishlistPagination(KeysetPagination):
+    """Keyset pagination of a client wishlist, keyed on (client_id, id)"""
+    page_size_setting = 'WISHLIST_PAGE_SIZE'
+    max_page_size_setting = 'WISHLIST_MAX_PAGE_SIZE'
@@ -0,0 +1,56 @@
+from core.models import PriceDropEvent, PriceHistory, WishlistItem
+from django.conf import settings
+
+
+def detect(refreshed):
+    """
+    Compare refreshed prices with the stored ones. refreshed maps product
+    ids to their stored and their refreshed price. Return the changed
+    prices and, among them, the drops, both in the same shape.
+    """
+    changed = {
+        product_id: prices for product_id, prices in refreshed.items()
+        if prices[0] != prices[1]
+    }
+    drops = {
+        product_id: prices for product_id, prices in changed.items()
+        if prices[1] < prices[0]
+    }
+    return changed, drops
+
+
+def record(changed, recorded_at):
+    """Append the new prices of changed products to the price history"""
+    PriceHistory.objects.bulk_create(
+        PriceHistory(product_id=product_id, price=new, recorded_at=recorded_at)
+        for product_id, (_, new) in changed.items()
+    )
+
+
+def emit(drops, created_at):
+    """
+    Write a price drop event for every wishlist holding a product whose
+    price dropped. Wishlists are read from the (product, client) index
+    with a server side cursor and events inserted by batches, so the
+    memory used does not grow with the number of wishlists. Returns the
+    number of events written.
+    """
+    if not drops:
+        return 0
+    batch_size = settings.PRICE_DROP_EVENT_BATCH_SIZE
+    items = WishlistItem.objects.filter(
+        product_id__in=list(drops)
+    ).order_by().values_list('client_id', 'product_id')
+    emitted, batch = 0, []
+    for client_id, product_id in items.iterator(batch_size):
+        old, new = drops[product_id]
+        batch.append(PriceDropEvent(
+            client_id=client_id, product_id=product_id,
+            old_price=old, new_price=new, created_at=created_at,
+        ))
+        if len(batch) == batch_size:
+            PriceDropEvent.objects.bulk_create(batch)
+            emitted += len(batch)
+            batch = []
+    PriceDropEvent.objects.bulk_create(batch)
+    return emitted + len(batch)
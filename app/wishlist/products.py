@@ -0,0 +1,343 @@
+import threading
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from core.cache import LocalLRUCache
+from core.models import Produto
+from core.singleflight import SingleFlight
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import connection, router, transaction
+from django.utils import timezone
+from wishlist import catalog
+
+CACHE_KEY_PREFIX = 'wishlist:product:'
+
+# Produto fields every product payload must hold a value for
+REQUIRED_FIELDS = tuple(
+    field.attname for field in Produto._meta.concrete_fields
+    if not field.null
+)
+
+# fields is None for products the catalog said do not exist
+CacheEntry = namedtuple(
+    'CacheEntry', ('fields', 'fresh_until', 'stale_until'))
+
+
+class InvalidPayload(ValueError):
+    """Raised for a product payload missing a field or with a bad value"""
+
+
+def parse_product_id(product_id):
+    """Return product_id as an UUID, or None if it is not a valid one"""
+    if isinstance(product_id, uuid.UUID):
+        return product_id
+    try:
+        return uuid.UUID(str(product_id))
+    except ValueError:
+        return None
+
+
+def product_fields(product):
+    """Return the concrete field values of a Produto object"""
+    return {
+        field.attname: field.to_python(getattr(product, field.attname))
+        for field in Produto._meta.concrete_fields
+    }
+
+
+def product_from_fields(fields):
+    """Build a Produto object from cached field values, without a query"""
+    return Produto.from_db(
+        router.db_for_read(Produto), list(fields), list(fields.values())
+    )
+
+
+def product_from_payload(payload):
+    """
+    Build a Produto object from a catalog payload fetched just now.
+    Raises InvalidPayload when a required field is missing or a value
+    cannot be converted.
+    """
+    payload = dict(payload)
+    if payload.get('reviewScore', None):
+        payload['review_score'] = payload.pop('reviewScore')
+    payload.pop('last_synced_at', None)
+    missing = [name for name in REQUIRED_FIELDS if payload.get(name) is None]
+    if missing:
+        raise InvalidPayload(
+            f'Product payload without {", ".join(missing)}')
+    fields = {field.attname: field for field in Produto._meta.concrete_fields}
+    try:
+        return Produto(last_synced_at=timezone.now(), **{
+            name: fields[name].to_python(value)
+            for name, value in payload.items() if name in fields
+        })
+    except ValidationError as exc:
+        raise InvalidPayload('; '.join(exc.messages)) from exc
+
+
+def create_product(payload):
+    """
+    Create product on DB from a catalog payload. Inserting a product
+    that already exists is a no-op, so concurrent creations are safe.
+    """
+    product = product_from_payload(payload)
+    Produto.objects.bulk_create([product], ignore_conflicts=True)
+    return product
+
+
+def advisory_lock_key(product_id):
+    """Map an UUID to the signed 64 bit key of a PostgreSQL advisory lock"""
+    key = product_id.int >> 64
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+class ProductLookup:
+    """
+    Resolve products through an in-process LRU, an optional shared
+    Django cache, the database and finally the external catalog.
+
+    Products the catalog does not know are cached as negative entries
+    with their own TTL. Known products past their TTL are still served
+    while they are revalidated in the background, and keep being served
+    for as long as the catalog is failing.
+
+    Concurrent loads of the same product share a single database and
+    catalog round trip per process, and optionally per database through
+    a PostgreSQL advisory lock.
+    """
+
+    def __init__(self):
+        self.local = LocalLRUCache(settings.PRODUCT_CACHE_SIZE)
+        alias = settings.PRODUCT_CACHE_ALIAS
+        self.shared = caches[alias] if alias else None
+        self._revalidating = set()
+        self._revalidating_lock = threading.Lock()
+        self._executor = None
+        self._flight = SingleFlight()
+
+    def _cache_key(self, product_id):
+        return f'{CACHE_KEY_PREFIX}{product_id}'
+
+    def _get_entry(self, key):
+        entry = self.local.get(key)
+        if entry is None and self.shared is not None:
+            entry = self.shared.get(key)
+            if entry is not None:
+                self.local.set(key, entry)
+        return entry
+
+    def _set_entry(self, key, fields):
+        now = time.time()
+        if fields is None:
+            ttl = stale_ttl = settings.PRODUCT_CACHE_NEGATIVE_TTL
+        else:
+            ttl = settings.PRODUCT_CACHE_TTL
+            stale_ttl = ttl + settings.PRODUCT_CACHE_STALE_TTL
+        entry = CacheEntry(fields, now + ttl, now + stale_ttl)
+        self.local.set(key, entry)
+        if self.shared is not None:
+            self.shared.set(key, entry, timeout=stale_ttl)
+
+    def get(self, product_id):
+        """Return the Produto for product_id, or None if it does not exist"""
+        product_id = parse_product_id(product_id)
+        if product_id is None:
+            return None
+        key = self._cache_key(product_id)
+        entry = self._get_entry(key)
+        if entry is not None:
+            now = time.time()
+            if now < entry.fresh_until:
+                return self._to_product(entry.fields)
+            if entry.fields is not None and now < entry.stale_until:
+                self._schedule_revalidation(product_id)
+                return product_from_fields(entry.fields)
+        try:
+            fields = self._flight.do(product_id, self._load, product_id)
+        except catalog.CatalogError:
+            if entry is not None and entry.fields is not None:
+                return product_from_fields(entry.fields)
+            raise
+        self._set_entry(key, fields)
+        return self._to_product(fields)
+
+    def get_many(self, product_ids):
+        """
+        Resolve several products at once. Products missing from the cache
+        are loaded with a single query, and the ones missing from the
+        database are fetched from the catalog concurrently and inserted
+        together.
+
+        Return a dict of the products found keyed by UUID, and the set of
+        ids that could not be resolved because the catalog failed.
+        """
+        found, failed, stale, missing = {}, set(), {}, []
+        now = time.time()
+        for product_id in filter(None, map(parse_product_id, product_ids)):
+            entry = self._get_entry(self._cache_key(product_id))
+            if entry is not None and now < entry.fresh_until:
+                if entry.fields is not None:
+                    found[product_id] = product_from_fields(entry.fields)
+            elif entry is not None and entry.fields is not None:
+                stale[product_id] = entry.fields
+                if now < entry.stale_until:
+                    self._schedule_revalidation(product_id)
+                    found[product_id] = product_from_fields(entry.fields)
+                else:
+                    missing.append(product_id)
+            else:
+                missing.append(product_id)
+        if not missing:
+            return found, failed
+
+        for product in Produto.objects.filter(id__in=missing):
+            fields = product_fields(product)
+            self._set_entry(self._cache_key(product.id), fields)
+            found[product.id] = product_from_fields(fields)
+        missing = [pid for pid in missing if pid not in found]
+        if not missing:
+            return found, failed
+
+        payloads = self._fetch_payloads(missing)
+        created = []
+        for product_id in missing:
+            payload = payloads.get(product_id)
+            if isinstance(payload, catalog.CatalogError):
+                if product_id in stale:
+                    found[product_id] = product_from_fields(stale[product_id])
+                else:
+                    failed.add(product_id)
+            elif payload is None:
+                self._set_entry(self._cache_key(product_id), None)
+            else:
+                created.append(product_from_payload(payload))
+        Produto.objects.bulk_create(created, ignore_conflicts=True)
+        for product in created:
+            fields = product_fields(product)
+            self._set_entry(self._cache_key(product.id), fields)
+            found[product.id] = product_from_fields(fields)
+        return found, failed
+
+    def _fetch_payloads(self, product_ids):
+        """
+        Fetch catalog payloads concurrently, with a bounded pool of
+        threads. Failed fetches map to the CatalogError they raised.
+        """
+        client = catalog.get_client()
+
+        def fetch(product_id):
+            try:
+                return self._flight.do(
+                    ('catalog', product_id), client.get_product, product_id
+                )
+            except catalog.CatalogError as exc:
+                return exc
+
+        workers = min(settings.CATALOG_BULK_WORKERS, len(product_ids))
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='catalog-bulk'
+        ) as executor:
+            return dict(zip(product_ids, executor.map(fetch, product_ids)))
+
+    def _to_product(self, fields):
+        return None if fields is None else product_from_fields(fields)
+
+    def _load(self, product_id):
+        """Load product fields from the database or the external catalog"""
+        product = Produto.objects.filter(id=product_id).first()
+        if product is None:
+            if self._use_advisory_lock():
+                return self._fetch_locked(product_id)
+            return self._fetch(product_id)
+        return product_fields(product)
+
+    def _use_advisory_lock(self):
+        return (
+            settings.PRODUCT_FETCH_ADVISORY_LOCK
+            and connection.vendor == 'postgresql'
+        )
+
+    def _fetch(self, product_id):
+        """Fetch a product from the external catalog and store it"""
+        payload = catalog.get_client().get_product(product_id)
+        if payload is None:
+            return None
+        return product_fields(create_product(payload))
+
+    def _fetch_locked(self, product_id):
+        """Fetch a product holding a lock shared by every process"""
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT pg_advisory_xact_lock(%s)',
+                    [advisory_lock_key(product_id)],
+                )
+            product = Produto.objects.filter(id=product_id).first()
+            if product is not None:
+                return product_fields(product)
+            return self._fetch(product_id)
+
+    def _schedule_revalidation(self, product_id):
+        with self._revalidating_lock:
+            if product_id in self._revalidating:
+                return
+            self._revalidating.add(product_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=settings.PRODUCT_CACHE_REVALIDATE_WORKERS,
+                    thread_name_prefix='product-revalidate',
+                )
+        self._executor.submit(self._revalidate_in_background, product_id)
+
+    def _revalidate_in_background(self, product_id):
+        try:
+            self.revalidate(product_id)
+        finally:
+            connection.close()
+
+    def revalidate(self, product_id):
+        """Refresh the cache entry for product_id"""
+        try:
+            fields = self._flight.do(product_id, self._load, product_id)
+            self._set_entry(self._cache_key(product_id), fields)
+        except catalog.CatalogError:
+            pass
+        finally:
+            with self._revalidating_lock:
+                self._revalidating.discard(product_id)
+
+    def invalidate(self, product_id):
+        key = self._cache_key(product_id)
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def clear(self):
+        """Drop every locally cached product"""
+        self.local.clear()
+
+
+_lookup = None
+_lookup_lock = threading.Lock()
+
+
+def get_lookup():
+    """Return the product lookup shared by every thread of this process"""
+    global _lookup
+    if _lookup is None:
+        with _lookup_lock:
+            if _lookup is None:
+                _lookup = ProductLookup()
+    return _lookup
+
+
+def reset_lookup():
+    """Drop the shared lookup, so the next call picks up new settings"""
+    global _lookup
+    with _lookup_lock:
+        _lookup = None
@@ -0,0 +1,168 @@
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'wishlist:response:'
+
+
+class CacheStats:
+    """Hit ratio and rebuild time counters of this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._logged_at = time.monotonic()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.rebuilds = 0
+            self.rebuild_seconds = 0.0
+
+    def record_hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def record_rebuild(self, seconds):
+        with self._lock:
+            self.rebuilds += 1
+            self.rebuild_seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'rebuilds': self.rebuilds,
+                'avg_rebuild_ms': (
+                    self.rebuild_seconds / self.rebuilds * 1000
+                    if self.rebuilds else 0.0
+                ),
+            }
+
+    def log(self, interval):
+        """Log the snapshot if it was last logged interval seconds ago"""
+        if not interval:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._logged_at < interval:
+                return
+            self._logged_at = now
+        logger.info('Wishlist response cache stats: %s', self.snapshot())
+
+
+stats = CacheStats()
+
+
+def enabled():
+    return bool(settings.WISHLIST_RESPONSE_CACHE_TTL)
+
+
+def _cache():
+    return caches[settings.WISHLIST_RESPONSE_CACHE_ALIAS]
+
+
+def _index_key(client_id):
+    return f'{CACHE_KEY_PREFIX}{client_id}:keys'
+
+
+def request_digest(request):
+    """Digest of the full URL of a request, telling its variants apart"""
+    return hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+
+
+def _cache_key(client_id, version, request):
+    """Key a response by user, wishlist version and full request URL"""
+    return f'{CACHE_KEY_PREFIX}{client_id}:{version}:{request_digest(request)}'
+
+
+def _plain(data):
+    """Copy serializer output into plain containers that pickle cheaply"""
+    if isinstance(data, dict):
+        return {key: _plain(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_plain(value) for value in data]
+    return data
+
+
+def _remember_key(cache, client_id, key, timeout):
+    """Track the keys cached for a client, so they can be deleted"""
+    index_key = _index_key(client_id)
+    keys = cache.get(index_key) or set()
+    keys.add(key)
+    cache.set(index_key, keys, timeout)
+
+
+def get_or_build(client_id, version, request, build):
+    """
+    Return the response data of request from the cache, or build it.
+    Concurrent misses for the same key wait for a single rebuild, and
+    only fall back to building the data themselves if it takes longer
+    than WISHLIST_RESPONSE_CACHE_LOCK_WAIT seconds.
+
+    Returns the data and whether it came from the cache. The hit ratio
+    and rebuild times are logged every WISHLIST_RESPONSE_CACHE_STATS_INTERVAL
+    seconds.
+    """
+    stats.log(settings.WISHLIST_RESPONSE_CACHE_STATS_INTERVAL)
+    cache = _cache()
+    key = _cache_key(client_id, version, request)
+    data = cache.get(key)
+    if data is not None:
+        stats.record_hit()
+        return data, True
+
+    lock_key = f'{key}:lock'
+    wait = settings.WISHLIST_RESPONSE_CACHE_LOCK_WAIT
+    if not cache.add(lock_key, 1, timeout=max(1, int(wait * 2))):
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            data = cache.get(key)
+            if data is not None:
+                # served by the rebuild of another request
+                stats.record_hit()
+                return data, True
+        stats.record_miss()
+        return build(), False
+    stats.record_miss()
+
+    try:
+        start = time.perf_counter()
+        data = _plain(build())
+        elapsed = time.perf_counter() - start
+        timeout = settings.WISHLIST_RESPONSE_CACHE_TTL
+        cache.set(key, data, timeout)
+        _remember_key(cache, client_id, key, timeout)
+    finally:
+        cache.delete(lock_key)
+    stats.record_rebuild(elapsed)
+    logger.debug(
+        'Rebuilt wishlist response %s in %.2f ms', key, elapsed * 1000)
+    return data, False
+
+
+def invalidate(client_id):
+    """Delete every response cached for a client"""
+    if not enabled():
+        return
+    cache = _cache()
+    index_key = _index_key(client_id)
+    keys = cache.get(index_key)
+    if keys:
+        cache.delete_many(list(keys))
+    cache.delete(index_key)
@@ -0,0 +1,157 @@
+from collections import Counter
+from contextlib import contextmanager
+
+from core.models import (BrandWishlistCount, ProductWishlistCount,
+                         WishlistCountDelta, WishlistItem)
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+
+def top_products(limit):
+    """Return the rollups of the limit most wishlisted products"""
+    return list(
+        ProductWishlistCount.objects.filter(wishlists__gt=0)
+        .select_related('product').order_by('-wishlists', 'product_id')
+        [:limit]
+    )
+
+
+def top_brands(limit):
+    """Return the rollups of the limit most wishlisted brands"""
+    return list(
+        BrandWishlistCount.objects.filter(wishlists__gt=0)
+        .order_by('-wishlists', 'brand')[:limit]
+    )
+
+
+def move_brands(moves):
+    """
+    Move the wishlist counts of products whose brand changed, given as
+    a mapping of product ids to their old and new brand. Call it in the
+    transaction that changes the brands. The product rollups are locked
+    like fold() does, so deltas folded concurrently land on the old
+    brand before being moved, or on the new one after.
+    """
+    if not moves:
+        return
+    counts = ProductWishlistCount.objects.select_for_update().filter(
+        product_id__in=list(moves), wishlists__gt=0
+    ).order_by('product_id').values_list('product_id', 'wishlists')
+    deltas = Counter()
+    for product_id, wishlists in counts:
+        old_brand, new_brand = moves[product_id]
+        deltas[old_brand] -= wishlists
+        deltas[new_brand] += wishlists
+    BrandWishlistCount.objects.adjust(deltas)
+
+
+def fold(batch_size):
+    """
+    Apply the wishlist count deltas logged by wishlist writes to the
+    product and brand rollups, by batches of batch_size log rows, each
+    summed per product, applied and deleted in its own transaction.
+    Concurrent folds skip the rows locked by each other. Returns the
+    number of log rows folded.
+    """
+    folded = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                WishlistCountDelta.objects.select_for_update(skip_locked=True)
+                .order_by('id').values_list('id', 'product_id', 'delta')
+                [:batch_size]
+            )
+            deltas = Counter()
+            for _, product_id, delta in rows:
+                deltas[product_id] += delta
+            ProductWishlistCount.objects.adjust(deltas)
+            WishlistCountDelta.objects.filter(
+                id__in=[row[0] for row in rows]).delete()
+        folded += len(rows)
+        if len(rows) < batch_size:
+            return folded
+
+
+def count_products():
+    """Count the wishlists of each product from the wishlist items"""
+    return dict(
+        WishlistItem.objects.order_by().values_list('product_id')
+        .annotate(Count('id'))
+    )
+
+
+def count_brands():
+    """Count the wishlist items of each brand from the wishlist items"""
+    return dict(
+        WishlistItem.objects.order_by().values_list('product__brand')
+        .annotate(Count('id'))
+    )
+
+
+def _pending(key):
+    return dict(
+        WishlistCountDelta.objects.order_by().values_list(key)
+        .annotate(Sum('delta'))
+    )
+
+
+def _mismatches(model, key, expected, pending):
+    stored = Counter(dict(model.objects.values_list(key, 'wishlists')))
+    stored.update(pending)
+    return {
+        value: (stored.get(value, 0), expected.get(value, 0))
+        for value in set(stored) | set(expected)
+        if stored.get(value, 0) != expected.get(value, 0)
+    }
+
+
+@contextmanager
+def _snapshot():
+    """
+    Run the queries of the block in one transaction that sees a single
+    snapshot of the database, so counts read by separate queries agree
+    while wishlists keep changing
+    """
+    outermost = not connection.in_atomic_block
+    with transaction.atomic():
+        # SQLite transactions already read from a single snapshot
+        if outermost and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        yield
+
+
+def verify():
+    """
+    Compare the rollups, with the deltas not folded yet, against a full
+    recount of the wishlist items, all read from one snapshot. Return
+    the mismatched products and brands, each a dict mapping the product
+    id or brand to its stored and its recounted value.
+    """
+    with _snapshot():
+        return (
+            _mismatches(
+                ProductWishlistCount, 'product_id', count_products(),
+                _pending('product_id')),
+            _mismatches(
+                BrandWishlistCount, 'brand', count_brands(),
+                _pending('product__brand')),
+        )
+
+
+def fix(product_mismatches, brand_mismatches):
+    """
+    Correct mismatched rollups by the difference between their recounted
+    and stored values. Corrections are added rather than overwriting the
+    counts, so changes made since verify() read its snapshot are kept.
+    """
+    with transaction.atomic():
+        ProductWishlistCount.objects.adjust({
+            product_id: counted - stored
+            for product_id, (stored, counted) in product_mismatches.items()
+        }, brands=False)
+        BrandWishlistCount.objects.adjust({
+            brand: counted - stored
+            for brand, (stored, counted) in brand_mismatches.items()
+        })
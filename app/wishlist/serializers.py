@@ -23,3 +23,13 @@ class WishlistItemDetailSerializer(WishlistItemSerializer):
     """Serialize a wishlist item detail"""
     client = UserSerializer(read_only=True)
     product = ProdutoSerializer(read_only=True)
+
+
+class WishlistItemProductSerializer(serializers.ModelSerializer):
+    """Serialize a wishlist item with its product details"""
+    product = ProdutoSerializer(read_only=True)
+
+    class Meta:
+        model = WishlistItem
+        fields = ('id', 'product',)
+        read_only_fields = ('id',)
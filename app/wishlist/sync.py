@@ -0,0 +1,185 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from core.models import Produto, WishlistItem
+from core.ratelimit import RateLimiter
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BooleanField, Exists, OuterRef
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from wishlist import catalog, changes, pricedrops, products, rollup
+
+logger = logging.getLogger(__name__)
+
+# Produto fields refreshed from the catalog
+SYNCED_FIELDS = tuple(
+    field.attname for field in Produto._meta.concrete_fields
+    if field.attname not in ('id', 'last_synced_at')
+)
+
+
+def _synced_after(synced_at, product_id):
+    """
+    Return the condition (last_synced_at, id) > (synced_at, product_id)
+    as a row comparison, so the walk is a range scan of the
+    (last_synced_at, id) index
+    """
+    qn = connection.ops.quote_name
+    columns = ', '.join(
+        f'{qn(Produto._meta.db_table)}.{qn(name)}'
+        for name in ('last_synced_at', 'id')
+    )
+    params = [
+        Produto._meta.get_field(name).get_db_prep_value(value, connection)
+        for name, value in (
+            ('last_synced_at', synced_at), ('id', product_id))
+    ]
+    return RawSQL(
+        f'({columns}) > (%s, %s)', params, output_field=BooleanField())
+
+
+def stale_products(synced_before, limit, after=None):
+    """
+    Return up to limit wishlisted products not synced since
+    synced_before, the never synced first and then the least recently
+    synced. after is the (last_synced_at, id) of the last product
+    already walked, so a walk continues past products that could not be
+    refreshed. Both parts are walked in the order of the
+    (last_synced_at, id) index, the never synced by id within its
+    nulls.
+    """
+    wishlisted = Exists(WishlistItem.objects.filter(product=OuterRef('pk')))
+    synced_at, product_id = after if after is not None else (None, None)
+    batch = []
+    if synced_at is None:
+        never_synced = Produto.objects.filter(
+            wishlisted, last_synced_at__isnull=True)
+        if product_id is not None:
+            never_synced = never_synced.filter(id__gt=product_id)
+        batch = list(never_synced.order_by('id')[:limit])
+        if len(batch) == limit:
+            return batch
+    synced = Produto.objects.filter(
+        wishlisted, last_synced_at__lt=synced_before)
+    if synced_at is not None:
+        synced = synced.filter(_synced_after(synced_at, product_id))
+    return batch + list(
+        synced.order_by('last_synced_at', 'id')[:limit - len(batch)])
+
+
+class ProductSync:
+    """
+    Refresh stale products from the external catalog by batches. Each
+    batch is fetched concurrently, with at most workers requests in
+    flight and rate requests started per second, and written with one
+    bulk_update. Price changes are appended to the price history and
+    price drops written to the outbox of PriceDropEvent in the same
+    transaction. Progress is stored on last_synced_at as every batch is
+    committed, so an interrupted sync resumes with what is still stale.
+    Products whose payload is invalid are counted and left stale.
+    """
+
+    def __init__(self, batch_size=None, workers=None, rate=None,
+                 stale_after=None):
+        self.batch_size = batch_size or settings.PRODUCT_REFRESH_BATCH_SIZE
+        self.workers = workers or settings.PRODUCT_REFRESH_WORKERS
+        self.limiter = RateLimiter(
+            settings.PRODUCT_REFRESH_RATE if rate is None else rate)
+        self.stale_after = (
+            settings.PRODUCT_REFRESH_STALE_AFTER if stale_after is None
+            else stale_after
+        )
+        self.stats = {
+            'checked': 0, 'updated': 0, 'missing': 0, 'failed': 0,
+            'invalid': 0, 'price_drops': 0, 'events': 0,
+        }
+
+    def run(self, limit=None):
+        """Refresh up to limit stale products, and return the stats"""
+        synced_before = timezone.now() - timezone.timedelta(
+            seconds=self.stale_after)
+        client = catalog.get_client()
+
+        def fetch(product):
+            self.limiter.wait()
+            try:
+                return client.get_product(product.id)
+            except catalog.CatalogError as exc:
+                return exc
+
+        after = None
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix='product-refresh'
+        ) as executor:
+            while limit is None or self.stats['checked'] < limit:
+                size = self.batch_size
+                if limit is not None:
+                    size = min(size, limit - self.stats['checked'])
+                batch = stale_products(synced_before, size, after)
+                if not batch:
+                    break
+                after = (batch[-1].last_synced_at, batch[-1].id)
+                payloads = list(executor.map(fetch, batch))
+                self.sync_batch(batch, payloads)
+                if any(
+                    isinstance(payload, catalog.CatalogUnavailable)
+                    for payload in payloads
+                ):
+                    # the catalog circuit opened, leave the rest stale
+                    break
+        return self.stats
+
+    def sync_batch(self, batch, payloads):
+        """Write the catalog payloads fetched for a batch of products"""
+        now = timezone.now()
+        synced, changed, moves, prices = [], [], {}, {}
+        for product, payload in zip(batch, payloads):
+            self.stats['checked'] += 1
+            if isinstance(payload, catalog.CatalogError):
+                self.stats['failed'] += 1
+                continue
+            if payload is None:
+                synced.append(product.id)
+                self.stats['missing'] += 1
+                continue
+            try:
+                fresh = products.product_from_payload(payload)
+            except products.InvalidPayload as exc:
+                # left stale like failed products, the walk moves past it
+                self.stats['invalid'] += 1
+                logger.warning(
+                    'Invalid catalog payload for product %s: %s',
+                    product.id, exc)
+                continue
+            synced.append(product.id)
+            if all(
+                getattr(product, name) == getattr(fresh, name)
+                for name in SYNCED_FIELDS
+            ):
+                continue
+            if product.brand != fresh.brand:
+                moves[product.id] = (product.brand, fresh.brand)
+            prices[product.id] = (product.price, fresh.price)
+            for name in SYNCED_FIELDS:
+                setattr(product, name, getattr(fresh, name))
+            product.last_synced_at = now
+            changed.append(product)
+
+        with transaction.atomic():
+            Produto.objects.bulk_update(
+                changed, SYNCED_FIELDS + ('last_synced_at',))
+            Produto.objects.filter(id__in=synced).exclude(
+                id__in=[product.id for product in changed]
+            ).update(last_synced_at=now)
+            rollup.move_brands(moves)
+            changed_prices, drops = pricedrops.detect(prices)
+            pricedrops.record(changed_prices, now)
+            events = pricedrops.emit(drops, now)
+        self.stats['updated'] += len(changed)
+        self.stats['price_drops'] += len(drops)
+        self.stats['events'] += events
+        if changed:
+            changes.products_changed([product.id for product in changed])
+        logger.info(
+            'Synced %d products, %d changed', len(synced), len(changed))
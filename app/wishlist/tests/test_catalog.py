@@ -0,0 +1,317 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import requests
+from django.test import SimpleTestCase, override_settings
+from rest_framework import status
+from wishlist import catalog
+
+PRODUCT_ID = 'af04c0ee-7137-4848-fd33-a2d148412095'
+
+
+def sample_response(status_code, payload=None):
+    """Create a sample catalog response"""
+    res = MagicMock(status_code=status_code)
+    res.json.return_value = payload
+    return res
+
+
+@patch('time.sleep', return_value=None)
+class CatalogClientTests(SimpleTestCase):
+    """Test the external catalog client"""
+
+    def setUp(self):
+        self.catalog = catalog.CatalogClient(
+            base_url='http://catalog.test/api/product',
+            connect_timeout=0.5,
+            read_timeout=1.5,
+            max_retries=2,
+        )
+        self.catalog.session = MagicMock()
+
+    def test_get_product_found(self, ts):
+        """Test a found product returns the catalog payload"""
+        payload = {'id': PRODUCT_ID, 'title': 'Product'}
+        self.catalog.session.get.return_value = sample_response(
+            status.HTTP_200_OK, payload)
+
+        product = self.catalog.get_product(PRODUCT_ID)
+
+        self.assertEqual(product, payload)
+        self.catalog.session.get.assert_called_once_with(
+            f'http://catalog.test/api/product/{PRODUCT_ID}/',
+            timeout=(0.5, 1.5),
+        )
+
+    def test_get_product_not_found(self, ts):
+        """Test a 404 answer means the product does not exist"""
+        self.catalog.session.get.return_value = sample_response(
+            status.HTTP_404_NOT_FOUND)
+
+        self.assertIsNone(self.catalog.get_product(PRODUCT_ID))
+        self.assertEqual(self.catalog.session.get.call_count, 1)
+        ts.assert_not_called()
+
+    def test_retries_transient_errors(self, ts):
+        """Test timeouts and 503 answers are retried with backoff"""
+        self.catalog.session.get.side_effect = [
+            requests.Timeout(),
+            sample_response(status.HTTP_503_SERVICE_UNAVAILABLE),
+            sample_response(status.HTTP_200_OK, {'id': PRODUCT_ID}),
+        ]
+
+        product = self.catalog.get_product(PRODUCT_ID)
+
+        self.assertEqual(product, {'id': PRODUCT_ID})
+        self.assertEqual(ts.call_count, 2)
+
+    def test_retries_are_bounded(self, ts):
+        """Test the client gives up after max_retries"""
+        self.catalog.session.get.side_effect = requests.ConnectionError()
+
+        with self.assertRaises(catalog.CatalogError):
+            self.catalog.get_product(PRODUCT_ID)
+        self.assertEqual(self.catalog.session.get.call_count, 3)
+
+    def test_unexpected_status_is_not_retried(self, ts):
+        """Test a non transient error status fails right away"""
+        self.catalog.session.get.return_value = sample_response(
+            status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        with self.assertRaises(catalog.CatalogError):
+            self.catalog.get_product(PRODUCT_ID)
+        self.assertEqual(self.catalog.session.get.call_count, 1)
+
+    @override_settings(CATALOG_POOL_MAXSIZE=25)
+    def test_shared_client_is_pooled(self, ts):
+        """Test the process wide client is reused and sized by settings"""
+        catalog.reset_client()
+        self.addCleanup(catalog.reset_client)
+
+        client = catalog.get_client()
+        adapter = client.session.get_adapter('http://catalog.test/')
+
+        self.assertIs(catalog.get_client(), client)
+        self.assertEqual(adapter._pool_maxsize, 25)
+
+
+@patch('wishlist.catalog.time.monotonic')
+class CircuitBreakerTests(SimpleTestCase):
+    """Test the circuit breaker of the catalog client"""
+
+    def setUp(self):
+        self.breaker = catalog.CircuitBreaker(
+            window=4, min_calls=4, failure_rate=0.5,
+            slow_call_seconds=1.0, slow_call_rate=0.75, open_seconds=30)
+        self.catalog = catalog.CatalogClient(
+            base_url='http://catalog.test/api/product',
+            max_retries=0, breaker=self.breaker)
+        self.catalog.session = MagicMock()
+
+    def fail_calls(self, count):
+        """Make count failing catalog calls"""
+        self.catalog.session.get.return_value = sample_response(
+            status.HTTP_500_INTERNAL_SERVER_ERROR)
+        for _ in range(count):
+            with self.assertRaises(catalog.CatalogError):
+                self.catalog.get_product(PRODUCT_ID)
+
+    def test_opens_on_failure_rate(self, monotonic):
+        """Test the circuit opens and fails fast with a retry delay"""
+        monotonic.return_value = 100.0
+        self.fail_calls(2)
+        self.catalog.session.get.return_value = sample_response(
+            status.HTTP_404_NOT_FOUND)
+        self.catalog.get_product(PRODUCT_ID)
+        self.assertEqual(self.breaker.state, catalog.CircuitBreaker.CLOSED)
+        self.catalog.get_product(PRODUCT_ID)
+
+        monotonic.return_value = 110.0
+        with self.assertRaises(catalog.CatalogUnavailable) as cm:
+            self.catalog.get_product(PRODUCT_ID)
+
+        self.assertEqual(self.breaker.state, catalog.CircuitBreaker.OPEN)
+        self.assertEqual(cm.exception.retry_after, 20)
+        self.assertEqual(self.catalog.session.get.call_count, 4)
+
+    def test_opens_on_slow_calls(self, monotonic):
+        """Test calls slower than the threshold open the circuit"""
+        times = iter(range(0, 100, 2))
+        monotonic.side_effect = lambda: float(next(times))
+        self.catalog.session.get.return_value = sample_response(
+            status.HTTP_404_NOT_FOUND)
+
+        for _ in range(4):
+            self.catalog.get_product(PRODUCT_ID)
+
+        self.assertEqual(self.breaker.state, catalog.CircuitBreaker.OPEN)
+
+    def test_half_open_probe(self, monotonic):
+        """Test a single probe is let through once the delay is over"""
+        monotonic.return_value = 100.0
+        self.fail_calls(4)
+        monotonic.return_value = 131.0
+
+        probe = self.breaker.before_call()
+        with self.assertRaises(catalog.CatalogUnavailable):
+            self.breaker.before_call()
+        self.breaker.record(False, 0.1, probe)
+        self.assertEqual(self.breaker.state, catalog.CircuitBreaker.OPEN)
+
+        monotonic.return_value = 162.0
+        self.catalog.session.get.return_value = sample_response(
+            status.HTTP_404_NOT_FOUND)
+        self.catalog.get_product(PRODUCT_ID)
+
+        self.assertEqual(self.breaker.state, catalog.CircuitBreaker.CLOSED)
+
+    def test_probe_error_reopens(self, monotonic):
+        """Test a probe failing with any error opens the circuit again"""
+        monotonic.return_value = 100.0
+        self.fail_calls(4)
+        monotonic.return_value = 131.0
+        self.catalog.session.get.side_effect = RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            self.catalog.get_product(PRODUCT_ID)
+
+        self.assertEqual(self.breaker.state, catalog.CircuitBreaker.OPEN)
+        monotonic.return_value = 162.0
+        self.assertTrue(self.breaker.before_call())
+
+    def test_only_the_probe_decides(self, monotonic):
+        """Test calls started before the circuit opened do not close it"""
+        monotonic.return_value = 100.0
+        self.fail_calls(4)
+        monotonic.return_value = 131.0
+
+        probe = self.breaker.before_call()
+        self.breaker.record(True, 0.1)
+
+        self.assertTrue(probe)
+        self.assertEqual(
+            self.breaker.state, catalog.CircuitBreaker.HALF_OPEN)
+        self.breaker.record(True, 0.1, probe)
+        self.assertEqual(self.breaker.state, catalog.CircuitBreaker.CLOSED)
+
+
+class HedgerTests(SimpleTestCase):
+    """Test hedging slow catalog requests"""
+
+    def setUp(self):
+        self.hedger = catalog.Hedger(
+            percentile=50, min_delay=0.01, max_ratio=1.0, min_samples=2,
+            workers=4)
+        self.addCleanup(self.hedger.close)
+
+    def warm_up(self, latency=0.0):
+        """Record enough fast calls to know the latency percentile"""
+        for _ in range(2):
+            self.hedger.call(lambda: time.sleep(latency))
+
+    def test_no_hedge_without_samples(self):
+        """Test requests are not hedged before latencies are known"""
+        self.assertIsNone(self.hedger.delay())
+
+        self.assertEqual(self.hedger.call(lambda: 'result'), 'result')
+        self.assertEqual(self.hedger.stats.snapshot()['hedged'], 0)
+
+    def test_slow_request_is_hedged(self):
+        """Test a slow request is hedged and the fastest answer wins"""
+        self.warm_up()
+        first_call = threading.Event()
+        release = threading.Event()
+
+        threads = []
+
+        def fn():
+            threads.append(threading.current_thread().name)
+            if not first_call.is_set():
+                first_call.set()
+                release.wait(1)
+                return 'first'
+            return 'hedge'
+
+        result = self.hedger.call(fn)
+        release.set()
+
+        self.assertEqual(result, 'hedge')
+        self.assertTrue(all(
+            thread.startswith('catalog-hedge') for thread in threads))
+        stats = self.hedger.stats.snapshot()
+        self.assertEqual(stats['hedged'], 1)
+        self.assertEqual(stats['hedge_wins'], 1)
+
+    def test_hedge_ratio_is_capped(self):
+        """Test no more than max_ratio of the requests are hedged"""
+        self.hedger.max_ratio = 0.0
+        self.warm_up()
+
+        self.hedger.call(lambda: time.sleep(0.05))
+
+        self.assertEqual(self.hedger.stats.snapshot()['hedged'], 0)
+
+    def test_concurrent_hedges_are_capped(self):
+        """Test concurrent slow requests share the hedge ratio"""
+        self.hedger.max_ratio = 0.25
+        self.warm_up()
+        calls = [
+            threading.Thread(
+                target=self.hedger.call, args=(lambda: time.sleep(0.1),))
+            for _ in range(6)
+        ]
+
+        for call in calls:
+            call.start()
+        for call in calls:
+            call.join()
+
+        stats = self.hedger.stats.snapshot()
+        self.assertEqual(stats['requests'], 8)
+        self.assertLessEqual(stats['hedged'], 2)
+
+    def test_no_hedge_while_workers_are_busy(self):
+        """Test requests and hedges are never queued for a worker"""
+        hedger = catalog.Hedger(
+            percentile=50, min_delay=0.01, max_ratio=1.0, min_samples=2,
+            workers=1)
+        self.addCleanup(hedger.close)
+        for _ in range(2):
+            hedger.call(lambda: None)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        slow = threading.Thread(
+            target=hedger.call, args=(lambda: release.wait(1),))
+        slow.start()
+        time.sleep(0.1)
+
+        threads = []
+        hedger.call(lambda: threads.append(threading.current_thread()))
+        release.set()
+        slow.join()
+
+        self.assertEqual(threads, [threading.current_thread()])
+        self.assertEqual(hedger.stats.snapshot()['hedged'], 1)
+
+    def test_stats_are_logged(self):
+        """Test the hedging stats are logged periodically"""
+        hedger = catalog.Hedger(stats_interval=0.01)
+        self.addCleanup(hedger.close)
+        time.sleep(0.02)
+
+        with self.assertLogs('wishlist.catalog', 'INFO') as cm:
+            hedger.call(lambda: None)
+
+        self.assertIn("'requests': 1", cm.output[0])
+
+    def test_client_uses_hedger(self):
+        """Test the catalog client sends its requests through the hedger"""
+        client = catalog.CatalogClient(
+            base_url='http://catalog.test/api/product', hedger=self.hedger)
+        client.session = MagicMock()
+        client.session.get.return_value = sample_response(
+            status.HTTP_404_NOT_FOUND)
+
+        self.assertIsNone(client.get_product(PRODUCT_ID))
+        self.assertEqual(self.hedger.stats.snapshot()['requests'], 1)
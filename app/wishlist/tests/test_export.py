@@ -0,0 +1,155 @@
+import csv
+import datetime
+import io
+import json
+import os
+import tempfile
+import uuid
+
+from core.models import Produto, WishlistItem
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+EXPORT_URL = reverse('wishlist:export')
+
+
+def sample_product(**params):
+    """Create a sample product"""
+    defaults = {
+        'id': uuid.uuid4(),
+        'price': 10.9,
+        'image': 'http://challenge-api.luizalabs.com/images/sample',
+        'brand': 'sample brand',
+        'title': 'Sample product'}
+    defaults.update(params)
+
+    return Produto.objects.create(**defaults)
+
+
+def streamed_content(res):
+    """Return the content of a streaming response"""
+    return b''.join(res.streaming_content).decode()
+
+
+class ExportApiTests(TestCase):
+    """Test exporting wishlists"""
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            email='admin@luizalabs.com',
+            password='adminpass123'
+        )
+        self.user = get_user_model().objects.create_user(
+            email='test_user@luizalabs.com',
+            password='testpass',
+            name='Test name'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        self.product = sample_product(brand='bébé confort')
+        self.other_product = sample_product(brand='other brand')
+        self.item = WishlistItem.objects.create(
+            client=self.user, product=self.product)
+        self.old_item = WishlistItem.objects.create(
+            client=self.user, product=self.other_product,
+            created_at=timezone.now() - datetime.timedelta(days=30))
+
+    def test_export_staff_only(self):
+        """Test common users cannot export wishlists"""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        res = client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_csv(self):
+        """Test exporting every wishlist item as CSV"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(streamed_content(res))))
+        self.assertEqual(len(rows), 2)
+        row = next(row for row in rows if row['id'] == str(self.item.id))
+        self.assertEqual(row['client_email'], self.user.email)
+        self.assertEqual(row['product_id'], str(self.product.id))
+        self.assertEqual(row['brand'], 'bébé confort')
+
+    def test_export_jsonl_filtered_by_brand(self):
+        """Test exporting JSON Lines filtered by brand"""
+        res = self.client.get(
+            EXPORT_URL, {'output': 'jsonl', 'brand': 'bébé confort'})
+
+        lines = streamed_content(res).splitlines()
+        self.assertEqual(len(lines), 1)
+        data = json.loads(lines[0])
+        self.assertEqual(data['id'], self.item.id)
+        self.assertEqual(data['client_id'], self.user.id)
+        self.assertEqual(data['price'], 10.9)
+
+    def test_export_filtered_by_product_and_date(self):
+        """Test exporting items of a product within a date range"""
+        since = (timezone.now() - datetime.timedelta(days=31)).date()
+        until = (timezone.now() - datetime.timedelta(days=29)).date()
+
+        res = self.client.get(EXPORT_URL, {
+            'output': 'jsonl',
+            'product': str(self.other_product.id),
+            'since': since.isoformat(),
+            'until': until.isoformat(),
+        })
+        lines = streamed_content(res).splitlines()
+
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines], [self.old_item.id])
+
+    def test_export_items_without_creation_date(self):
+        """Test items added before creation dates are exported undated"""
+        WishlistItem.objects.filter(id=self.old_item.id).update(
+            created_at=None)
+
+        res = self.client.get(EXPORT_URL, {'output': 'jsonl'})
+        dated = self.client.get(EXPORT_URL, {
+            'output': 'jsonl',
+            'since': (timezone.now() - datetime.timedelta(days=31)).date(),
+        })
+
+        data = {
+            item['id']: item
+            for item in map(json.loads, streamed_content(res).splitlines())
+        }
+        self.assertIsNone(data[self.old_item.id]['created_at'])
+        self.assertEqual(
+            [json.loads(line)['id']
+             for line in streamed_content(dated).splitlines()],
+            [self.item.id])
+
+    def test_export_invalid_parameters(self):
+        """Test invalid export parameters are rejected"""
+        for params in (
+            {'output': 'xml'}, {'product': 'abc'}, {'since': 'yesterday'}
+        ):
+            res = self.client.get(EXPORT_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_command(self):
+        """Test the export command writes the filtered items to a file"""
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        call_command(
+            'export_wishlists', path, output='jsonl',
+            brand='other brand', stdout=io.StringIO())
+
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines], [self.old_item.id])
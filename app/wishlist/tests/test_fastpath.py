@@ -0,0 +1,118 @@
+import uuid
+from io import StringIO
+
+from core.models import Produto, WishlistItem
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from wishlist import fastpath
+from wishlist.serializers import (WishlistItemDetailSerializer,
+                                  WishlistItemProductSerializer,
+                                  WishlistItemSerializer)
+
+WISHLIST_URL = reverse('wishlist:wishlistitem-list')
+
+
+def detail_url(wishlist_item_id):
+    """Return wishlist item detail URL"""
+    return reverse('wishlist:wishlistitem-detail', args=[wishlist_item_id])
+
+
+class FastReadParityTests(TestCase):
+    """Test the fast read path renders the same bytes as the serializers"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test_user@luizalabs.com',
+            password='testpass',
+            name='Usuário   teste'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for index in range(5):
+            product = Produto.objects.create(
+                id=uuid.uuid4(),
+                price=1699.0 + index / 3,
+                image=f'http://challenge-api.luizalabs.com/images/{index}',
+                brand='bébé confort',
+                title=f'Cadeira “{index}”',
+                review_score=None if index % 2 else 4.35,
+            )
+            WishlistItem.objects.create(client=self.user, product=product)
+
+    def assertSameContent(self, url, params=None, **extra):
+        """Assert both read paths answer the same status and bytes"""
+        with override_settings(WISHLIST_FAST_READS=False):
+            expected = self.client.get(url, params, **extra)
+        with override_settings(WISHLIST_FAST_READS=True):
+            res = self.client.get(url, params, **extra)
+
+        self.assertEqual(res.status_code, expected.status_code)
+        self.assertEqual(res.content, expected.content)
+        return res
+
+    def test_list_parity(self):
+        """Test the list is rendered identically"""
+        self.assertSameContent(WISHLIST_URL)
+
+    def test_paginated_list_parity(self):
+        """Test every page and cursor is rendered identically"""
+        res = self.assertSameContent(WISHLIST_URL, {'page_size': 2})
+        self.assertSameContent(res.json()['next'])
+
+    def test_expanded_list_parity(self):
+        """Test the list with product details is rendered identically"""
+        self.assertSameContent(WISHLIST_URL, {'expand': 'product'})
+
+    def test_retrieve_parity(self):
+        """Test a wishlist item detail is rendered identically"""
+        item = WishlistItem.objects.filter(client=self.user).first()
+
+        self.assertSameContent(detail_url(item.id))
+
+    def test_retrieve_not_found_parity(self):
+        """Test missing and malformed ids answer the same way"""
+        self.assertSameContent(detail_url(0))
+        self.assertSameContent(detail_url('abc'))
+
+    def test_indented_parity(self):
+        """Test pretty printed output is rendered identically"""
+        self.assertSameContent(
+            WISHLIST_URL, HTTP_ACCEPT='application/json; indent=2')
+
+    def test_fast_list_query_count(self):
+        """Test the fast list reads the version and the page rows only"""
+        with override_settings(WISHLIST_FAST_READS=True):
+            with self.assertNumQueries(2):
+                self.client.get(WISHLIST_URL, {'expand': 'product'})
+
+
+class ProjectionTests(TestCase):
+    """Test compiling serializers into projections"""
+
+    def test_projection_lookups(self):
+        """Test nested serializers are flattened into joined lookups"""
+        self.assertEqual(
+            fastpath.get_projection(WishlistItemSerializer).lookups,
+            ['id', 'client', 'product'])
+        self.assertEqual(
+            fastpath.get_projection(WishlistItemProductSerializer).lookups,
+            ['id', 'product__id', 'product__price', 'product__image',
+             'product__brand', 'product__title', 'product__review_score'])
+        self.assertEqual(
+            fastpath.get_projection(WishlistItemDetailSerializer).lookups[:4],
+            ['id', 'client__id', 'client__email', 'client__name'])
+
+    @override_settings(ALLOWED_HOSTS=[])
+    def test_benchmark_command(self):
+        """Test the read path benchmark runs and leaves no data behind"""
+        out = StringIO()
+        call_command('benchmark_wishlist_reads', items=5, repeat=1,
+                     stdout=out)
+
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+        self.assertEqual(WishlistItem.objects.count(), 0)
+        self.assertEqual(get_user_model().objects.count(), 0)
@@ -0,0 +1,114 @@
+import io
+import json
+import os
+import tempfile
+import uuid
+
+from core.models import (BrandWishlistCount, PriceDropEvent, Produto,
+                         WishlistItem)
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from wishlist import importer, rollup
+
+PRODUCT_ID = uuid.UUID('1bf0f365-fbdd-4e21-9786-da459d78dd1f')
+
+
+def catalog_payload(**params):
+    """Return a sample catalog payload"""
+    payload = {
+        'id': str(PRODUCT_ID),
+        'price': 1699.0,
+        'image': f'http://challenge-api.luizalabs.com/images/{PRODUCT_ID}',
+        'brand': 'bébé confort',
+        'title': 'Cadeira para Auto Iseos Bébé Confort',
+        'reviewScore': 4.5}
+    payload.update(params)
+
+    return payload
+
+
+def jsonl(*payloads):
+    """Return the lines of a JSON Lines dump"""
+    return io.StringIO(
+        ''.join(json.dumps(payload) + '\n' for payload in payloads))
+
+
+class ImportProductsTests(TestCase):
+    """Test importing catalog dumps"""
+
+    def test_import_jsonl(self):
+        """Test products are created from a JSON Lines dump by chunks"""
+        payloads = [catalog_payload(id=str(uuid.uuid4())) for _ in range(5)]
+        progress = []
+
+        stats = importer.import_products(
+            jsonl(*payloads), 'jsonl', 2,
+            progress=lambda stats, elapsed: progress.append(stats['read']))
+
+        self.assertEqual(stats, {'read': 5, 'invalid': 0})
+        self.assertEqual(progress, [2, 4, 5])
+        self.assertEqual(Produto.objects.count(), 5)
+        product = Produto.objects.get(id=payloads[0]['id'])
+        self.assertEqual(product.review_score, 4.5)
+        self.assertIsNotNone(product.last_synced_at)
+
+    def test_import_csv(self):
+        """Test products are created from a CSV dump"""
+        lines = io.StringIO(
+            'id,price,image,brand,title,reviewScore\n'
+            f'{PRODUCT_ID},10.5,http://image,brand,"Title, long",\n'
+        )
+
+        importer.import_products(lines, 'csv', 100)
+
+        product = Produto.objects.get(id=PRODUCT_ID)
+        self.assertEqual(product.price, 10.5)
+        self.assertEqual(product.title, 'Title, long')
+        self.assertIsNone(product.review_score)
+
+    def test_reimport_updates_changed_products(self):
+        """Test imported changes update rollups and emit price drops"""
+        importer.import_products(jsonl(catalog_payload()), 'jsonl', 100)
+        user = get_user_model().objects.create_user(
+            email='test_user@luizalabs.com', password='testpass')
+        WishlistItem.objects.add(user.id, PRODUCT_ID)
+        rollup.fold(100)
+
+        importer.import_products(
+            jsonl(catalog_payload(price=1499.0, brand='new brand')),
+            'jsonl', 100)
+
+        product = Produto.objects.get(id=PRODUCT_ID)
+        self.assertEqual(product.price, 1499.0)
+        self.assertEqual(
+            BrandWishlistCount.objects.get(brand='new brand').wishlists, 1)
+        self.assertEqual(rollup.verify(), ({}, {}))
+        event = PriceDropEvent.objects.get()
+        self.assertEqual((event.old_price, event.new_price), (1699.0, 1499.0))
+
+    def test_invalid_rows_are_skipped(self):
+        """Test rows without a price are counted and do not abort"""
+        lines = jsonl(
+            catalog_payload(price=None),
+            catalog_payload(id=str(uuid.uuid4()), price='abc'),
+            catalog_payload(),
+        )
+
+        stats = importer.import_products(lines, 'jsonl', 100)
+
+        self.assertEqual(stats, {'read': 3, 'invalid': 2})
+        self.assertEqual(Produto.objects.get().id, PRODUCT_ID)
+
+    def test_import_command(self):
+        """Test the import command loads a dump file"""
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(catalog_payload()) + '\n')
+        self.addCleanup(os.remove, path)
+        out = io.StringIO()
+
+        call_command('import_products', path, stdout=out)
+
+        self.assertTrue(Produto.objects.filter(id=PRODUCT_ID).exists())
+        self.assertIn('Imported 1 products', out.getvalue())
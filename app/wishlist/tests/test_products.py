@@ -0,0 +1,187 @@
+import threading
+import uuid
+from unittest.mock import patch
+
+from core.models import Produto
+from django.test import TestCase, override_settings
+from wishlist import catalog, products
+
+PRODUCT_ID = uuid.UUID('af04c0ee-7137-4848-fd33-a2d148412095')
+
+
+def sample_product(**params):
+    """Create a sample product"""
+    defaults = {
+        'id': PRODUCT_ID,
+        'price': 10.9,
+        'image': f'http://challenge-api.luizalabs.com/images/{PRODUCT_ID}',
+        'brand': 'sample brand',
+        'title': 'Sample product'}
+    defaults.update(params)
+
+    return Produto.objects.create(**defaults)
+
+
+def sample_payload(**params):
+    """Create a sample catalog payload"""
+    payload = {
+        'id': str(PRODUCT_ID),
+        'price': 10.9,
+        'image': f'http://challenge-api.luizalabs.com/images/{PRODUCT_ID}',
+        'brand': 'sample brand',
+        'title': 'Sample product',
+        'reviewScore': 4.5}
+    payload.update(params)
+
+    return payload
+
+
+@patch('wishlist.catalog.CatalogClient.get_product')
+class ProductLookupTests(TestCase):
+    """Test the tiered product lookup"""
+
+    def setUp(self):
+        self.lookup = products.ProductLookup()
+
+    def test_invalid_product_id(self, get_product):
+        """Test malformed ids are rejected without any query"""
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.lookup.get('not-an-uuid'))
+        get_product.assert_not_called()
+
+    def test_product_from_database_is_cached(self, get_product):
+        """Test a known product costs one query and is then cached"""
+        sample_product()
+
+        with self.assertNumQueries(1):
+            product = self.lookup.get(str(PRODUCT_ID))
+        with self.assertNumQueries(0):
+            cached = self.lookup.get(PRODUCT_ID)
+
+        self.assertEqual(product.id, PRODUCT_ID)
+        self.assertEqual(cached.title, 'Sample product')
+        get_product.assert_not_called()
+
+    def test_product_from_catalog_is_stored(self, get_product):
+        """Test an unknown product is fetched and saved on the database"""
+        get_product.return_value = sample_payload()
+
+        product = self.lookup.get(PRODUCT_ID)
+
+        self.assertEqual(product.review_score, 4.5)
+        self.assertTrue(Produto.objects.filter(id=PRODUCT_ID).exists())
+
+    def test_missing_product_is_negative_cached(self, get_product):
+        """Test products the catalog does not know are not fetched again"""
+        get_product.return_value = None
+
+        self.assertIsNone(self.lookup.get(PRODUCT_ID))
+        with self.assertNumQueries(0):
+            self.assertIsNone(self.lookup.get(PRODUCT_ID))
+        self.assertEqual(get_product.call_count, 1)
+
+    @override_settings(PRODUCT_CACHE_NEGATIVE_TTL=0)
+    def test_negative_entries_expire(self, get_product):
+        """Test negative entries use their own TTL"""
+        get_product.return_value = None
+
+        self.lookup.get(PRODUCT_ID)
+        self.lookup.get(PRODUCT_ID)
+
+        self.assertEqual(get_product.call_count, 2)
+
+    @override_settings(PRODUCT_CACHE_TTL=0)
+    def test_stale_product_is_served_while_revalidating(self, get_product):
+        """Test stale products are served and refreshed in background"""
+        sample_product()
+        self.lookup.get(PRODUCT_ID)
+
+        with patch.object(self.lookup, '_schedule_revalidation') as sr:
+            with self.assertNumQueries(0):
+                product = self.lookup.get(PRODUCT_ID)
+
+        self.assertEqual(product.id, PRODUCT_ID)
+        sr.assert_called_once_with(PRODUCT_ID)
+
+    @override_settings(PRODUCT_CACHE_TTL=0, PRODUCT_CACHE_STALE_TTL=0)
+    def test_stale_product_is_served_when_catalog_fails(self, get_product):
+        """Test a known product is served while the catalog is down"""
+        get_product.return_value = sample_payload()
+        self.lookup.get(PRODUCT_ID)
+        Produto.objects.all().delete()
+        get_product.side_effect = catalog.CatalogError()
+
+        product = self.lookup.get(PRODUCT_ID)
+
+        self.assertEqual(product.id, PRODUCT_ID)
+
+    def test_catalog_failure_without_cache_raises(self, get_product):
+        """Test catalog failures are raised for never seen products"""
+        get_product.side_effect = catalog.CatalogError()
+
+        with self.assertRaises(catalog.CatalogError):
+            self.lookup.get(PRODUCT_ID)
+
+    @override_settings(PRODUCT_CACHE_ALIAS='default')
+    def test_shared_cache_tier(self, get_product):
+        """Test other processes find products in the shared cache"""
+        sample_product()
+        lookup = products.ProductLookup()
+        lookup.get(PRODUCT_ID)
+        self.addCleanup(lookup.invalidate, PRODUCT_ID)
+
+        with self.assertNumQueries(0):
+            product = products.ProductLookup().get(PRODUCT_ID)
+
+        self.assertEqual(product.title, 'Sample product')
+
+    def test_concurrent_loads_are_coalesced(self, get_product):
+        """Test concurrent lookups of a product share one load"""
+        release = threading.Event()
+        fields = products.product_fields(
+            products.product_from_payload(sample_payload()))
+
+        def load(product_id):
+            release.wait(1)
+            return fields
+
+        results = []
+
+        def worker():
+            results.append(self.lookup.get(PRODUCT_ID))
+
+        with patch.object(self.lookup, '_load', side_effect=load) as ld:
+            threads = [threading.Thread(target=worker) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            threading.Timer(0.1, release.set).start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(ld.call_count, 1)
+        self.assertEqual([p.id for p in results], [PRODUCT_ID] * 10)
+
+    def test_create_product_is_idempotent(self, get_product):
+        """Test creating an existing product does not fail"""
+        sample_product()
+
+        product = products.create_product(sample_payload())
+
+        self.assertEqual(product.id, PRODUCT_ID)
+        self.assertEqual(Produto.objects.count(), 1)
+
+    def test_advisory_lock_key_is_signed_bigint(self, get_product):
+        """Test advisory lock keys fit a PostgreSQL bigint"""
+        key = products.advisory_lock_key(
+            uuid.UUID('ffffffff-ffff-ffff-ffff-ffffffffffff'))
+
+        self.assertEqual(key, -1)
+
+    def test_invalid_payloads_are_rejected(self, get_product):
+        """Test payloads missing a field or with a bad value are invalid"""
+        for payload in (
+            sample_payload(price=None), sample_payload(price='abc'),
+            {'price': 10.9},
+        ):
+            with self.assertRaises(products.InvalidPayload):
+                products.product_from_payload(payload)
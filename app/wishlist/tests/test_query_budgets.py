@@ -0,0 +1,182 @@
+import uuid
+
+from core.models import Produto, WishlistItem
+from core.querybudget import enforce_query_budgets
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import get_resolver, reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from wishlist import rollup
+
+WISHLIST_URL = reverse('wishlist:wishlistitem-list')
+BULK_URL = reverse('wishlist:wishlistitem-bulk')
+CONTAINS_URL = reverse('wishlist:wishlistitem-contains')
+REMOVE_URL = reverse('wishlist:wishlistitem-remove')
+CLEAR_URL = reverse('wishlist:wishlistitem-clear')
+EXPORT_URL = reverse('wishlist:export')
+TOP_PRODUCTS_URL = reverse('wishlist:top-products')
+TOP_BRANDS_URL = reverse('wishlist:top-brands')
+
+
+def create_user(**params):
+    """Create a user"""
+    return get_user_model().objects.create_user(**params)
+
+
+def sample_product(**params):
+    """Create a sample product"""
+    defaults = {
+        'id': uuid.uuid4(),
+        'price': 10.9,
+        'image': 'http://challenge-api.luizalabs.com/images/sample',
+        'brand': 'sample brand',
+        'title': 'Sample product'}
+    defaults.update(params)
+
+    return Produto.objects.create(**defaults)
+
+
+def detail_url(wishlist_item_id):
+    """Return a wishlist item URL"""
+    return reverse('wishlist:wishlistitem-detail', args=[wishlist_item_id])
+
+
+def authenticated_client(user):
+    """Return a client authenticated with a JWT, like real requests"""
+    client = APIClient()
+    token = RefreshToken.for_user(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+@enforce_query_budgets
+class WishlistQueryBudgetTests(TestCase):
+    """
+    Test the wishlist endpoints stay within their query budgets, with
+    several rows to read so that per row queries break them, and cold
+    caches
+    """
+
+    def setUp(self):
+        self.user = create_user(
+            email='user@luizalabs.com', password='testpass')
+        self.admin = get_user_model().objects.create_superuser(
+            email='admin@luizalabs.com', password='testpass')
+        self.products = [
+            sample_product(brand=f'brand {i % 2}') for i in range(5)]
+        for user in (self.user, self.admin):
+            WishlistItem.objects.add_many(
+                user.id, [product.id for product in self.products[:3]])
+        rollup.fold(100)
+        self.item = WishlistItem.objects.filter(client=self.user).first()
+        self.client = authenticated_client(self.user)
+        self.admin_client = authenticated_client(self.admin)
+        cache.clear()
+
+    def test_every_endpoint_has_a_budget(self):
+        """Test every wishlist endpoint declares a budget for its actions"""
+        for pattern in get_resolver('wishlist.urls').url_patterns:
+            patterns = getattr(pattern, 'url_patterns', [pattern])
+            for pattern in patterns:
+                if pattern.name == 'api-root':
+                    continue
+                view = pattern.callback.cls
+                actions = getattr(pattern.callback, 'actions', None)
+                if actions is None:
+                    actions = [
+                        method for method in view.http_method_names
+                        if method not in ('head', 'options')
+                        and hasattr(view, method)
+                    ]
+                else:
+                    actions = actions.values()
+                for action in actions:
+                    self.assertIn(action, view.query_budgets, view.__name__)
+
+    def test_list(self):
+        res = self.client.get(WISHLIST_URL)
+
+        self.assertEqual(len(res.data['results']), 3)
+
+    def test_list_expanded(self):
+        res = self.client.get(WISHLIST_URL, {'expand': 'product'})
+
+        self.assertEqual(len(res.data['results']), 3)
+
+    def test_retrieve(self):
+        res = self.client.get(detail_url(self.item.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_create(self):
+        res = self.client.post(WISHLIST_URL, {
+            'client': self.user.id, 'product': self.products[3].id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update(self):
+        res = self.client.put(detail_url(self.item.id), {
+            'client': self.user.id, 'product': self.item.product_id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_partial_update(self):
+        res = self.client.patch(detail_url(self.item.id), {
+            'product': self.item.product_id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_destroy(self):
+        res = self.client.delete(detail_url(self.item.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_bulk(self):
+        res = self.client.post(BULK_URL, {
+            'products': [str(product.id) for product in self.products]
+        }, format='json')
+
+        self.assertEqual(len(res.data['results']), 5)
+
+    def test_contains(self):
+        res = self.client.post(CONTAINS_URL, {
+            'products': [str(product.id) for product in self.products]
+        }, format='json')
+
+        self.assertEqual(len(res.data['results']), 5)
+
+    def test_remove(self):
+        res = self.client.post(REMOVE_URL, {
+            'products': [str(product.id) for product in self.products]
+        }, format='json')
+
+        self.assertEqual(res.data, {'removed': 3})
+
+    def test_clear(self):
+        res = self.client.delete(CLEAR_URL)
+
+        self.assertEqual(res.data, {'removed': 3})
+
+    def test_export(self):
+        res = self.admin_client.get(EXPORT_URL)
+
+        self.assertEqual(len(b''.join(res.streaming_content).splitlines()), 7)
+
+    def test_product_clients(self):
+        res = self.admin_client.get(reverse(
+            'wishlist:product-clients', args=[self.products[0].id]))
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_top_products(self):
+        res = self.admin_client.get(TOP_PRODUCTS_URL)
+
+        self.assertEqual(len(res.data['results']), 3)
+
+    def test_top_brands(self):
+        res = self.admin_client.get(TOP_BRANDS_URL)
+
+        self.assertEqual(len(res.data['results']), 2)
@@ -0,0 +1,163 @@
+import uuid
+from unittest.mock import MagicMock
+
+from core.models import Produto, WishlistItem
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from user import removals
+from wishlist import changes, response_cache
+
+WISHLIST_URL = reverse('wishlist:wishlistitem-list')
+REMOVE_USER_URL = reverse('user:remove')
+
+
+def sample_product(**params):
+    """Create a sample product"""
+    defaults = {
+        'id': uuid.uuid4(),
+        'price': 10.9,
+        'image': 'http://challenge-api.luizalabs.com/images/sample',
+        'brand': 'sample brand',
+        'title': 'Sample product'}
+    defaults.update(params)
+
+    return Produto.objects.create(**defaults)
+
+
+@override_settings(WISHLIST_RESPONSE_CACHE_TTL=60)
+class ResponseCacheApiTests(TestCase):
+    """Test caching wishlist responses"""
+
+    def setUp(self):
+        cache.clear()
+        response_cache.stats.reset()
+        self.user = get_user_model().objects.create_user(
+            email='test_user@luizalabs.com',
+            password='testpass',
+            name='Test name'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.product = sample_product()
+
+    def test_cached_list_skips_wishlist_query(self):
+        """Test a cached list only reads the wishlist version"""
+        WishlistItem.objects.create(client=self.user, product=self.product)
+        first = self.client.get(WISHLIST_URL, {'expand': 'product'})
+
+        with self.assertNumQueries(1):
+            res = self.client.get(WISHLIST_URL, {'expand': 'product'})
+
+        self.assertEqual(first['X-Wishlist-Cache'], 'miss')
+        self.assertEqual(res['X-Wishlist-Cache'], 'hit')
+        self.assertEqual(res.content, first.content)
+        self.assertEqual(response_cache.stats.snapshot()['hit_ratio'], 0.5)
+
+    def test_cache_keyed_by_page(self):
+        """Test different pages are cached separately"""
+        self.client.get(WISHLIST_URL)
+
+        res = self.client.get(WISHLIST_URL, {'expand': 'product'})
+
+        self.assertEqual(res['X-Wishlist-Cache'], 'miss')
+
+    def test_create_and_destroy_invalidate(self):
+        """Test adding and removing items invalidates cached responses"""
+        self.client.get(WISHLIST_URL)
+        self.client.post(
+            WISHLIST_URL, {'client': self.user.id, 'product': self.product.id})
+
+        res = self.client.get(WISHLIST_URL)
+        self.assertEqual(res['X-Wishlist-Cache'], 'miss')
+        self.assertEqual(len(res.data['results']), 1)
+
+        item = WishlistItem.objects.get(client=self.user)
+        self.client.delete(
+            reverse('wishlist:wishlistitem-detail', args=[item.id]))
+        res = self.client.get(WISHLIST_URL)
+        self.assertEqual(res['X-Wishlist-Cache'], 'miss')
+        self.assertEqual(len(res.data['results']), 0)
+
+    def test_user_removal_deletes_cached_responses(self):
+        """Test removing a user drops every response cached for them"""
+        self.client.get(WISHLIST_URL)
+        keys = cache.get(response_cache._index_key(self.user.id))
+        self.assertEqual(len(keys), 1)
+
+        self.client.delete(REMOVE_USER_URL)
+        removals.process()
+
+        self.assertIsNone(cache.get(response_cache._index_key(self.user.id)))
+        self.assertEqual(cache.get_many(list(keys)), {})
+
+
+@override_settings(
+    WISHLIST_RESPONSE_CACHE_TTL=60, WISHLIST_RESPONSE_CACHE_LOCK_WAIT=0.05)
+class ResponseCacheTests(TestCase):
+    """Test the response cache stampede protection"""
+
+    def setUp(self):
+        cache.clear()
+        response_cache.stats.reset()
+        self.request = RequestFactory().get(WISHLIST_URL)
+
+    def test_waiters_do_not_rebuild(self):
+        """Test a miss waits for the rebuild already in progress"""
+        key = response_cache._cache_key(1, 0, self.request)
+        cache.add(f'{key}:lock', 1)
+        cache.set(key, {'results': []})
+        build = MagicMock()
+
+        data, hit = response_cache.get_or_build(1, 0, self.request, build)
+
+        self.assertEqual(data, {'results': []})
+        build.assert_not_called()
+        stats = response_cache.stats.snapshot()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 0))
+
+    def test_waiters_build_after_timeout(self):
+        """Test a waiter builds the data if the rebuild takes too long"""
+        key = response_cache._cache_key(1, 0, self.request)
+        cache.add(f'{key}:lock', 1)
+        build = MagicMock(return_value={'results': []})
+
+        data, hit = response_cache.get_or_build(1, 0, self.request, build)
+
+        self.assertFalse(hit)
+        build.assert_called_once_with()
+
+    def test_stats_are_logged(self):
+        """Test the cache stats are logged periodically"""
+        stats = response_cache.CacheStats()
+        stats.record_hit()
+        stats._logged_at -= 1
+
+        with self.assertLogs('wishlist.response_cache', 'INFO') as cm:
+            stats.log(1)
+            stats.log(1)
+
+        self.assertEqual(len(cm.output), 1)
+        self.assertIn("'hit_ratio': 1.0", cm.output[0])
+
+    def test_version_is_part_of_the_key(self):
+        """Test responses of older wishlist versions are never served"""
+        response_cache.get_or_build(1, 0, self.request, lambda: {'v': 0})
+
+        data, hit = response_cache.get_or_build(
+            1, 1, self.request, lambda: {'v': 1})
+
+        self.assertFalse(hit)
+        self.assertEqual(data, {'v': 1})
+
+    def test_invalidate(self):
+        """Test invalidating drops every cached response of a client"""
+        response_cache.get_or_build(1, 0, self.request, lambda: {'v': 0})
+
+        changes.wishlist_removed(1)
+        data, hit = response_cache.get_or_build(
+            1, 0, self.request, lambda: {'v': 1})
+
+        self.assertFalse(hit)
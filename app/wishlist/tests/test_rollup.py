@@ -0,0 +1,177 @@
+import io
+import uuid
+
+from core.models import (BrandWishlistCount, Produto, ProductWishlistCount,
+                         WishlistCountDelta, WishlistItem)
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from wishlist import rollup
+
+TOP_PRODUCTS_URL = reverse('wishlist:top-products')
+TOP_BRANDS_URL = reverse('wishlist:top-brands')
+
+
+def create_user(**params):
+    """Create a user"""
+    return get_user_model().objects.create_user(**params)
+
+
+def sample_product(**params):
+    """Create a sample product"""
+    defaults = {
+        'id': uuid.uuid4(),
+        'price': 10.9,
+        'image': 'http://challenge-api.luizalabs.com/images/sample',
+        'brand': 'sample brand',
+        'title': 'Sample product'}
+    defaults.update(params)
+
+    return Produto.objects.create(**defaults)
+
+
+class RollupTests(TestCase):
+    """Test the most wishlisted products and brands rollups"""
+
+    def setUp(self):
+        self.users = [
+            create_user(email=f'user{i}@luizalabs.com', password='testpass')
+            for i in range(3)
+        ]
+        self.popular = sample_product(brand='popular brand')
+        self.other = sample_product(brand='popular brand')
+        self.rare = sample_product(brand='rare brand')
+        for user in self.users:
+            WishlistItem.objects.add(user.id, self.popular.id)
+        WishlistItem.objects.add_many(
+            self.users[0].id, [self.popular.id, self.other.id, self.rare.id])
+        rollup.fold(100)
+
+    def test_counts_follow_adds_and_removes(self):
+        """Test the rollups are incremented and decremented on writes"""
+        WishlistItem.objects.remove(
+            self.users[1].id, 10, product_ids=[self.popular.id])
+        self.assertEqual(rollup.verify(), ({}, {}))
+        rollup.fold(100)
+
+        self.assertEqual(
+            ProductWishlistCount.objects.get(product=self.popular).wishlists,
+            2)
+        self.assertEqual(
+            BrandWishlistCount.objects.get(brand='popular brand').wishlists,
+            3)
+        self.assertEqual(rollup.verify(), ({}, {}))
+
+    def test_counts_follow_item_updates(self):
+        """Test moving an item to another product moves its counts"""
+        item = WishlistItem.objects.get(
+            client=self.users[1], product=self.popular)
+        client = APIClient()
+        client.force_authenticate(user=self.users[1])
+
+        res = client.patch(
+            reverse('wishlist:wishlistitem-detail', args=[item.id]),
+            {'product': self.rare.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rollup.fold(100)
+        self.assertEqual(
+            ProductWishlistCount.objects.get(product=self.rare).wishlists, 2)
+        self.assertEqual(rollup.verify(), ({}, {}))
+
+    def test_fold_applies_deltas_to_current_brand(self):
+        """Test deltas folded after a brand change count for the new brand"""
+        WishlistItem.objects.add(self.users[1].id, self.rare.id)
+        with transaction.atomic():
+            Produto.objects.filter(id=self.rare.id).update(brand='new brand')
+            rollup.move_brands({self.rare.id: ('rare brand', 'new brand')})
+
+        self.assertEqual(rollup.verify(), ({}, {}))
+        self.assertEqual(rollup.fold(1), 1)
+        self.assertEqual(
+            BrandWishlistCount.objects.get(brand='new brand').wishlists, 2)
+        self.assertFalse(WishlistCountDelta.objects.exists())
+        self.assertEqual(rollup.verify(), ({}, {}))
+
+    def test_fold_command(self):
+        """Test the fold command applies the pending deltas"""
+        WishlistItem.objects.add(self.users[1].id, self.rare.id)
+        out = io.StringIO()
+
+        call_command('fold_wishlist_counts', stdout=out)
+
+        self.assertIn('Folded 1 wishlist count deltas', out.getvalue())
+        self.assertEqual(
+            ProductWishlistCount.objects.get(product=self.rare).wishlists, 2)
+
+    def test_top_products_and_brands(self):
+        """Test products and brands are ranked by wishlist count"""
+        products = rollup.top_products(1)
+        brands = rollup.top_brands(10)
+
+        self.assertEqual(
+            [(count.product_id, count.wishlists) for count in products],
+            [(self.popular.id, 3)])
+        self.assertEqual(
+            [(count.brand, count.wishlists) for count in brands],
+            [('popular brand', 4), ('rare brand', 1)])
+
+    def test_top_api_staff_only(self):
+        """Test the ranking is only listed to staff users"""
+        client = APIClient()
+        client.force_authenticate(user=self.users[0])
+
+        res = client.get(TOP_PRODUCTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_top_api(self):
+        """Test staff users list the most wishlisted products and brands"""
+        admin = get_user_model().objects.create_superuser(
+            email='admin@luizalabs.com', password='adminpass123')
+        client = APIClient()
+        client.force_authenticate(user=admin)
+
+        products = client.get(TOP_PRODUCTS_URL, {'limit': 1})
+        brands = client.get(TOP_BRANDS_URL)
+
+        self.assertEqual(len(products.data['results']), 1)
+        self.assertEqual(
+            products.data['results'][0]['product']['id'],
+            str(self.popular.id))
+        self.assertEqual(products.data['results'][0]['wishlists'], 3)
+        self.assertEqual(brands.data['results'], [
+            {'brand': 'popular brand', 'wishlists': 4},
+            {'brand': 'rare brand', 'wishlists': 1},
+        ])
+
+    def test_verify_command_fixes_drift(self):
+        """Test the verify command reports and fixes drifted counts"""
+        WishlistItem.objects.filter(product=self.rare).delete()
+        ProductWishlistCount.objects.filter(product=self.other).delete()
+
+        with self.assertRaises(CommandError):
+            call_command('verify_wishlist_counts', stdout=io.StringIO())
+        call_command('verify_wishlist_counts', fix=True, stdout=io.StringIO())
+
+        self.assertEqual(rollup.verify(), ({}, {}))
+        self.assertEqual(
+            ProductWishlistCount.objects.get(product=self.rare).wishlists, 0)
+
+    def test_fix_keeps_changes_made_after_verify(self):
+        """Test fixes are added to the counts rather than overwriting them"""
+        ProductWishlistCount.objects.filter(product=self.rare).update(
+            wishlists=5)
+        product_mismatches, brand_mismatches = rollup.verify()
+        WishlistItem.objects.add(self.users[1].id, self.rare.id)
+        rollup.fold(100)
+
+        rollup.fix(product_mismatches, brand_mismatches)
+
+        self.assertEqual(
+            ProductWishlistCount.objects.get(product=self.rare).wishlists, 2)
+        self.assertEqual(rollup.verify(), ({}, {}))
@@ -0,0 +1,203 @@
+import io
+import uuid
+from unittest.mock import patch
+
+from core.models import (BrandWishlistCount, PriceDropEvent, PriceHistory,
+                         Produto, WishlistItem, WishlistVersion)
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from wishlist import catalog, rollup, sync
+
+
+def sample_product(**params):
+    """Create a sample product"""
+    defaults = {
+        'id': uuid.uuid4(),
+        'price': 10.9,
+        'image': 'http://challenge-api.luizalabs.com/images/sample',
+        'brand': 'sample brand',
+        'title': 'Sample product'}
+    defaults.update(params)
+
+    return Produto.objects.create(**defaults)
+
+
+def catalog_payload(product, **params):
+    """Return the catalog payload of a product"""
+    payload = {
+        'id': str(product.id),
+        'price': product.price,
+        'image': product.image,
+        'brand': product.brand,
+        'title': product.title}
+    payload.update(params)
+
+    return payload
+
+
+@patch('wishlist.catalog.CatalogClient.get_product')
+class ProductSyncTests(TestCase):
+    """Test refreshing products from the catalog"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test_user@luizalabs.com',
+            password='testpass'
+        )
+        self.product = sample_product()
+        WishlistItem.objects.add(self.user.id, self.product.id)
+
+    def test_changed_product_is_updated(self, get_product):
+        """Test changed products are written and their wishlists bumped"""
+        sample_product(title='Nobody wants it')
+        get_product.return_value = catalog_payload(
+            self.product, price=8.9, reviewScore=4.5)
+
+        stats = sync.ProductSync(rate=0).run()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, 8.9)
+        self.assertEqual(self.product.review_score, 4.5)
+        self.assertIsNotNone(self.product.last_synced_at)
+        self.assertEqual(stats['checked'], 1)
+        self.assertEqual(stats['updated'], 1)
+        get_product.assert_called_once_with(self.product.id)
+        self.assertEqual(WishlistVersion.objects.current(self.user.id), 1)
+
+    def test_unchanged_and_missing_products_are_marked_synced(
+            self, get_product):
+        """Test products are marked synced even when nothing changed"""
+        missing = sample_product()
+        WishlistItem.objects.add(self.user.id, missing.id)
+        get_product.side_effect = lambda product_id: (
+            catalog_payload(self.product) if product_id == self.product.id
+            else None
+        )
+
+        stats = sync.ProductSync(rate=0).run()
+
+        self.assertEqual(stats['updated'], 0)
+        self.assertEqual(stats['missing'], 1)
+        self.assertFalse(Produto.objects.filter(
+            last_synced_at__isnull=True).filter(
+            id__in=[self.product.id, missing.id]).exists())
+        self.assertEqual(WishlistVersion.objects.current(self.user.id), 0)
+
+    def test_failed_products_stay_stale(self, get_product):
+        """Test products the catalog failed to return are retried later"""
+        get_product.side_effect = catalog.CatalogError()
+
+        stats = sync.ProductSync(rate=0).run()
+
+        self.assertEqual(stats['failed'], 1)
+        self.product.refresh_from_db()
+        self.assertIsNone(self.product.last_synced_at)
+
+    def test_invalid_payloads_are_skipped(self, get_product):
+        """Test a payload without a price does not abort the batch"""
+        invalid = sample_product()
+        WishlistItem.objects.add(self.user.id, invalid.id)
+        payloads = {
+            self.product.id: catalog_payload(self.product, price=8.9),
+            invalid.id: catalog_payload(invalid, price=None),
+        }
+        get_product.side_effect = payloads.get
+
+        stats = sync.ProductSync(rate=0).run()
+
+        self.assertEqual((stats['updated'], stats['invalid']), (1, 1))
+        self.product.refresh_from_db()
+        invalid.refresh_from_db()
+        self.assertEqual(self.product.price, 8.9)
+        self.assertIsNone(invalid.last_synced_at)
+
+    def test_walk_continues_past_failed_products(self, get_product):
+        """Test batches walk the never synced and then the least synced"""
+        synced = [sample_product() for _ in range(2)]
+        never_synced = sample_product()
+        for product in synced + [never_synced]:
+            WishlistItem.objects.add(self.user.id, product.id)
+        synced_at = timezone.now() - timezone.timedelta(days=2)
+        Produto.objects.filter(
+            id__in=[product.id for product in synced]
+        ).update(last_synced_at=synced_at)
+        get_product.side_effect = catalog.CatalogError()
+
+        stats = sync.ProductSync(batch_size=1, rate=0).run()
+
+        walked = [call[0][0] for call in get_product.call_args_list]
+        self.assertEqual(stats['failed'], 4)
+        self.assertEqual(
+            walked,
+            sorted([self.product.id, never_synced.id])
+            + sorted(product.id for product in synced))
+
+    def test_brand_change_moves_brand_counts(self, get_product):
+        """Test brand rollups follow products whose brand changed"""
+        get_product.return_value = catalog_payload(
+            self.product, brand='new brand')
+        rollup.fold(100)
+
+        sync.ProductSync(rate=0).run()
+
+        self.assertEqual(
+            BrandWishlistCount.objects.get(brand='new brand').wishlists, 1)
+        self.assertEqual(rollup.verify(), ({}, {}))
+
+    def test_refresh_resumes_with_the_most_stale(self, get_product):
+        """Test limited runs refresh the least recently synced first"""
+        recent = sample_product()
+        WishlistItem.objects.add(self.user.id, recent.id)
+        old = timezone.now() - timezone.timedelta(days=2)
+        older = timezone.now() - timezone.timedelta(days=3)
+        Produto.objects.filter(id=recent.id).update(last_synced_at=old)
+        Produto.objects.filter(id=self.product.id).update(
+            last_synced_at=older)
+        payloads = {
+            product.id: catalog_payload(product)
+            for product in (self.product, recent)
+        }
+        get_product.side_effect = payloads.get
+
+        call_command(
+            'refresh_products', limit=1, rate=0, stdout=io.StringIO())
+        first = get_product.call_args_list[0][0][0]
+        call_command('refresh_products', rate=0, stdout=io.StringIO())
+
+        self.assertEqual(first, self.product.id)
+        self.assertEqual(get_product.call_count, 2)
+        self.assertEqual(get_product.call_args_list[1][0][0], recent.id)
+
+    @override_settings(PRICE_DROP_EVENT_BATCH_SIZE=2)
+    def test_price_drop_emits_events(self, get_product):
+        """Test price drops are recorded and notified to every wishlist"""
+        for i in range(4):
+            user = get_user_model().objects.create_user(
+                email=f'user{i}@luizalabs.com', password='testpass')
+            WishlistItem.objects.add(user.id, self.product.id)
+        get_product.return_value = catalog_payload(self.product, price=5.0)
+
+        stats = sync.ProductSync(rate=0).run()
+
+        self.assertEqual(stats['price_drops'], 1)
+        self.assertEqual(stats['events'], 5)
+        events = PriceDropEvent.objects.all()
+        self.assertEqual(len(events), 5)
+        self.assertEqual(
+            {(event.old_price, event.new_price) for event in events},
+            {(10.9, 5.0)})
+        self.assertEqual(
+            list(PriceHistory.objects.values_list('product_id', 'price')),
+            [(self.product.id, 5.0)])
+
+    def test_price_increase_is_not_notified(self, get_product):
+        """Test price increases are recorded without events"""
+        get_product.return_value = catalog_payload(self.product, price=20.0)
+
+        stats = sync.ProductSync(rate=0).run()
+
+        self.assertEqual(stats['price_drops'], 0)
+        self.assertFalse(PriceDropEvent.objects.exists())
+        self.assertEqual(PriceHistory.objects.get().price, 20.0)
@@ -1,14 +1,23 @@
 import uuid
+from unittest.mock import patch
 
 from core.models import Produto, WishlistItem
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
-from wishlist.serializers import WishlistItemSerializer
+from wishlist import catalog, products
+from wishlist.serializers import (WishlistItemDetailSerializer,
+                                  WishlistItemProductSerializer,
+                                  WishlistItemSerializer)
 
 WISHLIST_URL = reverse('wishlist:wishlistitem-list')
+BULK_URL = reverse('wishlist:wishlistitem-bulk')
+CONTAINS_URL = reverse('wishlist:wishlistitem-contains')
+REMOVE_URL = reverse('wishlist:wishlistitem-remove')
+CLEAR_URL = reverse('wishlist:wishlistitem-clear')
 
 
 def create_user(**params):
@@ -41,6 +50,11 @@ def delete_url(wishlist_item_id):
     return reverse('wishlist:wishlistitem-detail', args=[wishlist_item_id])
 
 
+def product_clients_url(product_id):
+    """Return the URL listing the clients of a product"""
+    return reverse('wishlist:product-clients', args=[product_id])
+
+
 class PublicWishlistApiTests(TestCase):
     """Test the Wishlist API (public)"""
 
@@ -65,6 +79,8 @@ class PrivateWishlistApiTests(TestCase):
         )
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
+        products.get_lookup().clear()
+        cache.clear()
 
     def test_create_wishlist(self):
         """Test creating a wishlist successful"""
@@ -81,7 +97,8 @@ class PrivateWishlistApiTests(TestCase):
         self.assertEqual(wishlists[0].product.id, product_uuid)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
-    def test_create_wishlist_invalid_product_fails(self):
+    @patch('wishlist.catalog.CatalogClient.get_product', return_value=None)
+    def test_create_wishlist_invalid_product_fails(self, get_product):
         """Test creating a wishlist with invalid product fails"""
         product_uuid = uuid.UUID('b815b43b-0e0d-4514-b503-29f1bdfd2db8')
         payload = {
@@ -107,6 +124,20 @@ class PrivateWishlistApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_wishlist_known_product_query_count(self):
+        """Test adding a known product takes no product lookup query"""
+        product = sample_product()
+        products.get_lookup().get(product.id)
+        payload = {'client': self.user.id, 'product': product.id}
+
+        # insert and count delta inside a savepoint, and a version bump
+        with self.assertNumQueries(5):
+            res = self.client.post(WISHLIST_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(WishlistItem.objects.filter(
+            client=self.user, product=product).exists())
+
     def test_retrieve_wishlist(self):
         """Retrieve authenticated user wishlits"""
         product_uuid = uuid.UUID('af04c0ee-7137-4848-fd33-a2d148412095')
@@ -119,7 +150,69 @@ class PrivateWishlistApiTests(TestCase):
         serializer = WishlistItemSerializer(wishlist_items, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    @override_settings(WISHLIST_PAGE_SIZE=2, WISHLIST_MAX_PAGE_SIZE=3)
+    def test_retrieve_wishlist_paginated(self):
+        """Test the wishlist is paginated with opaque cursors"""
+        items = [
+            sample_wishlist_item(
+                client=self.user, product=sample_product(id=uuid.uuid4()))
+            for _ in range(5)
+        ]
+
+        res = self.client.get(WISHLIST_URL)
+        next_res = self.client.get(res.data['next'])
+        capped_res = self.client.get(WISHLIST_URL, {'page_size': 10})
+
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [item.id for item in items[:2]])
+        self.assertIsNone(res.data['previous'])
+        self.assertEqual(
+            [item['id'] for item in next_res.data['results']],
+            [item.id for item in items[2:4]])
+        self.assertIsNotNone(next_res.data['previous'])
+        self.assertEqual(len(capped_res.data['results']), 3)
+
+    def test_retrieve_wishlist_expanded_products(self):
+        """Test listing the wishlist with product details"""
+        for _ in range(3):
+            sample_wishlist_item(
+                client=self.user, product=sample_product(id=uuid.uuid4()))
+        wishlist_items = WishlistItem.objects.filter(
+            client=self.user).order_by('id')
+
+        with self.assertNumQueries(2):
+            res = self.client.get(WISHLIST_URL, {'expand': 'product'})
+        serializer = WishlistItemProductSerializer(wishlist_items, many=True)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertNotIn('client', res.data['results'][0])
+        self.assertIn('title', res.data['results'][0]['product'])
+
+    def test_retrieve_wishlist_expanded_constant_queries(self):
+        """Test the expanded list query count does not grow with items"""
+        for _ in range(10):
+            sample_wishlist_item(
+                client=self.user, product=sample_product(id=uuid.uuid4()))
+
+        with self.assertNumQueries(2):
+            res = self.client.get(WISHLIST_URL, {'expand': 'product'})
+
+        self.assertEqual(len(res.data['results']), 10)
+
+    def test_retrieve_wishlist_item_detail(self):
+        """Test retrieving a wishlist item detail takes one joined query"""
+        product = sample_product()
+        item = sample_wishlist_item(client=self.user, product=product)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(delete_url(item.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, WishlistItemDetailSerializer(item).data)
 
     def test_create_wishlist_item_another_user_fails(self):
         """Test creating a wishlist item for another user fails"""
@@ -163,7 +256,7 @@ class PrivateWishlistApiTests(TestCase):
         serializer = WishlistItemSerializer(wishlist_items, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_remove_product_from_wishlist(self):
         """Test user can remove products from wishlist"""
@@ -199,3 +292,370 @@ class PrivateWishlistApiTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
         self.assertIn(wishlist_item, wishlist_items)
+
+    @patch('wishlist.catalog.CatalogClient.get_product')
+    def test_create_wishlist_catalog_open_circuit(self, get_product):
+        """Test an open catalog circuit answers 503 with Retry-After"""
+        get_product.side_effect = catalog.CatalogUnavailable(12)
+        payload = {'client': self.user.id, 'product': str(uuid.uuid4())}
+
+        res = self.client.post(WISHLIST_URL, payload)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res['Retry-After'], '12')
+        self.assertFalse(WishlistItem.objects.exists())
+
+    @patch('wishlist.catalog.CatalogClient.get_product')
+    def test_create_wishlist_catalog_error(self, get_product):
+        """Test catalog failures are not reported as unknown products"""
+        get_product.side_effect = catalog.CatalogError()
+        payload = {'client': self.user.id, 'product': str(uuid.uuid4())}
+
+        res = self.client.post(WISHLIST_URL, payload)
+
+        self.assertEqual(
+            res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    @patch('wishlist.catalog.CatalogClient.get_product')
+    def test_bulk_add_products(self, get_product):
+        """Test adding several products reports each outcome"""
+        known = sample_product(
+            id=uuid.UUID('af04c0ee-7137-4848-fd33-a2d148412095'))
+        present = sample_product(
+            id=uuid.UUID('9c0835e9-b53d-4a82-a483-f143c5459899'))
+        sample_wishlist_item(client=self.user, product=present)
+        fetched_id = 'b815b43b-0e0d-4514-b503-29f1bdfd2db8'
+        missing_id = '1bf0f365-fbdd-4e21-9786-da459d78dd1f'
+
+        def catalog_product(product_id):
+            if str(product_id) != fetched_id:
+                return None
+            return {
+                'id': fetched_id, 'price': 1.5, 'image': 'image',
+                'brand': 'brand', 'title': 'Fetched product'}
+
+        get_product.side_effect = catalog_product
+        payload = {'products': [
+            str(known.id), str(present.id), fetched_id, missing_id,
+            'invalid']}
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {'product': str(known.id), 'status': 'added'},
+            {'product': str(present.id), 'status': 'already_present'},
+            {'product': fetched_id, 'status': 'added'},
+            {'product': missing_id, 'status': 'not_found'},
+            {'product': 'invalid', 'status': 'not_found'},
+        ])
+        wishlist_products = {
+            str(pid) for pid in WishlistItem.objects.filter(
+                client=self.user).values_list('product_id', flat=True)}
+        self.assertEqual(
+            wishlist_products, {str(known.id), str(present.id), fetched_id})
+
+    def test_bulk_add_known_products_query_count(self):
+        """Test known products are resolved with a constant query count"""
+        items = [
+            sample_product(id=uuid.uuid4()) for _ in range(20)]
+        payload = {'products': [str(item.id) for item in items]}
+
+        with self.assertNumQueries(6):
+            res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            WishlistItem.objects.filter(client=self.user).count(), 20)
+
+    def test_bulk_add_another_user_fails(self):
+        """Test bulk adding to another user wishlist fails"""
+        user2 = create_user(
+            email='newemail@luizalabs.com',
+            password='testpass',
+            name='anothe user'
+        )
+        payload = {'client': user2.id, 'products': [str(uuid.uuid4())]}
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_bulk_add_requires_products(self):
+        """Test bulk adding without a list of products fails"""
+        res = self.client.post(BULK_URL, {'products': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_contains_products(self):
+        """Test checking which products are on the wishlist"""
+        product = sample_product()
+        sample_wishlist_item(client=self.user, product=product)
+        other_id = str(uuid.uuid4())
+        payload = {'products': [str(product.id), other_id, 'invalid']}
+
+        with self.assertNumQueries(1):
+            res = self.client.post(CONTAINS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], {
+            str(product.id): True, other_id: False, 'invalid': False})
+
+    def test_contains_products_authenticated_user_only(self):
+        """Test other users wishlists are not considered"""
+        product = sample_product()
+        user2 = create_user(
+            email='newuser@luizalabs.com',
+            password='testpass',
+            name='Test name'
+        )
+        sample_wishlist_item(client=user2, product=product)
+
+        res = self.client.post(
+            CONTAINS_URL, {'products': [str(product.id)]}, format='json')
+
+        self.assertEqual(res.data['results'], {str(product.id): False})
+
+    @override_settings(WISHLIST_MEMBERSHIP_CACHE_TTL=60)
+    def test_contains_products_cached(self):
+        """Test the cached membership set is invalidated on changes"""
+        product = sample_product()
+        products.get_lookup().get(product.id)
+        payload = {'products': [str(product.id)]}
+        self.client.post(CONTAINS_URL, payload, format='json')
+
+        with self.assertNumQueries(0):
+            res = self.client.post(CONTAINS_URL, payload, format='json')
+        self.assertEqual(res.data['results'], {str(product.id): False})
+
+        self.client.post(
+            WISHLIST_URL, {'client': self.user.id, 'product': product.id})
+        res = self.client.post(CONTAINS_URL, payload, format='json')
+        self.assertEqual(res.data['results'], {str(product.id): True})
+
+        item = WishlistItem.objects.get(client=self.user, product=product)
+        self.client.delete(delete_url(item.id))
+        res = self.client.post(CONTAINS_URL, payload, format='json')
+        self.assertEqual(res.data['results'], {str(product.id): False})
+
+    def test_retrieve_wishlist_not_modified(self):
+        """Test the wishlist answers 304 while its version is unchanged"""
+        product = sample_product()
+        res = self.client.get(WISHLIST_URL)
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(WISHLIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+        self.client.post(
+            WISHLIST_URL, {'client': self.user.id, 'product': product.id})
+        res = self.client.get(WISHLIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+        item = WishlistItem.objects.get(client=self.user)
+        etag = res['ETag']
+        self.client.delete(delete_url(item.id))
+        res = self.client.get(WISHLIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_wishlist_item_changes_etag(self):
+        """Test updating an item invalidates the wishlist ETag and caches"""
+        item = sample_wishlist_item(client=self.user, product=sample_product())
+        other = sample_product(id=uuid.uuid4())
+        contains = {'products': [str(other.id)]}
+        self.client.post(CONTAINS_URL, contains, format='json')
+        etag = self.client.get(WISHLIST_URL)['ETag']
+
+        self.client.patch(delete_url(item.id), {'product': other.id})
+        res = self.client.get(WISHLIST_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0]['product'], other.id)
+        res = self.client.post(CONTAINS_URL, contains, format='json')
+        self.assertEqual(res.data['results'], {str(other.id): True})
+
+    def test_retrieve_wishlist_item_not_modified(self):
+        """Test a wishlist item detail answers 304 on a matching ETag"""
+        item = sample_wishlist_item(client=self.user, product=sample_product())
+        etag = self.client.get(delete_url(item.id))['ETag']
+
+        res = self.client.get(delete_url(item.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_differs_between_urls(self):
+        """Test every URL of the wishlist gets its own ETag"""
+        item = sample_wishlist_item(client=self.user, product=sample_product())
+        etag = self.client.get(WISHLIST_URL)['ETag']
+
+        expanded = self.client.get(
+            WISHLIST_URL, {'expand': 'product'}, HTTP_IF_NONE_MATCH=etag)
+        detail = self.client.get(delete_url(item.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(expanded.status_code, status.HTTP_200_OK)
+        self.assertEqual(detail.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(expanded['ETag'], etag)
+        self.assertNotEqual(detail['ETag'], etag)
+
+    def test_unknown_item_not_modified_is_not_found(self):
+        """Test a matching If-None-Match never hides a missing item"""
+        other = create_user(email='other@luizalabs.com', password='testpass')
+        item = sample_wishlist_item(client=other, product=sample_product())
+        etag = self.client.get(WISHLIST_URL)['ETag']
+
+        for url, if_none_match in (
+            (delete_url(0), etag), (delete_url(0), '*'),
+            (delete_url(item.id), '*'),
+        ):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=if_none_match)
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_any_etag_matches_an_existing_item(self):
+        """Test If-None-Match: * answers 304 for an item on the wishlist"""
+        item = sample_wishlist_item(client=self.user, product=sample_product())
+
+        res = self.client.get(delete_url(item.id), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_wishlist_etag_changes_with_profile(self):
+        """Test updating the user changes the ETag of rendered items"""
+        etag = self.client.get(WISHLIST_URL)['ETag']
+
+        self.client.patch(reverse('user:me'), {'name': 'new name'})
+        res = self.client.get(WISHLIST_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def sample_wishlist(self, user, size):
+        """Create a wishlist of size items for user"""
+        return [
+            sample_wishlist_item(
+                client=user, product=sample_product(id=uuid.uuid4()))
+            for _ in range(size)
+        ]
+
+    def test_remove_items_by_id(self):
+        """Test removing several items by their ids"""
+        items = self.sample_wishlist(self.user, 3)
+        payload = {'items': [items[0].id, items[1].id]}
+
+        res = self.client.post(REMOVE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'removed': 2})
+        self.assertEqual(
+            list(WishlistItem.objects.filter(
+                client=self.user).order_by('id')), items[2:])
+
+    def test_remove_items_by_product(self):
+        """Test removing several items by their product ids"""
+        items = self.sample_wishlist(self.user, 3)
+        payload = {'products': [str(items[2].product_id), 'invalid']}
+
+        res = self.client.post(REMOVE_URL, payload, format='json')
+
+        self.assertEqual(res.data, {'removed': 1})
+        self.assertEqual(
+            list(WishlistItem.objects.filter(
+                client=self.user).order_by('id')), items[:2])
+
+    def test_remove_items_another_user_untouched(self):
+        """Test removing items never touches other users wishlists"""
+        user2 = create_user(
+            email='newuser@luizalabs.com',
+            password='testpass',
+            name='Test name'
+        )
+        items = self.sample_wishlist(user2, 2)
+
+        res = self.client.post(
+            REMOVE_URL, {'items': [item.id for item in items]}, format='json')
+
+        self.assertEqual(res.data, {'removed': 0})
+        self.assertEqual(WishlistItem.objects.filter(client=user2).count(), 2)
+
+    def test_remove_items_invalid_payload(self):
+        """Test removing items requires either item or product ids"""
+        res = self.client.post(REMOVE_URL, {}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(
+            REMOVE_URL, {'items': ['abc']}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(WISHLIST_DELETE_CHUNK_SIZE=2)
+    def test_clear_wishlist(self):
+        """Test clearing the wishlist deletes by chunks"""
+        self.sample_wishlist(self.user, 5)
+        user2 = create_user(
+            email='newuser@luizalabs.com',
+            password='testpass',
+            name='Test name'
+        )
+        self.sample_wishlist(user2, 1)
+        etag = self.client.get(WISHLIST_URL)['ETag']
+
+        # three chunks of five queries, and a version bump
+        with self.assertNumQueries(16):
+            res = self.client.delete(CLEAR_URL)
+
+        self.assertEqual(res.data, {'removed': 5})
+        self.assertFalse(WishlistItem.objects.filter(client=self.user))
+        self.assertEqual(WishlistItem.objects.filter(client=user2).count(), 1)
+        res = self.client.get(WISHLIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class ProductClientsApiTests(TestCase):
+    """Test listing the clients that wishlisted a product"""
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            email='admin@luizalabs.com',
+            password='adminpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        self.product = sample_product()
+        self.users = [
+            create_user(email=f'user{i}@luizalabs.com', password='testpass')
+            for i in range(3)
+        ]
+        for user in self.users:
+            sample_wishlist_item(client=user, product=self.product)
+
+    def test_product_clients_staff_only(self):
+        """Test common users cannot list the clients of a product"""
+        client = APIClient()
+        client.force_authenticate(user=self.users[0])
+
+        res = client.get(product_clients_url(self.product.id))
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_product_clients_paginated(self):
+        """Test client ids are returned by pages following the next id"""
+        url = product_clients_url(self.product.id)
+        ids = [user.id for user in self.users]
+
+        with self.assertNumQueries(1):
+            first = self.client.get(url, {'limit': 2})
+        last = self.client.get(url, {'limit': 2, 'after': first.data['next']})
+
+        self.assertEqual(first.data, {'results': ids[:2], 'next': ids[1]})
+        self.assertEqual(last.data, {'results': ids[2:], 'next': None})
+
+    def test_product_clients_invalid_parameters(self):
+        """Test invalid cursors and limits are rejected"""
+        url = product_clients_url(self.product.id)
+
+        for params in ({'after': 'abc'}, {'limit': 0}):
+            res = self.client.get(url, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -8,5 +8,21 @@ router.register('wishlist', views.WishlistItemViewSet)
 
 app_name = 'wishlist'
 urlpatterns = [
+    path(
+        'export/',
+        views.ExportWishlistView.as_view(),
+        name='export'),
+    path(
+        'products/<uuid:product_id>/clients/',
+        views.ProductClientsView.as_view(),
+        name='product-clients'),
+    path(
+        'top/products/',
+        views.TopWishlistedView.as_view(kind='products'),
+        name='top-products'),
+    path(
+        'top/brands/',
+        views.TopWishlistedView.as_view(kind='brands'),
+        name='top-brands'),
     path('', include(router.urls))
 ]
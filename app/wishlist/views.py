@@ -1,72 +1,407 @@
-import requests
-from core.models import Produto, WishlistItem
+from core.models import WishlistCountDelta, WishlistItem
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
 from rest_framework import generics, permissions, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework_simplejwt import authentication
+from rest_framework.views import APIView
+from user import authentication
+from wishlist import (catalog, changes, export, fastpath, membership,
+                      products, response_cache, rollup)
+from wishlist.pagination import WishlistPagination
 from wishlist.serializers import (ProdutoSerializer,
                                   WishlistItemDetailSerializer,
+                                  WishlistItemProductSerializer,
                                   WishlistItemSerializer)
 
-EXT_URL = 'http://challenge-api.luizalabs.com/api/product'
+DUPLICATE_PRODUCT_MESSAGE = (
+    'The fields client, product must make a unique set.')
+
+CATALOG_UNAVAILABLE_MESSAGE = 'Product catalog unavailable, try again later.'
 
 
 class WishlistItemViewSet(viewsets.ModelViewSet, generics.DestroyAPIView):
     queryset = WishlistItem.objects.all()
     serializer_class = WishlistItemSerializer
-    authentication_classes = (authentication.JWTAuthentication,)
+    authentication_classes = (authentication.CachedJWTAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = WishlistPagination
+    # most queries of an action with cold caches, authentication included
+    query_budgets = {
+        'list': 3, 'retrieve': 3, 'create': 7, 'update': 9,
+        'partial_update': 9, 'destroy': 8, 'bulk': 7, 'contains': 2,
+        'remove': 7, 'clear': 7,
+    }
 
     def get_queryset(self):
-        queryset = self.queryset
-        return queryset.filter(client=self.request.user)
+        queryset = self.queryset.filter(client=self.request.user)
+        if self.action == 'retrieve':
+            return queryset.select_related('client', 'product')
+        if self.action == 'list' and self.expand_product():
+            return queryset.select_related('product')
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return WishlistItemDetailSerializer
+        if self.action == 'list' and self.expand_product():
+            return WishlistItemProductSerializer
 
         return self.serializer_class
 
-    def exist_product_database(self, product_id):
-        """Verify if the product exists in database"""
-        return Produto.objects.filter(id=product_id).exists()
+    def expand_product(self):
+        """Verify if product details were requested with ?expand=product"""
+        expand = self.request.query_params.get('expand', '')
+        return 'product' in expand.split(',')
+
+    def fast_reads(self):
+        """Verify if reads should skip the serializers (WISHLIST_FAST_READS)"""
+        return (
+            settings.WISHLIST_FAST_READS
+            and self.action in ('list', 'retrieve')
+        )
+
+    def check_not_modified(self, request, exists=None):
+        """
+        Tag the response with the wishlist version and URL, and return a
+        304 Not Modified response if the client already has this
+        version. exists, when given, is called on a matching tag to
+        verify the resource exists, so an unknown one still answers 404.
+        """
+        self.wishlist_version = changes.wishlist_version(request.user.id)
+        self.etag = changes.wishlist_etag(
+            request.user.id, self.wishlist_version, request)
+        if changes.etag_matches(
+            self.etag, request.headers.get('If-None-Match')
+        ) and (exists is None or exists()):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        etag = getattr(self, 'etag', None)
+        if etag and response.status_code in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            response['ETag'] = etag
+        return response
+
+    def cached_response(self, request, build):
+        """
+        Answer with the data returned by build, cached per user, wishlist
+        version and URL when WISHLIST_RESPONSE_CACHE_TTL is set.
+        """
+        if not response_cache.enabled():
+            return Response(build())
+        data, hit = response_cache.get_or_build(
+            request.user.id, self.wishlist_version, request, build)
+        return Response(data, headers={
+            'X-Wishlist-Cache': 'hit' if hit else 'miss'})
+
+    def list(self, request, *args, **kwargs):
+        not_modified = self.check_not_modified(request)
+        if not_modified:
+            return not_modified
+        return self.cached_response(request, self.list_data)
 
-    def exist_product_api(self, product_id):
-        """Verify if the product exists in external API"""
+    def list_data(self):
+        if not self.fast_reads():
+            return super().list(self.request).data
+        projection = fastpath.get_projection(self.get_serializer_class())
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(projection.values_list(queryset))
+        return self.get_paginated_response(
+            projection.many_to_representation(page)).data
+
+    def item_exists(self):
+        """Verify if the requested item is on the user wishlist"""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
         try:
-            res = requests.get(f'{EXT_URL}/{product_id}/')
-            if res.status_code == status.HTTP_200_OK:
-                return res.json()
-            else:
-                return None
-        except Exception:
-            return None
+            return self.queryset.filter(
+                client=self.request.user,
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).exists()
+        except (TypeError, ValueError):
+            return False
 
-    def get_product_from_db(self, product_id):
-        """Get product from db"""
-        return Produto.objects.get(id=product_id)
+    def retrieve(self, request, *args, **kwargs):
+        not_modified = self.check_not_modified(request, self.item_exists)
+        if not_modified:
+            return not_modified
+        return self.cached_response(request, self.retrieve_data)
 
-    def create_product(self, product):
-        """Create product on DB"""
-        if product.get('reviewScore', None):
-            product['review_score'] = product.pop('reviewScore')
-        serializer = ProdutoSerializer()
-        return serializer.create(validated_data=product)
+    def retrieve_data(self):
+        if not self.fast_reads():
+            return super().retrieve(self.request).data
+        projection = fastpath.get_projection(self.get_serializer_class())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = generics.get_object_or_404(
+            projection.values_list(self.get_queryset()),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        return projection.to_representation(row)
 
     def return_product(self, product_id):
-        """Return Product object if exists"""
-        if self.exist_product_database(product_id):
-            return self.get_product_from_db(product_id)
-        product = self.exist_product_api(product_id)
-        if product:
-            return self.create_product(product)
-        return None
+        """
+        Return Product object if exists. Raises CatalogError when the
+        catalog could not tell whether it exists.
+        """
+        return products.get_lookup().get(product_id)
+
+    def catalog_unavailable(self, exc):
+        """Answer 503 when the catalog failed, never a false 400"""
+        headers = {}
+        if isinstance(exc, catalog.CatalogUnavailable):
+            headers['Retry-After'] = str(exc.retry_after)
+        return Response(
+            {'detail': CATALOG_UNAVAILABLE_MESSAGE},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers=headers)
 
     def create(self, request, *args, **kwargs):
         if int(request.user.id) != int(request.data.get('client')):
             return Response(status=status.HTTP_401_UNAUTHORIZED)
-        product = self.return_product(request.data.get('product'))
-        if product:
-            super().create(request, *args, **kwargs)
-            return Response(status=status.HTTP_200_OK)
+        try:
+            product = self.return_product(request.data.get('product'))
+        except catalog.CatalogError as exc:
+            return self.catalog_unavailable(exc)
+        if not product:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        try:
+            item_id = WishlistItem.objects.add(request.user.id, product.id)
+        except IntegrityError:
+            # the cached product was removed from the database
+            products.get_lookup().invalidate(product.id)
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if item_id is None:
+            return Response(
+                {'non_field_errors': [DUPLICATE_PRODUCT_MESSAGE]},
+                status=status.HTTP_400_BAD_REQUEST)
+        self.wishlist_changed()
+        return Response(status=status.HTTP_200_OK)
+
+    def perform_update(self, serializer):
+        client_id = serializer.instance.client_id
+        product_id = serializer.instance.product_id
+        with transaction.atomic():
+            super().perform_update(serializer)
+            if serializer.instance.product_id != product_id:
+                WishlistCountDelta.objects.record({
+                    product_id: -1, serializer.instance.product_id: 1})
+        self.wishlist_changed()
+        if serializer.instance.client_id != client_id:
+            changes.wishlist_changed(serializer.instance.client_id)
+
+    def perform_destroy(self, instance):
+        WishlistItem.objects.remove(
+            instance.client_id, settings.WISHLIST_DELETE_CHUNK_SIZE,
+            item_ids=[instance.id])
+        self.wishlist_changed()
+
+    def wishlist_changed(self):
+        """Invalidate what is derived from the user wishlist"""
+        changes.wishlist_changed(self.request.user.id)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        """Add several products to the authenticated user wishlist"""
+        client = request.data.get('client', None)
+        if client is not None and int(request.user.id) != int(client):
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+        product_ids = request.data.get('products', None)
+        if not isinstance(product_ids, list) or not product_ids:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if len(product_ids) > settings.WISHLIST_BULK_MAX_ITEMS:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        parsed = {}
+        for product_id in product_ids:
+            parsed.setdefault(str(product_id),
+                              products.parse_product_id(product_id))
+        found, failed = products.get_lookup().get_many(
+            pid for pid in parsed.values() if pid is not None
+        )
+        added = WishlistItem.objects.add_many(request.user.id, found)
+        present = set(found) - added
+        if added:
+            self.wishlist_changed()
+
+        results = []
+        for product_id, uid in parsed.items():
+            if uid in present:
+                outcome = 'already_present'
+            elif uid in found:
+                outcome = 'added'
+            elif uid in failed:
+                outcome = 'unavailable'
+            else:
+                outcome = 'not_found'
+            results.append({'product': product_id, 'status': outcome})
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def contains(self, request, *args, **kwargs):
+        """Check which products are on the authenticated user wishlist"""
+        product_ids = request.data.get('products', None)
+        if not isinstance(product_ids, list) or not product_ids:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if len(product_ids) > settings.WISHLIST_BULK_MAX_ITEMS:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        parsed = {
+            str(product_id): products.parse_product_id(product_id)
+            for product_id in product_ids
+        }
+        present = membership.contains(
+            request.user.id, filter(None, parsed.values()))
+        return Response({'results': {
+            product_id: uid in present for product_id, uid in parsed.items()
+        }}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'])
+    def remove(self, request, *args, **kwargs):
+        """Remove several items, by item or product ids, from the wishlist"""
+        item_ids = request.data.get('items', None)
+        product_ids = request.data.get('products', None)
+        if (item_ids is None) == (product_ids is None):
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        ids = item_ids if product_ids is None else product_ids
+        if not isinstance(ids, list) or not ids:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.WISHLIST_BULK_MAX_ITEMS:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if item_ids is not None:
+            try:
+                item_ids = [int(item_id) for item_id in item_ids]
+            except (TypeError, ValueError):
+                return Response(status=status.HTTP_400_BAD_REQUEST)
         else:
+            product_ids = list(
+                filter(None, map(products.parse_product_id, product_ids)))
+        return self.removed_response(WishlistItem.objects.remove(
+            request.user.id, settings.WISHLIST_DELETE_CHUNK_SIZE,
+            item_ids=item_ids, product_ids=product_ids,
+        ))
+
+    @action(detail=False, methods=['delete'])
+    def clear(self, request, *args, **kwargs):
+        """Remove every item from the authenticated user wishlist"""
+        return self.removed_response(WishlistItem.objects.remove(
+            request.user.id, settings.WISHLIST_DELETE_CHUNK_SIZE))
+
+    def removed_response(self, removed):
+        if removed:
+            self.wishlist_changed()
+        return Response({'removed': removed}, status=status.HTTP_200_OK)
+
+
+class ExportWishlistView(APIView):
+    """Stream every wishlist item, as CSV or JSON Lines, to staff users"""
+    authentication_classes = (authentication.CachedJWTAuthentication,)
+    permission_classes = (
+        permissions.IsAuthenticated,
+        permissions.IsAdminUser,
+    )
+    content_types = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+    query_budgets = {'get': 1}
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        output = params.get('output', 'csv')
+        if output not in export.FORMATS:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        product = params.get('product', None)
+        if product is not None:
+            product = products.parse_product_id(product)
+            if product is None:
+                return Response(status=status.HTTP_400_BAD_REQUEST)
+        since, until = params.get('since', None), params.get('until', None)
+        try:
+            if since is not None:
+                since = export.parse_moment(since)
+            if until is not None:
+                until = export.parse_moment(until, end=True)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = export.export_queryset(
+            product=product,
+            brand=params.get('brand', None),
+            since=since,
+            until=until,
+        )
+        rows = export.export_rows(
+            queryset, settings.WISHLIST_EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(
+            export.export_lines(output, rows),
+            content_type=self.content_types[output],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="wishlists.{output}"')
+        return response
+
+
+class ProductClientsView(APIView):
+    """List, to staff users, the ids of the clients wishing a product"""
+    authentication_classes = (authentication.CachedJWTAuthentication,)
+    permission_classes = (
+        permissions.IsAuthenticated,
+        permissions.IsAdminUser,
+    )
+    query_budgets = {'get': 2}
+
+    def get(self, request, product_id, *args, **kwargs):
+        params = request.query_params
+        try:
+            after = params.get('after', None)
+            if after is not None:
+                after = int(after)
+            limit = int(params.get(
+                'limit', settings.WISHLIST_CLIENTS_PAGE_SIZE))
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, settings.WISHLIST_CLIENTS_MAX_PAGE_SIZE)
+
+        chunks = WishlistItem.objects.clients_of(product_id, limit, after)
+        clients = next(chunks, [])
+        return Response({
+            'results': clients,
+            'next': clients[-1] if len(clients) == limit else None,
+        }, status=status.HTTP_200_OK)
+
+
+class TopWishlistedView(APIView):
+    """List, to staff users, the most wishlisted products or brands"""
+    authentication_classes = (authentication.CachedJWTAuthentication,)
+    permission_classes = (
+        permissions.IsAuthenticated,
+        permissions.IsAdminUser,
+    )
+    kind = 'products'
+    query_budgets = {'get': 2}
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.WISHLIST_TOP_DEFAULT_LIMIT))
+        except ValueError:
             return Response(status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, settings.WISHLIST_TOP_MAX_LIMIT)
+
+        if self.kind == 'brands':
+            results = [
+                {'brand': count.brand, 'wishlists': count.wishlists}
+                for count in rollup.top_brands(limit)
+            ]
+        else:
+            results = [{
+                'product': ProdutoSerializer(count.product).data,
+                'wishlists': count.wishlists,
+            } for count in rollup.top_products(limit)]
+        return Response({'results': results}, status=status.HTTP_200_OK)